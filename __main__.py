@@ -8,8 +8,16 @@ if __name__ == '__main__':
        returns False, logs an error and terminates the application.
     """
     import sys
-    env_vars = config.init(sys.argv[1:])
+    # --plan reports what one cycle of each job would change and cost
+    # without writing anything, then exits instead of starting the scheduler
+    args = [arg for arg in sys.argv[1:] if arg != "--plan"]
+    env_vars = config.init(args)
     config.logger
+    if "--plan" in sys.argv[1:]:
+        import json
+        import app.planner as planner
+        print(json.dumps(planner.plan(), indent=2))
+        sys.exit(0)
     # For debugging / local dev, run the commands directly rather than
     # with the scheduler
     # if env_vars["env"] == "--debug":
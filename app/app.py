@@ -1,10 +1,13 @@
 # import logging
+from datetime import datetime, timezone
 
 import data_module.create_jira_tickets as create_jira_tickets
+import data_module.sharding as sharding
 import sync_module.bidirectional_sync as jira_sync
 import uuid_module.uuid as uuid
 
 import app.config as config
+import app.variables as app_vars
 
 
 def main():
@@ -67,4 +70,14 @@ def main():
                              hour='1',
                              id="sync_jira_cron")
 
+    # When several replicas share the workspaces, join the hash ring as soon
+    # as the scheduler starts and keep renewing this replica's lease. Jobs
+    # process no sheets until the first heartbeat has built the ring.
+    if sharding.enabled():
+        config.scheduler.add_job(sharding.heartbeat,
+                                 'interval',
+                                 seconds=app_vars.shard_heartbeat_seconds,
+                                 next_run_time=datetime.now(timezone.utc),
+                                 id="shard_heartbeat")
+
     return True
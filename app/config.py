@@ -383,7 +383,7 @@ def init(args):
     # Set parameters for the task scheduler
     executors = {
         'default': ThreadPoolExecutor(20),
-        'processpool': ProcessPoolExecutor(2)
+        'processpool': ProcessPoolExecutor(app_vars.process_workers)
     }
     job_defaults = {
         'coalesce': True,
@@ -0,0 +1,127 @@
+import logging
+import time
+
+import app.config as config
+import app.variables as app_vars
+import data_module.create_jira_tickets as create_jira_tickets
+import data_module.helper as helper
+import data_module.smartsheet_api as smartsheet_api
+import sync_module.bidirectional_sync as jira_sync
+
+logger = logging.getLogger(__name__)
+
+plan_jobs = {
+    "bidirectional_sync": jira_sync.bidirectional_sync,
+    "create_tickets": create_jira_tickets.create_tickets
+}
+"""Jobs that can be planned, by name. Type: dict
+    """
+
+
+def estimate_seconds(calls, rate_limit=None):
+    """Estimates how long a set of API calls takes when the rate limit is
+       the bottleneck.
+
+    Args:
+        calls (dict): Number of calls per kind
+        rate_limit (int, optional): Requests allowed per minute. Defaults to
+            api_rate_limit.
+
+    Returns:
+        float: The estimated wall time in seconds
+    """
+    if rate_limit is None:
+        rate_limit = app_vars.api_rate_limit
+    total = sum(calls.values())
+    return helper.truncate(total * 60.0 / rate_limit, 1)
+
+
+def plan_job(job_name, minutes):
+    """Runs a single job with writes recorded instead of sent, and reports
+       what the job would have changed.
+
+    Args:
+        job_name (str): One of the names in plan_jobs
+        minutes (int): Number of minutes in the past used to filter sheets
+                       and sheet data
+
+    Returns:
+        dict: The calls made per kind, the rows and cells that would have
+              been written per Sheet ID, and the measured and estimated
+              wall time
+    """
+    start = time.time()
+    # The dry run only covers this thread and the workers the job starts.
+    # Jobs on the scheduler's threads keep writing, and the state the plan
+    # stages in memory is its own copy, dropped with the dry run.
+    smartsheet_api.start_dry_run()
+    try:
+        plan_jobs[job_name](minutes)
+    finally:
+        recorded = smartsheet_api.stop_dry_run()
+    elapsed = helper.truncate(time.time() - start, 2)
+
+    sheets = recorded["sheets"]
+    report = {
+        "calls": recorded["calls"],
+        "sheets": sheets,
+        "rows": sum(sheet["rows_added"] + sheet["rows_updated"]
+                    for sheet in sheets.values()),
+        "cells": sum(sheet["cells"] for sheet in sheets.values()),
+        "elapsed_seconds": elapsed,
+        "estimated_seconds": estimate_seconds(recorded["calls"])
+    }
+    msg = str("[PLAN] {} would write {} rows and {} cells across {} sheets "
+              "using {} API calls.").format(job_name, report["rows"],
+                                            report["cells"], len(sheets),
+                                            sum(report["calls"].values()))
+    logging.info(msg)
+    return report
+
+
+def plan(job_names=None, minutes=None):
+    """Runs discovery and diffing for each job without making any write
+       calls, and reports the rows, cells and API calls a cycle would cost.
+
+    Args:
+        job_names (list, optional): The jobs to plan. Defaults to every job
+            in plan_jobs.
+        minutes (int, optional): Number of minutes in the past used to
+            filter sheets and sheet data. Defaults to the configured minutes.
+
+    Raises:
+        TypeError: Job names must be a list
+        ValueError: Job names must be in plan_jobs
+        TypeError: Minutes must be an int
+
+    Returns:
+        dict: The report for each job, plus the totals across every job
+    """
+    if job_names is None:
+        job_names = list(plan_jobs.keys())
+    if not isinstance(job_names, list):
+        msg = str("Job names must be type: list, not {}"
+                  "").format(type(job_names))
+        raise TypeError(msg)
+    for job_name in job_names:
+        if job_name not in plan_jobs:
+            msg = str("Job name must be one of {}, not {}"
+                      "").format(list(plan_jobs.keys()), job_name)
+            raise ValueError(msg)
+    if minutes is None:
+        minutes = config.minutes
+    if not isinstance(minutes, int):
+        msg = str("Minutes must be type: int, not {}").format(type(minutes))
+        raise TypeError(msg)
+
+    report = {"minutes": minutes, "rate_limit": app_vars.api_rate_limit,
+              "jobs": {}}
+    calls = {"read": 0, "history": 0, "write": 0}
+    for job_name in job_names:
+        job_report = plan_job(job_name, minutes)
+        report["jobs"][job_name] = job_report
+        for kind, count in job_report["calls"].items():
+            calls[kind] += count
+    report["calls"] = calls
+    report["estimated_seconds"] = estimate_seconds(calls)
+    return report
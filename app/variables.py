@@ -4,6 +4,138 @@ log_location = "logs/"
 module_log_name = "main.log"
 """The main log written to disk
     """
+state_location = "state/"
+"""Location to save state that must survive between runs, such as the
+    last synced cell values. Type: str
+    """
+sync_snapshot_name = "sync_snapshot.json"
+"""File name for the snapshot of the last value synced per Jira Ticket and
+    column. Type: str
+    """
+reverse_index_name = "reverse_index.json"
+"""File name for the Plan rows that reference each Jira Ticket, and the
+    watermark of the last completed bidirectional sync. Type: str
+    """
+link_status_name = "link_status.json"
+"""File name for the last known cell link status of each synced cell.
+    Type: str
+    """
+link_graph_name = "link_graph.json"
+"""File name for the UUID links made through the Description column, and the
+    watermark of the last completed intersheet sync. Type: str
+    """
+api_rate_limit = 300
+"""Maximum number of Smartsheet API requests per minute, shared by every
+    thread in the process. Type: int
+    """
+history_cache_size = 10000
+"""Maximum number of cell history lookups to keep in memory between sync
+    runs. Least recently used entries are evicted first. Type: int
+    """
+history_workers = 8
+"""Number of threads used to prefetch cell history for a Program Plan.
+    Type: int
+    """
+sync_workers = 4
+"""Number of Jira Tickets the bidirectional sync diffs, and Program Plans it
+    writes, at the same time. Set to 1 to do them one at a time. Type: int
+    """
+link_workers = 4
+"""Number of destination sheets loaded at the same time while writing Jira
+    Index cell links. Set to 1 to load the sheets one at a time. Type: int
+    """
+ticket_watch_seconds = 90
+"""Maximum number of seconds the ticket watcher waits for one level of
+    parent tickets to be created before it leaves the rest for the next
+    create_tickets run. Type: int
+    """
+ticket_poll_seconds = 15
+"""Number of seconds between reads of the Push Tickets Sheet while the
+    ticket watcher waits for parent tickets. Type: int
+    """
+data_plane_ttl = 30
+"""Number of seconds the sheets loaded for one job are shared with the other
+    jobs before they are downloaded again. Type: int
+    """
+scheduler_alpha = 0.3
+"""Weight of the newest runtime in each job's moving average of runtimes.
+    Type: float
+    """
+scheduler_utilization = 0.5
+"""Fraction of each interval a job should spend running. The interval is
+    set to the average runtime divided by this value. Type: float
+    """
+scheduler_tolerance = 0.1
+"""Fraction of the current interval the target interval must differ by
+    before the job is rescheduled. Type: float
+    """
+scheduler_bounds = {"write_uuids_interval": (15, 300),
+                    "create_jira_interval": (60, 900),
+                    "sync_jira_interval": (15, 300),
+                    "sync_intersheet_interval": (15, 300)}
+"""Minimum and maximum interval in seconds for each job. Jobs not listed
+    use scheduler_default_bounds. Type: dict
+    """
+scheduler_default_bounds = (15, 900)
+"""Minimum and maximum interval in seconds for jobs without bounds.
+    Type: tuple
+    """
+sheet_hot_seconds = 3600
+"""A sheet is hot while its average time between edits, and the time since
+    its last edit, are under this many seconds. Type: int
+    """
+sheet_cold_seconds = 600
+"""Number of seconds between polls of a cold sheet by each job. Type: int
+    """
+sheet_sweep_minutes = 1440
+"""Runs that look back more than this many minutes poll every changed
+    sheet. Type: int
+    """
+lease_store_name = "leases.sqlite3"
+"""File name for the leases and queued Index writes shared by the replicas.
+    Type: str
+    """
+lease_store_timeout = 10
+"""Number of seconds to wait for another replica to unlock the lease store.
+    Type: int
+    """
+shard_lease_seconds = 30
+"""Number of seconds a replica's lease lasts. Its sheets move to the other
+    replicas once it expires. Type: int
+    """
+shard_heartbeat_seconds = 10
+"""Number of seconds between renewals of a replica's lease. Type: int
+    """
+shard_vnodes = 64
+"""Number of points each replica has on the hash ring. Type: int
+    """
+outbox_max_attempts = 5
+"""Number of times the Index Sheet owner tries a queued Index write before
+    moving it to the dead letter table. Type: int
+    """
+process_workers = 2
+"""Number of processes in the scheduler's processpool executor and in the
+    pipeline's process pool. Type: int
+    """
+pipeline_queue_size = 16
+"""Most work items waiting between two pipeline stages. Type: int
+    """
+pipeline_fetch_workers = 4
+"""Number of sheets downloaded at the same time by a pipeline. Type: int
+    """
+pipeline_diff_workers = 2
+"""Number of sheets compared at the same time by a pipeline. Type: int
+    """
+pipeline_write_batch = 10
+"""Number of sheets collected before a pipeline writes them. Type: int
+    """
+pipeline_processes = False
+"""Compare sheets in a process pool instead of threads. Type: bool
+    """
+column_map_ttl = 3600
+"""Number of seconds a sheet's cached column map is trusted before the sheet
+    is fetched with every column again. Type: int
+    """
 
 # INTEGRATION TESTS / DEV ENV
 dev_workspace_id = [1234567891011120] # Generic INT
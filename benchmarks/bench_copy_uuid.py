@@ -0,0 +1,83 @@
+"""Benchmarks copy_uuid_to_index_sheet against the previous nested loop.
+    Run from the repository root with: python -m benchmarks.bench_copy_uuid
+"""
+import time
+from unittest.mock import patch
+
+import smartsheet
+import app.variables as app_vars
+import data_module.create_jira_tickets as jira
+import data_module.smartsheet_api as smartsheet_api
+
+INDEX_ROWS = 20000
+PUSH_ROWS = 2000
+UUID_COL = 101
+JIRA_COL = 102
+
+
+def legacy_match(index_sheet, index_col_map, sub_index):
+    """The previous matching loop, kept for comparison. Scans the whole
+       sub-index for every Index row without a UUID.
+    """
+    matches = []
+    for row in index_sheet.rows:
+        cells = {cell.column_id: cell for cell in row.cells}
+        jira_ticket = cells[index_col_map[app_vars.jira_col]]
+        uuid_value = cells[index_col_map[app_vars.uuid_col]]
+        if uuid_value.value:
+            continue
+        for uuid, sub_ticket in sub_index.items():
+            if sub_ticket == jira_ticket.value:
+                matches.append((row.id, uuid))
+    return matches
+
+
+def build_index(index_rows=INDEX_ROWS, push_rows=PUSH_ROWS):
+    """Builds an Index Sheet where every other row already has a UUID, and a
+       sub-index of Push Sheet UUIDs for the most recent tickets.
+    """
+    rows = []
+    for i in range(index_rows):
+        uuid = "2-{}-3-1".format(i) if i % 2 else None
+        rows.append({"id": i + 1, "cells": [
+            {"columnId": UUID_COL, "value": uuid},
+            {"columnId": JIRA_COL, "value": "JAR-{}".format(i)}]})
+    index_sheet = smartsheet.models.Sheet(
+        {"id": 1, "name": "Jira Index", "rows": rows,
+         "columns": [{"id": UUID_COL, "title": app_vars.uuid_col},
+                     {"id": JIRA_COL, "title": app_vars.jira_col}]})
+    sub_index = {}
+    for i in range(index_rows - push_rows, index_rows):
+        sub_index["2-{}-3-{}".format(i, i)] = "JAR-{}".format(i)
+    return index_sheet, sub_index
+
+
+def main():
+    index_sheet, sub_index = build_index()
+    index_col_map = {app_vars.uuid_col: UUID_COL,
+                     app_vars.jira_col: JIRA_COL}
+
+    start = time.perf_counter()
+    with patch("data_module.create_jira_tickets.get_push_tickets_sheet",
+               return_value=[None, {}]), \
+            patch("data_module.create_jira_tickets.build_sub_indexes",
+                  return_value=[sub_index, []]):
+        smartsheet_api.start_dry_run()
+        try:
+            jira.copy_uuid_to_index_sheet(index_sheet, index_col_map)
+        finally:
+            recorded = smartsheet_api.stop_dry_run()
+    elapsed = time.perf_counter() - start
+    rows = sum(sheet["rows_updated"] for sheet in recorded["sheets"].values())
+    print("copy_uuid_to_index_sheet: {} index x {} push rows -> {} rows in "
+          "{:.4f}s".format(INDEX_ROWS, PUSH_ROWS, rows, elapsed))
+
+    start = time.perf_counter()
+    matches = legacy_match(index_sheet, index_col_map, sub_index)
+    elapsed = time.perf_counter() - start
+    print("legacy:                   {} index x {} push rows -> {} rows in "
+          "{:.4f}s".format(INDEX_ROWS, PUSH_ROWS, len(matches), elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmarks drop_dupes against the previous list based implementation.
+    Run from the repository root with: python -m benchmarks.bench_drop_dupes
+"""
+import time
+
+import smartsheet
+import sync_module.bidirectional_sync as sync
+
+UPDATES = 10000
+DUPLICATE_EVERY = 4
+
+
+def legacy_drop_dupes(row_list):
+    """The previous implementation, kept for comparison. Membership tests
+       against a list and deletes while iterating, which skips elements.
+    """
+    row_ids = []
+    list_copy = row_list
+    for row in list_copy:
+        if row.id in row_ids:
+            index = list_copy.index(row)
+            del list_copy[index]
+        else:
+            row_ids.append(row.id)
+    return list_copy
+
+
+def build_updates(count=UPDATES):
+    """Builds row updates where every DUPLICATE_EVERY'th row repeats an
+       earlier Row ID with a different column.
+    """
+    rows = []
+    for i in range(count):
+        row_id = i // DUPLICATE_EVERY if i % DUPLICATE_EVERY == 0 else i
+        row = smartsheet.models.Row()
+        row.id = row_id + 1
+        cell = smartsheet.models.Cell()
+        cell.column_id = 100 + (i % DUPLICATE_EVERY)
+        cell.value = "Value {}".format(i)
+        row.cells.append(cell)
+        rows.append(row)
+    return rows
+
+
+def timed(func, rows):
+    start = time.perf_counter()
+    result = func(rows)
+    return time.perf_counter() - start, result
+
+
+def main():
+    elapsed, unique = timed(sync.drop_dupes, build_updates())
+    cells = sum(len(row.cells) for row in unique)
+    print("drop_dupes: {} updates -> {} rows, {} cells in {:.4f}s"
+          "".format(UPDATES, len(unique), cells, elapsed))
+    elapsed, unique = timed(legacy_drop_dupes, build_updates())
+    cells = sum(len(row.cells) for row in unique)
+    print("legacy:     {} updates -> {} rows, {} cells in {:.4f}s"
+          "".format(UPDATES, len(unique), cells, elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Benchmarks the create_ticket_index rule engine against the previous chain
+    of if checks, and checks that both produce the same tickets and Pending
+    updates. Run from the repository root with:
+    python -m benchmarks.bench_ticket_rules
+"""
+import logging
+import re
+import time
+from unittest.mock import patch
+
+import smartsheet
+import app.variables as app_vars
+import data_module.create_jira_tickets as jira
+import data_module.helper as helper
+import data_module.ticket_rules as ticket_rules
+
+ROWS = 20000
+
+JIRA_VALUES = [None, "JAR-12", "Create", "create", "Pending...", "Notes",
+               "reasonPhrase: Bad Request"]
+PARENT_VALUES = [None, None, "JAR-1", "Pending...", "Create", "not a ticket",
+                 "reasonPhrase: Bad Request"]
+ISSUE_TYPES = ["Task", "Story", "Sub-Task", "Epic"]
+
+
+def legacy_create_ticket_index(source_sheets):
+    """The previous row classification, kept for comparison. Writes are
+       returned instead of sent.
+    """
+    tickets_to_create = {}
+    pending_count = 0
+    parent_pending_count = 0
+    updates = {}
+    for sheet in source_sheets:
+        col_map = helper.get_column_map(sheet)
+        sheet_rows_to_update = []
+        for row in sheet.rows:
+            logging.debug("------------------------")
+            logging.debug("New Row")
+            logging.debug("------------------------")
+            row_data = jira.build_row_data(row, col_map)
+            if row_data[app_vars.jira_col] is None:
+                # Skip rows with no data in the Jira column
+                msg = str("Row {} skipped because Jira column was empty."
+                          "").format(row_data["row_num"])
+                logging.debug(msg)
+                continue
+            if bool(re.match(r"[a-zA-Z]+-\d+",
+                             str(row_data[app_vars.jira_col]))):
+                # Skip tickets that match the Jira Ticket pattern
+                msg = str("Jira Ticket {} on row {} matches the Jira Ticket "
+                          "pattern").format(row_data[app_vars.jira_col],
+                                            row_data["row_num"])
+                logging.debug(msg)
+                continue
+            if row_data[app_vars.summary_col] == "True":
+                # Skip summary rows
+                msg = str("Row {} skipped because Summary column was true."
+                          "").format(row_data["row_num"])
+                logging.debug(msg)
+                continue
+            if row_data["Team"] is None:
+                # Need team defined (so we can get project key). Skip.
+                msg = str("Row {} skipped because Team column was empty."
+                          "").format(row_data["row_num"])
+                logging.debug(msg)
+                continue
+            if row_data[app_vars.uuid_col] is None:
+                # No UUID means we can't push the created ticket IDs back
+                # into the program sheets. Skip.
+                msg = str("Row {} skipped because UUID column was empty."
+                          "").format(row_data["row_num"])
+                logging.debug(msg)
+                continue
+            if row_data['Issue Type'] == "Sub-Task":
+                # Skip Subtasks, we can't create them with the connector
+                msg = str("Row {} skipped because Parent Issue Type is {}."
+                          "").format(row_data["row_num"],
+                                     row_data["Parent Issue Type"])
+                logging.debug(msg)
+                continue
+            if row_data['Parent Issue Type'] == "Sub-Task":
+                # Skip Subtasks, we can't create them with the connector
+                msg = str("Row {} skipped because Parent Issue Type is {}."
+                          "").format(row_data["row_num"],
+                                     row_data["Parent Issue Type"])
+                logging.debug(msg)
+                continue
+            if row_data["Parent Ticket"] and \
+                    "reasonPhrase" in row_data["Parent Ticket"]:
+                # Skip rows where the parent ticket has a sync error
+                msg = str("Parent ticket for row {} has a Jira Sync error: "
+                          "{}. Skipping.").format(row_data["row_num"],
+                                                  row_data[app_vars.jira_col])
+                logging.debug(msg)
+                continue
+            if "reasonPhrase" in row_data[app_vars.jira_col]:
+                # Skip rows where the Jira ticket has a sync error
+                msg = str("Jira ticket for row {} is a Jira Sync error: "
+                          "{}. Skipping.").format(row_data["row_num"],
+                                                  row_data[app_vars.jira_col])
+                logging.debug(msg)
+                continue
+            if row_data["Parent Ticket"] is None and \
+                    row_data[app_vars.jira_col] in ("Create", "create"):
+                tickets_to_create[row_data[app_vars.uuid_col]] = row_data
+                # Set these rows to "Pending..."
+                new_row = smartsheet.models.Row()
+                new_row.id = row.id
+                new_row.cells.append({
+                    'column_id': col_map[app_vars.jira_col],
+                    'object_value': "Pending..."
+                })
+                sheet_rows_to_update.append(new_row)
+                msg = str("Appended row UUID: {} and associated data to the "
+                          "list of rows to update and set the Jira Ticket "
+                          "column in Sheet Name: {} to Pending..."
+                          "").format(row_data[app_vars.uuid_col], sheet.name)
+                logging.debug(msg)
+                # logging.debug(row_data)
+                continue
+            if row_data[app_vars.jira_col] == "Pending...":
+                # Skip any row that's already in process
+                msg = str("Skipped because Jira Ticket or Parent Ticket "
+                          "column was set to Pending...")
+                logging.debug(msg)
+                # logging.debug(row_data)
+                pending_count += 1
+                continue
+            if row_data['Parent Ticket'] == "Pending...":
+                # Skip any row that's already in process
+                msg = str("Skipped because Parent Ticket column was set to "
+                          "Pending...")
+                logging.debug(msg)
+                # logging.debug(row_data)
+                parent_pending_count += 1
+                continue
+            if row_data['Parent Ticket'] not in ('Create', 'create',
+                                                 'Pending...', None):
+                if not bool(re.match(r"[a-zA-Z]+-\d+",
+                                     row_data["Parent Ticket"])):
+                    msg = str("Parent Ticket {} on row {} does not match the "
+                              "Jira Ticket pattern. Skipping"
+                              "").format(row_data[app_vars.jira_col],
+                                         row_data["row_num"])
+                    logging.debug(msg)
+                    continue
+
+                if row_data[app_vars.jira_col] in ('Create', 'create'):
+                    # Add row data to create tickets.
+                    tickets_to_create[row_data[app_vars.uuid_col]] = row_data
+
+                    # Set these rows to "Pending..." in the Plan sheet.
+                    new_row = smartsheet.models.Row()
+                    new_row.id = row.id
+                    new_row.cells.append({
+                        'column_id': col_map[app_vars.jira_col],
+                        'object_value': "Pending..."
+                    })
+                    sheet_rows_to_update.append(new_row)
+                    pending_count += 1
+                    continue
+            # TODO: Validate Jira ticket so that comments don't
+            # cause errors.
+            msg = str("Parent Ticket isn't 'Create' or 'Pending...' "
+                      "but it does have a value. Dumping data.")
+            logging.debug(msg)
+            logging.debug(row_data)
+        updates[sheet.id] = [row.id for row in sheet_rows_to_update]
+    return tickets_to_create, updates
+
+
+def build_sheet(rows=ROWS):
+    """Builds a Program Plan with a mix of every kind of row the rules
+       classify.
+    """
+    columns = [{"id": i + 1, "title": col}
+               for i, col in enumerate(jira.project_columns)]
+    col_ids = {col["title"]: col["id"] for col in columns}
+    sheet_rows = []
+    for i in range(rows):
+        values = {
+            app_vars.summary_col: "True" if i % 23 == 0 else "False",
+            app_vars.task_col: "Task {}".format(i),
+            "Issue Type": ISSUE_TYPES[i % len(ISSUE_TYPES)],
+            app_vars.jira_col: JIRA_VALUES[i % len(JIRA_VALUES)],
+            "Parent Ticket": PARENT_VALUES[(i // 7) % len(PARENT_VALUES)],
+            "Team": None if i % 17 == 0 else "Team",
+            app_vars.uuid_col: None if i % 19 == 0 else
+            "2-{}-3-{}".format(i + 1, i),
+            "Parent Issue Type": ISSUE_TYPES[(i // 5) % len(ISSUE_TYPES)],
+            "Project Key": "JAR"
+        }
+        cells = [{"columnId": col_ids[col], "value": values.get(col)}
+                 for col in jira.project_columns]
+        sheet_rows.append({"id": i + 1, "rowNumber": i + 1, "cells": cells})
+    return smartsheet.models.Sheet({"id": 2, "name": "Plan",
+                                    "columns": columns, "rows": sheet_rows})
+
+
+def main():
+    logging.disable(logging.INFO)
+    sheet = build_sheet()
+
+    start = time.perf_counter()
+    legacy_tickets, legacy_updates = legacy_create_ticket_index([sheet])
+    legacy_elapsed = time.perf_counter() - start
+
+    index_sheet = smartsheet.models.Sheet({"id": 1})
+    with patch("data_module.smartsheet_api.write_rows_to_sheet") as write:
+        ticket_rules.reset_hits()
+        start = time.perf_counter()
+        tickets = jira.create_ticket_index([sheet], index_sheet,
+                                           {app_vars.uuid_col: 1})
+        elapsed = time.perf_counter() - start
+    updates = {call[0][1].id: [row.id for row in call[0][0]]
+               for call in write.call_args_list}
+
+    assert tickets == legacy_tickets, "tickets_to_create differs"
+    assert updates == legacy_updates, "Pending updates differ"
+    print("rules:  {} rows -> {} tickets in {:.4f}s"
+          "".format(ROWS, len(tickets), elapsed))
+    print("legacy: {} rows -> {} tickets in {:.4f}s"
+          "".format(ROWS, len(legacy_tickets), legacy_elapsed))
+    print("hits:   {}".format(dict(ticket_rules.hits)))
+
+
+if __name__ == "__main__":
+    main()
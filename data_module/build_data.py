@@ -4,6 +4,7 @@ from collections import defaultdict
 import smartsheet
 
 import data_module.helper as helper
+import data_module.link_status as link_status
 
 logger = logging.getLogger(__name__)
 
@@ -118,7 +119,7 @@ def dest_indexes(project_data):
 
 
 def build_row(row, columns_to_link, dest_col_map, jira_index_sheet,
-              jira_index_col_map, idx_row_id):
+              jira_index_col_map, idx_row_id, sheet_id=None):
     """Function to build new cell links, unlink broken links, or
        do nothing if the cell link status is OK. Used to remove
        unchanged rows from the update list.
@@ -135,6 +136,9 @@ def build_row(row, columns_to_link, dest_col_map, jira_index_sheet,
         dest_col_map (dict): The column name:id map for the destination sheet
         idx_row_id (int): The row ID in the Jira Index sheet where the cell
                           link will pull data
+        sheet_id (int, optional): The ID of the sheet the row is on. If
+            passed, link statuses are read from the link status index and
+            only checked again if the row was modified. Defaults to None.
 
     Raises:
         TypeError: Row must be a Smartsheet Row object
@@ -145,6 +149,7 @@ def build_row(row, columns_to_link, dest_col_map, jira_index_sheet,
         TypeError: Jira Index Column Map must be a dict of
                    Column Names: Column IDs
         TypeError: Jira Index Row ID must be an int
+        TypeError: Sheet ID must be an int or None
 
     Returns:
         Row: If cells were appended to the row, returns the new row, otherwise
@@ -174,12 +179,19 @@ def build_row(row, columns_to_link, dest_col_map, jira_index_sheet,
         msg = str("Jira Index Row ID must be type: int, not"
                   " {}").format(type(idx_row_id))
         raise TypeError(msg)
+    if not isinstance(sheet_id, (int, type(None))):
+        msg = str("Sheet ID must be type: int or None, not"
+                  " {}").format(type(sheet_id))
+        raise TypeError(msg)
 
     new_row = smartsheet.models.Row()
     new_row.id = row.id
     for col in columns_to_link:
         old_cell = helper.get_cell_data(row, col, dest_col_map)
-        cell_check = helper.has_cell_link(old_cell, 'In')
+        if sheet_id is not None and old_cell is not None:
+            cell_check = link_status.cell_status(sheet_id, row, old_cell)
+        else:
+            cell_check = helper.has_cell_link(old_cell, 'In')
 
         if not cell_check:
             msg = str("Cell is valid and unlinked, but is {}. Continuing "
@@ -0,0 +1,141 @@
+"""Caches cell history lookups between sync runs. A cell's history can only
+    change when its row changes, so the row's modified date is part of the
+    cache key and stale entries simply stop being requested. Lookups for a
+    whole Program Plan can be prefetched concurrently under the shared API
+    rate limit.
+"""
+import collections
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import app.variables as app_vars
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cache = collections.OrderedDict()
+hits = 0
+misses = 0
+
+
+def history_key(sheet_id, row, column_id):
+    """Builds the cache key for a cell's history.
+
+    Args:
+        sheet_id (int): The ID of the sheet that contains the row
+        row (smartsheet.models.Row): The row that contains the cell
+        column_id (int): The ID of the column for the cell
+
+    Returns:
+        tuple: The (sheet_id, row_id, column_id, modified_at) cache key
+    """
+    return (sheet_id, row.id, column_id, row.modified_at)
+
+
+def _get_cached(key):
+    global hits
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            hits += 1
+            return True, _cache[key]
+    return False, None
+
+
+def _set_cached(key, history):
+    with _lock:
+        _cache[key] = history
+        _cache.move_to_end(key)
+        while len(_cache) > app_vars.history_cache_size:
+            _cache.popitem(last=False)
+
+
+def _fetch(key):
+    global misses
+    sheet_id, row_id, column_id, _ = key
+    history = smartsheet_api.get_cell_history(sheet_id, row_id, column_id)
+    with _lock:
+        misses += 1
+    _set_cached(key, history)
+    return history
+
+
+def get_history(sheet_id, row, column_id):
+    """Gets the most recent cell history for a cell, from the cache if the
+       row hasn't changed since it was last looked up.
+
+    Args:
+        sheet_id (int): The ID of the sheet that contains the row
+        row (smartsheet.models.Row): The row that contains the cell
+        column_id (int): The ID of the column for the cell
+
+    Returns:
+        list: The cell history objects returned by the API
+    """
+    key = history_key(sheet_id, row, column_id)
+    found, history = _get_cached(key)
+    if found:
+        return history
+    return _fetch(key)
+
+
+def prefetch(keys, workers=None):
+    """Resolves every uncached history lookup concurrently. Each request
+       still passes through the shared rate limit in smartsheet_api.
+
+    Args:
+        keys (list): A list of cache keys built with history_key
+        workers (int, optional): Number of threads to use. Defaults to
+            history_workers.
+
+    Returns:
+        int: The number of lookups fetched from the API
+    """
+    if workers is None:
+        workers = app_vars.history_workers
+    with _lock:
+        pending = [key for key in dict.fromkeys(keys) if key not in _cache]
+    if not pending:
+        return 0
+
+    def fetch(key):
+        try:
+            _fetch(key)
+            return True
+        except Exception as e:
+            # The lookup is retried serially when the row is compared.
+            msg = str("Prefetching cell history for {} failed: {}"
+                      "").format(key, e)
+            logging.warning(msg)
+            return False
+
+    # Each lookup runs in a copy of this thread's context, so the calls are
+    # counted by a dry run on this thread.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, fetch,
+                                   key) for key in pending]
+        fetched = sum(future.result() for future in futures)
+    msg = str("Prefetched {} of {} cell history lookups."
+              "").format(fetched, len(pending))
+    logging.debug(msg)
+    return fetched
+
+
+def reset_counts():
+    """Resets the cache hit and miss counts for a new run.
+    """
+    global hits, misses
+    with _lock:
+        hits = 0
+        misses = 0
+
+
+def clear_cache():
+    """Drops every cached history lookup and resets the counts.
+    """
+    with _lock:
+        _cache.clear()
+    reset_counts()
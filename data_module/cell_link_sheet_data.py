@@ -1,28 +1,34 @@
-import json
 import logging
 import re
 
 import smartsheet
 
 import data_module.helper as helper
+import data_module.link_status as link_status
 import data_module.smartsheet_api as smartsheet_api
 import app.variables as app_vars
-import data_module.write_data as write_data
 
 
-def write_uuid_cell_links(project_data_index, source_sheets):
+def write_uuid_cell_links(project_data_index, source_sheets,
+                          dest_uuids=None):
     """If the description column has a value, look it up against
        the UUIDs in the project dictionary. If a UUID matches, sync
-       details.
+       details. The cell links are written in one batch per destination
+       sheet.
 
     Args:
         project_data_index (dict): All UUIDs and the row values
         source_sheets (list): All sheet objects in all workspaces
+        dest_uuids (set, optional): Only write cell links into these UUIDs.
+            Defaults to None, which checks every UUID in the index.
 
     Raises:
         TypeError: Project Data Index must be a dict
         ValueError: If the project index data passed in is None,
                     raises and logs an error.
+
+    Returns:
+        dict: The write result for each destination Sheet ID
     """
     if not isinstance(project_data_index, dict):
         msg = str("Project data index must be type: dict, not"
@@ -42,10 +48,19 @@ def write_uuid_cell_links(project_data_index, source_sheets):
     # source_uuid = sheet_id, row_id where the data is coming FROM via
     # the cell link. source_uuid is located in the description column
     # of the uuid:row_data.
+
+    # Look up sheets, columns and rows by ID instead of scanning for them
+    # on every UUID. Row maps are built the first time a sheet is a
+    # destination.
+    sheets_by_id = {sheet.id: sheet for sheet in source_sheets}
+    col_maps = {sheet.id: helper.get_column_map(sheet)
+                for sheet in source_sheets}
+    row_maps = {}
+    rows_to_update = {}
     for dest_uuid, row_data in project_data_index.items():
-        rows_to_update = []
+        if dest_uuids is not None and dest_uuid not in dest_uuids:
+            continue
         sync_columns = None
-        result = None
         dest_uuid_col_dict = {}
         source_uuid_col_dict = {}
 
@@ -83,23 +98,14 @@ def write_uuid_cell_links(project_data_index, source_sheets):
             continue
         elif row_data[app_vars.predecessor_col] is not None \
                 and row_data[app_vars.start_col] is not None:
-            msg = str("Checking predecessor(s) for start date {}, "
-                      "starting with predecessor row {}"
-                      "").format(row_data[app_vars.start_col],
-                                 row_data[app_vars.predecessor_col])
-            logging.debug(msg)
-            result = write_data.write_predecessor_dates(row_data,
-                                                        project_data_index)
-            if result:
-                sync_columns = [app_vars.status_col, app_vars.assignee_col,
-                                app_vars.task_col, app_vars.duration_col]
-            else:
-                sync_columns = [app_vars.status_col, app_vars.assignee_col,
-                                app_vars.task_col, app_vars.start_col,
-                                app_vars.duration_col]
-                result = False
-            msg = str("Writing predecessor dates returned {}. Setting "
-                      "sync columns to {}.").format(result, sync_columns)
+            # The start date comes from the predecessors, so only link the
+            # other columns.
+            sync_columns = [app_vars.status_col, app_vars.assignee_col,
+                            app_vars.task_col, app_vars.duration_col]
+            msg = str("Row has predecessor(s) {} and a start date of {}. "
+                      "Setting sync columns to {}."
+                      "").format(row_data[app_vars.predecessor_col],
+                                 row_data[app_vars.start_col], sync_columns)
             logging.debug(msg)
         elif row_data[app_vars.predecessor_col] is None:
             sync_columns = [app_vars.status_col, app_vars.assignee_col,
@@ -117,20 +123,11 @@ def write_uuid_cell_links(project_data_index, source_sheets):
             logging.error(msg)
             break
 
-        if result:
-            msg = str("Made it through the conditional checks. Values set: "
-                      "Sync Columns: {}, "
-                      "Predecessor Dates result: {}, "
-                      "UUID: {}, "
-                      "Row data: {}"
-                      "").format(sync_columns, result, dest_uuid, row_data)
-        else:
-            msg = str("Made it through the conditional checks. Values set: "
-                      "Sync Columns: {}, "
-                      "Predecessor Dates result: Skipped, "
-                      "UUID: {}, "
-                      "Row data: {}"
-                      "").format(sync_columns, dest_uuid, row_data)
+        msg = str("Made it through the conditional checks. Values set: "
+                  "Sync Columns: {}, "
+                  "UUID: {}, "
+                  "Row data: {}"
+                  "").format(sync_columns, dest_uuid, row_data)
         logging.debug(msg)
 
         # Make sure that the description matches our UUID pattern
@@ -139,145 +136,99 @@ def write_uuid_cell_links(project_data_index, source_sheets):
             # Create a cell link from source_uuid -> uuid
             # Pull from this UUID
             source_uuid = row_data[app_vars.description_col]
-            dest_sheet = None
-            for dest_sheet in source_sheets:
-                # Load column names and IDs for the dest_sheet sheet.
-                if int(dest_uuid.split("-")[0]) == dest_sheet.id:
-                    column_names = helper.json_extract(
-                        json.loads(str(dest_sheet)), "title")
-                    column_ids = helper.json_extract(
-                        json.loads(str(dest_sheet)), "id")
-                    dest_uuid_col_dict = dict(zip(column_names, column_ids))
-                    dest_sheet = dest_sheet
-                    break
-                else:
-                    msg = str("No match between Destination UUID: {} and "
-                              "sheet ID: {}").format(dest_uuid.split("-")[0],
-                                                     dest_sheet.id)
-                    logging.debug(msg)
-                    dest_sheet = None
-
-            msg = "Broke dest_sheet loop. Dict {}".format(
-                dest_uuid_col_dict)
-            logging.debug(msg)
+            dest_sheet = sheets_by_id.get(int(dest_uuid.split("-")[0]))
             if dest_sheet is not None:
+                dest_uuid_col_dict = col_maps[dest_sheet.id]
                 msg = str("Destination Sheet ID: {} | Sheet Name: {} "
                           "set for UUID {}").format(dest_sheet.id,
                                                     dest_sheet.name, dest_uuid)
-                logging.error(msg)
+                logging.debug(msg)
             else:
                 msg = str("Destination sheet not set for UUID {}. "
                           "Continuing to next UUID.").format(dest_uuid)
                 logging.warning(msg)
                 continue
 
-            src_sheet = None
-            for src_sheet in source_sheets:
-                # Load column names and IDs for the src_sheet sheet.
-                if int(source_uuid.split("-")[0]) == src_sheet.id:
-                    column_names = helper.json_extract(
-                        json.loads(str(src_sheet)), "title")
-                    column_ids = helper.json_extract(
-                        json.loads(str(src_sheet)), "id")
-                    source_uuid_col_dict = dict(zip(column_names, column_ids))
-                    src_sheet = src_sheet
-                    break
-                else:
-                    msg = str("No match between Source UUID: {} and sheet ID: "
-                              "{}").format(source_uuid.split("-")[0],
-                                           src_sheet.id)
-                    logging.debug(msg)
-                    src_sheet = None
-
-            msg = "Broke src_sheet loop. Dict {}".format(
-                source_uuid_col_dict)
-            logging.debug(msg)
+            src_sheet = sheets_by_id.get(int(source_uuid.split("-")[0]))
             if src_sheet is not None:
+                source_uuid_col_dict = col_maps[src_sheet.id]
                 msg = str("Source Sheet ID: {} | Sheet Name: {} "
                           "set for UUID {}").format(src_sheet.id,
                                                     src_sheet.name,
                                                     source_uuid)
-                logging.error(msg)
+                logging.debug(msg)
             else:
-                msg = str("Destination sheet not set for UUID {}. "
+                msg = str("Source sheet not set for UUID {}. "
                           "Continuing to next UUID.").format(source_uuid)
                 logging.warning(msg)
                 continue
 
             new_row = smartsheet.models.Row()
             new_row.id = int(dest_uuid.split("-")[1])
-            dest_col_map = helper.get_column_map(dest_sheet)
-            dest_row = None
-            for row in dest_sheet.rows:
-                if row.id == new_row.id:
-                    dest_row = row
-                    msg = str("Destination Row ID {} matched Row ID {} "
-                              "in Destination Sheet ID: {} | Sheet Name: {}."
-                              "").format(
-                        new_row.id, row.id, dest_sheet.id,
-                        dest_sheet.name)
-                    logging.debug(msg)
-                else:
-                    msg = str("Destination Row ID {} does not match Row ID {} "
-                              "in Destination Sheet ID: {} | Sheet Name: {}. "
-                              "Continuing to next row.").format(
-                        new_row.id, row.id, dest_sheet.id,
-                        dest_sheet.name)
-                    logging.debug(msg)
-            else:
-                logging.debug(dest_row)
-                if dest_row is not None:
-                    desc_cell = helper.get_cell_data(
-                        dest_row, app_vars.description_col, dest_col_map)
-                    logging.debug(desc_cell.value)
+            dest_col_map = dest_uuid_col_dict
+            if dest_sheet.id not in row_maps:
+                row_maps[dest_sheet.id] = {row.id: row
+                                           for row in dest_sheet.rows}
+            dest_row = row_maps[dest_sheet.id].get(new_row.id)
+            desc_cell = None
+            if dest_row is not None:
+                msg = str("Destination Row ID {} found in Destination Sheet "
+                          "ID: {} | Sheet Name: {}.").format(
+                    new_row.id, dest_sheet.id, dest_sheet.name)
+                logging.debug(msg)
+                desc_cell = helper.get_cell_data(
+                    dest_row, app_vars.description_col, dest_col_map)
+                logging.debug(desc_cell.value)
 
             for col in sync_columns:
                 if dest_row:
-                    cell = helper.get_cell_data(row, col, dest_col_map)
-                    link_status = helper.has_cell_link(cell, 'In')
+                    cell = helper.get_cell_data(dest_row, col, dest_col_map)
+                    link_state = link_status.cell_status(dest_sheet.id,
+                                                         dest_row, cell)
                     link_out_status = helper.has_cell_link(cell, 'Out')
-                    msg = str("{}, {}").format(cell, link_status)
+                    msg = str("{}, {}").format(cell, link_state)
                     logging.debug(msg)
                 else:
                     msg = str("Destination row data not found. Breaking loop.")
                     logging.debug(msg)
                     break
 
-                if link_status in ("OK", "Linked"):
+                if link_state in ("OK", "Linked"):
                     msg = str("Destination cell value {} has a valid cell "
                               "link: {}. Continuing to next cell.").format(
                         cell.value, cell.link_in_from_cell)
                     logging.debug(msg)
                     continue
-                elif link_status is None:
+                elif link_state is None:
                     msg = str("Destination cell value {} is not a valid "
                               "cell link value. Continuing to next cell."
                               "").format(cell.value)
                     logging.debug(msg)
                     continue
-                elif link_status in ("Unlinked", "BROKEN", "Broken"):
+                elif link_state in ("Unlinked", "BROKEN", "Broken"):
                     if desc_cell:
                         msg = str("Cell link status is {}. "
                                   "Writing new cell link."
-                                  "").format(link_status)
+                                  "").format(link_state)
                         logging.debug(msg)
                     else:
                         msg = str("Cell link status is {} but Description"
                                   "field is {}. Continuing to next cell."
-                                  "").format(link_status, desc_cell)
+                                  "").format(link_state, desc_cell)
                         logging.debug(msg)
                         continue
                 else:
                     msg = str("Cell link status is {}. "
                               "Sheet ID: {} | Row ID: {} "
                               "| Column: {} | Cell Details: {}"
-                              "").format(link_status, dest_sheet.id,
-                                         row.id, col, cell)
+                              "").format(link_state, dest_sheet.id,
+                                         dest_row.id, col, cell)
                     logging.warning(msg)
 
                 # If the column in our list of columns to sync is a
                 # key in the destination uuid column dictionary,
                 # return the destination column ID.
+                dest_col_id = None
                 if col in dest_uuid_col_dict.keys():
                     dest_col_id = dest_uuid_col_dict[col]
 
@@ -315,8 +266,8 @@ def write_uuid_cell_links(project_data_index, source_sheets):
                     # have been set.
                     new_row.cells.append(new_cell)
             if new_row.cells:
-                # Append the new row to the list of rows to update
-                rows_to_update.append(new_row)
+                # Append the new row to the rows to update on its sheet
+                rows_to_update.setdefault(dest_sheet.id, []).append(new_row)
 
                 # TODO: Figure out why rows with outgoing links are written.
                 msg = str("{}, {}").format(new_row, link_out_status)
@@ -332,14 +283,16 @@ def write_uuid_cell_links(project_data_index, source_sheets):
                           "the value in the description field.")
             logging.debug(dest_uuid, row_data)
 
-        # Write back all rows after parsing through the list of UUIDs
-        if rows_to_update:
-            msg = str("Writing {} cell link row(s) back to Sheet ID: {} "
-                      "| Sheet Name: {}").format(len(rows_to_update),
-                                                 dest_sheet.id,
-                                                 dest_sheet.name)
-            logging.info(msg)
-            smartsheet_api.write_rows_to_sheet(rows_to_update, dest_sheet,
-                                               write_method="update")
-        else:
-            logging.debug("No updates required.")
+    # Write back all rows after parsing through the list of UUIDs
+    results = {}
+    for sheet_id, rows in rows_to_update.items():
+        dest_sheet = sheets_by_id[sheet_id]
+        msg = str("Writing {} cell link row(s) back to Sheet ID: {} "
+                  "| Sheet Name: {}").format(len(rows), dest_sheet.id,
+                                             dest_sheet.name)
+        logging.info(msg)
+        results[sheet_id] = smartsheet_api.write_rows_to_sheet(
+            rows, dest_sheet, write_method="update")
+    if not rows_to_update:
+        logging.debug("No updates required.")
+    return results
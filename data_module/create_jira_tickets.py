@@ -1,3 +1,4 @@
+import collections
 import logging
 import re
 import time
@@ -6,9 +7,16 @@ import app.config as config
 import app.variables as app_vars
 import smartsheet
 
+import data_module.data_plane as data_plane
+import data_module.execution_guard as execution_guard
 import data_module.get_data as get_data
 import data_module.helper as helper
+import data_module.run_context as run_context
+import data_module.scheduler_controller as scheduler_controller
+import data_module.sharding as sharding
 import data_module.smartsheet_api as smartsheet_api
+import data_module.ticket_dag as ticket_dag
+import data_module.ticket_rules as ticket_rules
 
 project_columns = [app_vars.summary_col, app_vars.task_col, "Issue Type",
                    app_vars.jira_col,
@@ -242,14 +250,17 @@ def form_rows(row_dict, col_map):
 
 def get_push_tickets_sheet():
     """Helper function to get the Push Jira Tickets sheet and build the column
-       map
+       map. During a create_tickets run the sheet is only downloaded once.
 
     Returns:
         smartsheet.models.Sheet: The sheet object
         dict: The column map of Column Names: Column IDs
     """
-    push_ticket_sheet = smartsheet_api.get_sheet(
-        config.push_tickets_sheet, config.minutes)
+    push_ticket_sheet = run_context.get_sheet("push")
+    if push_ticket_sheet is None:
+        push_ticket_sheet = smartsheet_api.get_sheet(
+            config.push_tickets_sheet, config.minutes)
+        run_context.add_sheet(push_ticket_sheet, "push")
     push_tickets_col_map = helper.get_column_map(push_ticket_sheet)
     return push_ticket_sheet, push_tickets_col_map
 
@@ -362,28 +373,24 @@ def copy_jira_tickets_to_sheets(source_sheets, index_sheet, index_col_map):
         # Build a list of UUIDs from the sheet.
         _, sheet_uuid_list = build_sub_indexes(sheet, sheet_col_map)
 
-        tiny_jira_index = {}
-        # For each UUID in the sheet UUID list, check to see if that UUID
-        # is in the index dict keys. If it is not, move on. If it is,
-        # add it to the tiny dict.
-        for sheet_uuid in sheet_uuid_list:
-            if sheet_uuid not in jira_sub_index.keys():
-                continue
-            else:
-                # Create new entry with Sheet UUID, index_dict Jira Ticket
-                tiny_jira_index[sheet_uuid] = jira_sub_index[sheet_uuid]
-        if not tiny_jira_index:
-            # The index is empty and we didn't actually match any UUIDs
+        # Only the UUIDs on both the sheet and the Jira Index need checking.
+        matched_uuids = jira_sub_index.keys() & set(sheet_uuid_list)
+        if not matched_uuids:
+            # We didn't actually match any UUIDs
             continue
 
+        # Map each row by ID once so every UUID finds its row directly.
+        rows_by_id = {row.id: row for row in sheet.rows}
+
         # Check the sheet and row for each UUID, validate that the ticket is
         # not already present
-        for uuid, ticket in tiny_jira_index.items():
+        for uuid in sorted(matched_uuids):
+            ticket = jira_sub_index[uuid]
             split = uuid.split("-")
             row_id = int(split[1])
-            for row in sheet.rows:
-                if not row_id == row.id:
-                    continue
+            row = rows_by_id.get(row_id)
+            jira_cell = None
+            if row is not None:
                 jira_cell = helper.get_cell_data(
                     row, app_vars.jira_col, sheet_col_map)
 
@@ -441,13 +448,21 @@ def copy_jira_tickets_to_sheets(source_sheets, index_sheet, index_col_map):
 #     return parent
 
 
-def copy_errors_to_sheet():
-    """Copies any sync errors back to the original sheet so that the end user
-       knows if/when/why a ticket creation failed.
+def get_error_rows(push_sheet, push_col_map):
+    """Buckets the Push Sheet rows that have a sync error by the Sheet ID in
+       their UUID.
+
+    Args:
+        push_sheet (smartsheet.models.Sheet): The Push Tickets Sheet
+        push_col_map (dict): The map of Column Names: Column IDs for the
+           Push Tickets Sheet
+
+    Returns:
+        dict: {Sheet ID: [(Row ID, Sync Status Cell)]}
+        int: The number of rows skipped because they have no UUID or sync
+             status
     """
-    push_sheet, push_col_map = get_push_tickets_sheet()
-    success_count = 0
-    failure_count = 0
+    error_rows = {}
     skip_count = 0
     for row in push_sheet.rows:
         uuid_cell = helper.get_cell_data(row, app_vars.uuid_col, push_col_map)
@@ -471,40 +486,144 @@ def copy_errors_to_sheet():
         split = uuid_cell.value.split("-")
         sheet_id = int(split[0])
         row_id = int(split[1])
+        error_rows.setdefault(sheet_id, []).append((row_id, sync_cell))
+    return error_rows, skip_count
+
 
-        # Get the Jira Cell value in the sheet and validate that it should
-        # be written to.
-        sheet = smartsheet_api.get_sheet(sheet_id, config.minutes)
+def get_error_sheet(sheet_id, row_ids):
+    """Gets only the rows that have sync errors from a sheet. If the sheet's
+       column map is cached, only the Jira column is requested.
+
+    Args:
+        sheet_id (int): The Sheet ID
+        row_ids (list): The Row IDs to pull
+
+    Returns:
+        smartsheet.models.Sheet: The sheet with only the requested rows
+        dict: The map of Column Names: Column IDs for the sheet
+    """
+    col_map = get_data.get_cached_column_map(sheet_id)
+    if col_map and app_vars.jira_col in col_map:
+        sheet = smartsheet_api.get_sheet(
+            sheet_id, 0, row_ids=row_ids,
+            column_ids=[col_map[app_vars.jira_col]])
+    else:
+        sheet = smartsheet_api.get_sheet(sheet_id, 0, row_ids=row_ids)
         col_map = helper.get_column_map(sheet)
-        dest_row = smartsheet_api.get_row(sheet.id, row_id)
-        jira_cell = helper.get_cell_data(dest_row, app_vars.jira_col, col_map)
+        get_data.cache_column_map(sheet_id, col_map)
+    return sheet, col_map
 
-        if bool(re.match(r"[a-zA-Z]+-\d+", jira_cell.value)):
-            # Cell value matches the Jira Ticket pattern, skip.
-            skip_count += 1
-            continue
-        if "reasonPhrase" in jira_cell.value:
-            # Sync Cell has already been copied.
-            logging.debug("reasonPhrase in Jira Cell, skipping.")
-            skip_count += 1
-            continue
 
-        # Write the sync error cell to the row
-        new_row = smartsheet.models.Row()
-        new_row.id = row_id
-        sync_cell.column_id = col_map[app_vars.jira_col]
-        sync_cell.hyperlink = smartsheet.models.ExplicitNull()
-        new_row.cells.append(sync_cell)
-        result = smartsheet_api.write_rows_to_sheet([new_row], sheet, "update")
+def copy_errors_to_sheet():
+    """Copies any sync errors back to the original sheet so that the end user
+       knows if/when/why a ticket creation failed. Error rows are grouped by
+       sheet, so each sheet is read once and written once.
+
+    Returns:
+        int: The number of rows the error was copied to
+        int: The number of rows that failed to write
+        int: The number of rows skipped
+    """
+    push_sheet, push_col_map = get_push_tickets_sheet()
+    error_rows, skip_count = get_error_rows(push_sheet, push_col_map)
+    success_count = 0
+    failure_count = 0
+
+    for sheet_id, errors in error_rows.items():
+        row_ids = list(dict.fromkeys(row_id for row_id, _ in errors))
+        sheet, col_map = get_error_sheet(sheet_id, row_ids)
+        rows_by_id = {row.id: row for row in sheet.rows}
+
+        rows_to_update = []
+        for row_id, sync_cell in errors:
+            # Get the Jira Cell value in the sheet and validate that it should
+            # be written to.
+            dest_row = rows_by_id.get(row_id)
+            jira_cell = None
+            if dest_row is not None:
+                jira_cell = helper.get_cell_data(dest_row, app_vars.jira_col,
+                                                 col_map)
+            if jira_cell is None:
+                # The row or the Jira column is gone. Drop the cached column
+                # map in case the column was replaced.
+                msg = str("Jira Cell not found on Sheet ID {} | Row ID {}"
+                          "").format(sheet_id, row_id)
+                logging.debug(msg)
+                get_data.clear_column_maps(sheet_id)
+                skip_count += 1
+                continue
+
+            jira_value = str(jira_cell.value or "")
+            if ticket_rules.jira_ticket_pattern.match(jira_value):
+                # Cell value matches the Jira Ticket pattern, skip.
+                skip_count += 1
+                continue
+            if "reasonPhrase" in jira_value:
+                # Sync Cell has already been copied.
+                logging.debug("reasonPhrase in Jira Cell, skipping.")
+                skip_count += 1
+                continue
+
+            # Write the sync error cell to the row. The Push Tickets row is
+            # shared with the rest of the run, so the error goes on a new
+            # cell.
+            new_row = smartsheet.models.Row()
+            new_row.id = row_id
+            error_cell = smartsheet.models.Cell()
+            error_cell.column_id = col_map[app_vars.jira_col]
+            error_cell.value = sync_cell.value
+            error_cell.hyperlink = smartsheet.models.ExplicitNull()
+            new_row.cells.append(error_cell)
+            rows_to_update.append(new_row)
+
+        if not rows_to_update:
+            continue
+        result = smartsheet_api.write_rows_to_sheet(rows_to_update, sheet,
+                                                    "update")
         logging.debug(result)
 
         if not result.message == "SUCCESS":
-            failure_count += 1
+            failure_count += len(rows_to_update)
         else:
-            success_count += 1
+            success_count += len(rows_to_update)
     return success_count, failure_count, skip_count
 
 
+def uuid_sort_key(uuid):
+    """Orders UUIDs by the row's created date, then by the UUID itself.
+       UUIDs that don't have a created date sort last.
+
+    Args:
+        uuid (str): A UUID in the form Sheet ID-Row ID-Column ID-Created
+
+    Returns:
+        tuple: The sort key
+    """
+    try:
+        return (0, int(str(uuid).split("-")[3]), str(uuid))
+    except (IndexError, ValueError):
+        return (1, 0, str(uuid))
+
+
+def build_ticket_uuids(sub_index):
+    """Inverts a sub-index of UUID: Jira Ticket so each Jira Ticket finds the
+       UUIDs that pushed it with a single lookup.
+
+    Args:
+        sub_index (dict): A sub-index of UUIDs: Jira Tickets
+
+    Returns:
+        dict: {Jira Ticket: [UUIDs]}, where the UUIDs are ordered with the
+              earliest created row first
+    """
+    ticket_uuids = {}
+    for uuid, ticket in sub_index.items():
+        ticket_uuids.setdefault(ticket, []).append(uuid)
+    for uuids in ticket_uuids.values():
+        uuids.sort(key=uuid_sort_key)
+    return ticket_uuids
+
+
 def copy_uuid_to_index_sheet(index_sheet, index_col_map):
     """Copy the UUID from the Push Data Sheet into the Jira Index Sheet after
        the ticket is created in Jira and synced in to the Index Sheet so that
@@ -537,30 +656,49 @@ def copy_uuid_to_index_sheet(index_sheet, index_col_map):
     # AND Jira tickets
     sub_index, _ = build_sub_indexes(
         push_ticket_sheet, push_tickets_col_map)
+    ticket_uuids = build_ticket_uuids(sub_index)
 
-    # For each row in the index sheet, get the cell data for the Jira Ticket
-    # cell and the UUID cell.
+    # Collect the UUIDs already on the index so the same UUID is never
+    # written to a second row.
+    index_rows = []
+    assigned_uuids = set()
     for row in index_sheet.rows:
         jira_ticket = helper.get_cell_data(
             row, app_vars.jira_col, index_col_map)
         uuid_value = helper.get_cell_data(
             row, app_vars.uuid_col, index_col_map)
-        if uuid_value.value:
+        if uuid_value and uuid_value.value:
             # Skip rows with UUIDs.
+            assigned_uuids.add(str(uuid_value.value))
             continue
-        for uuid, sub_ticket in sub_index.items():
-            if sub_ticket == jira_ticket.value:
-                msg = str("Push ticket {} matches Index ticket {}, writing "
-                          "UUID: {}").format(sub_ticket, jira_ticket.value,
-                                             uuid)
-                logging.debug(msg)
-                new_row = smartsheet.models.Row()
-                new_row.id = row.id
-                new_row.cells.append({
-                    'column_id': index_col_map[app_vars.uuid_col],
-                    'object_value': uuid
-                })
-                rows_to_write.append(new_row)
+        if jira_ticket and jira_ticket.value:
+            index_rows.append((row, jira_ticket.value))
+
+    # For each row in the index sheet without a UUID, look up the UUIDs that
+    # pushed its Jira Ticket.
+    for row, ticket in index_rows:
+        uuids = ticket_uuids.get(ticket)
+        if not uuids:
+            continue
+        uuid = next((uuid for uuid in uuids if uuid not in assigned_uuids),
+                    None)
+        if uuid is None:
+            continue
+        if len(uuids) > 1:
+            msg = str("Jira Ticket {} was pushed by {} UUIDs, using {}"
+                      "").format(ticket, len(uuids), uuid)
+            logging.debug(msg)
+        msg = str("Push ticket matches Index ticket {}, writing UUID: {}"
+                  "").format(ticket, uuid)
+        logging.debug(msg)
+        assigned_uuids.add(uuid)
+        new_row = smartsheet.models.Row()
+        new_row.id = row.id
+        new_row.cells.append({
+            'column_id': index_col_map[app_vars.uuid_col],
+            'object_value': uuid
+        })
+        rows_to_write.append(new_row)
     if rows_to_write:
         result = smartsheet_api.write_rows_to_sheet(rows_to_write, index_sheet,
                                                     write_method="update")
@@ -657,8 +795,7 @@ def create_ticket_index(source_sheets, index_sheet, index_col_map):
         raise ValueError(msg)
 
     tickets_to_create = {}
-    pending_count = 0
-    parent_pending_count = 0
+    run_hits = collections.Counter()
 
     for sheet in source_sheets:
         col_map = helper.get_column_map(sheet)
@@ -671,139 +808,27 @@ def create_ticket_index(source_sheets, index_sheet, index_col_map):
             logging.debug(msg)
             continue
 
+        # Resolve the column IDs once, then classify each row in one pass.
+        compiled = ticket_rules.compile_sheet(col_map, project_columns)
+        sheet_hits = collections.Counter()
         sheet_rows_to_update = []
         for row in sheet.rows:
-            logging.debug("------------------------")
-            logging.debug("New Row")
-            logging.debug("------------------------")
-            row_data = build_row_data(row, col_map)
-            if row_data[app_vars.jira_col] is None:
-                # Skip rows with no data in the Jira column
-                msg = str("Row {} skipped because Jira column was empty."
-                          "").format(row_data["row_num"])
-                logging.debug(msg)
-                continue
-            if bool(re.match(r"[a-zA-Z]+-\d+",
-                             str(row_data[app_vars.jira_col]))):
-                # Skip tickets that match the Jira Ticket pattern
-                msg = str("Jira Ticket {} on row {} matches the Jira Ticket "
-                          "pattern").format(row_data[app_vars.jira_col],
-                                            row_data["row_num"])
-                logging.debug(msg)
-                continue
-            if row_data[app_vars.summary_col] == "True":
-                # Skip summary rows
-                msg = str("Row {} skipped because Summary column was true."
-                          "").format(row_data["row_num"])
-                logging.debug(msg)
-                continue
-            if row_data["Team"] is None:
-                # Need team defined (so we can get project key). Skip.
-                msg = str("Row {} skipped because Team column was empty."
-                          "").format(row_data["row_num"])
-                logging.debug(msg)
+            rule, outcome, values = ticket_rules.classify_row(row, compiled)
+            sheet_hits[rule] += 1
+            if outcome != ticket_rules.CREATE:
                 continue
-            if row_data[app_vars.uuid_col] is None:
-                # No UUID means we can't push the created ticket IDs back
-                # into the program sheets. Skip.
-                msg = str("Row {} skipped because UUID column was empty."
-                          "").format(row_data["row_num"])
-                logging.debug(msg)
-                continue
-            if row_data['Issue Type'] == "Sub-Task":
-                # Skip Subtasks, we can't create them with the connector
-                msg = str("Row {} skipped because Parent Issue Type is {}."
-                          "").format(row_data["row_num"],
-                                     row_data["Parent Issue Type"])
-                logging.debug(msg)
-                continue
-            if row_data['Parent Issue Type'] == "Sub-Task":
-                # Skip Subtasks, we can't create them with the connector
-                msg = str("Row {} skipped because Parent Issue Type is {}."
-                          "").format(row_data["row_num"],
-                                     row_data["Parent Issue Type"])
-                logging.debug(msg)
-                continue
-            if row_data["Parent Ticket"] and \
-                    "reasonPhrase" in row_data["Parent Ticket"]:
-                # Skip rows where the parent ticket has a sync error
-                msg = str("Parent ticket for row {} has a Jira Sync error: "
-                          "{}. Skipping.").format(row_data["row_num"],
-                                                  row_data[app_vars.jira_col])
-                logging.debug(msg)
-                continue
-            if "reasonPhrase" in row_data[app_vars.jira_col]:
-                # Skip rows where the Jira ticket has a sync error
-                msg = str("Jira ticket for row {} is a Jira Sync error: "
-                          "{}. Skipping.").format(row_data["row_num"],
-                                                  row_data[app_vars.jira_col])
-                logging.debug(msg)
-                continue
-            if row_data["Parent Ticket"] is None and \
-                    row_data[app_vars.jira_col] in ("Create", "create"):
-                tickets_to_create[row_data[app_vars.uuid_col]] = row_data
-                # Set these rows to "Pending..."
-                new_row = smartsheet.models.Row()
-                new_row.id = row.id
-                new_row.cells.append({
-                    'column_id': col_map[app_vars.jira_col],
-                    'object_value': "Pending..."
-                })
-                sheet_rows_to_update.append(new_row)
-                msg = str("Appended row UUID: {} and associated data to the "
-                          "list of rows to update and set the Jira Ticket "
-                          "column in Sheet Name: {} to Pending..."
-                          "").format(row_data[app_vars.uuid_col], sheet.name)
-                logging.debug(msg)
-                # logging.debug(row_data)
-                continue
-            if row_data[app_vars.jira_col] == "Pending...":
-                # Skip any row that's already in process
-                msg = str("Skipped because Jira Ticket or Parent Ticket "
-                          "column was set to Pending...")
-                logging.debug(msg)
-                # logging.debug(row_data)
-                pending_count += 1
-                continue
-            if row_data['Parent Ticket'] == "Pending...":
-                # Skip any row that's already in process
-                msg = str("Skipped because Parent Ticket column was set to "
-                          "Pending...")
-                logging.debug(msg)
-                # logging.debug(row_data)
-                parent_pending_count += 1
-                continue
-            if row_data['Parent Ticket'] not in ('Create', 'create',
-                                                 'Pending...', None):
-                if not bool(re.match(r"[a-zA-Z]+-\d+",
-                                     row_data["Parent Ticket"])):
-                    msg = str("Parent Ticket {} on row {} does not match the "
-                              "Jira Ticket pattern. Skipping"
-                              "").format(row_data[app_vars.jira_col],
-                                         row_data["row_num"])
-                    logging.debug(msg)
-                    continue
-
-                if row_data[app_vars.jira_col] in ('Create', 'create'):
-                    # Add row data to create tickets.
-                    tickets_to_create[row_data[app_vars.uuid_col]] = row_data
-
-                    # Set these rows to "Pending..." in the Plan sheet.
-                    new_row = smartsheet.models.Row()
-                    new_row.id = row.id
-                    new_row.cells.append({
-                        'column_id': col_map[app_vars.jira_col],
-                        'object_value': "Pending..."
-                    })
-                    sheet_rows_to_update.append(new_row)
-                    pending_count += 1
-                    continue
-            # TODO: Validate Jira ticket so that comments don't
-            # cause errors.
-            msg = str("Parent Ticket isn't 'Create' or 'Pending...' "
-                      "but it does have a value. Dumping data.")
-            logging.debug(msg)
-            logging.debug(row_data)
+            # Add row data to create tickets and set these rows to
+            # "Pending..." in the Plan sheet.
+            row_data = ticket_rules.row_data(row, compiled, values)
+            tickets_to_create[row_data[app_vars.uuid_col]] = row_data
+            new_row = smartsheet.models.Row()
+            new_row.id = row.id
+            new_row.cells.append({
+                'column_id': compiled["jira_column_id"],
+                'object_value': ticket_rules.pending_value
+            })
+            sheet_rows_to_update.append(new_row)
+        run_hits.update(sheet_hits)
 
         # Validate that there are rows to write.
         if sheet_rows_to_update:
@@ -814,11 +839,19 @@ def create_ticket_index(source_sheets, index_sheet, index_col_map):
                       "").format(sheet.id, sheet.name)
             logging.info(msg)
 
+        pending_count = sheet_hits["pending"] + sheet_hits["create_child"]
         msg = str("Sheet ID: {} | Sheet Name: {} has {} rows pending ticket "
                   "creation. {} rows are waiting on parent ticket "
                   "creation.").format(sheet.id, sheet.name, pending_count,
-                                      parent_pending_count)
+                                      sheet_hits["parent_pending"])
         logging.info(msg)
+        msg = str("Rule hits for Sheet ID {}: {}"
+                  "").format(sheet.id, dict(sheet_hits))
+        logging.debug(msg)
+
+    ticket_rules.record_hits(run_hits)
+    msg = str("Rule hits: {}").format(dict(run_hits))
+    logging.info(msg)
 
     logging.debug("Top-level Rows to create first")
     logging.debug("------------------------")
@@ -829,98 +862,166 @@ def create_ticket_index(source_sheets, index_sheet, index_col_map):
     return tickets_to_create
 
 
-def modify_scheduler(time):
-    """Dynamically modifies the given job depending on how long the last
-       job took to complete.
+def resolve_push_tickets(push_col_map):
+    """Reads the Jira Tickets the connector has written to the Push Tickets
+       Sheet so far. Only the UUID and Jira Ticket columns are requested.
 
     Args:
-        time (int): The amount of time elapsed from the start of the job
-                    to the end of the job (in seconds)
+        push_col_map (dict): The column map of Column Names: Column IDs for
+           the Push Tickets Sheet
 
-    Raises:
-        TypeError: Time must be an int or float
-        ValueError: Time must be a positive integer
+    Returns:
+        dict: {UUID: Jira Ticket} for every pushed row that has a ticket
+    """
+    uuid_column_id = push_col_map[app_vars.uuid_col]
+    jira_column_id = push_col_map[app_vars.jira_col]
+    push_sheet = smartsheet_api.get_sheet(
+        config.push_tickets_sheet, 0,
+        column_ids=[uuid_column_id, jira_column_id])
+    resolved = {}
+    for row in push_sheet.rows:
+        values = ticket_rules.row_values(row)
+        uuid = values.get(uuid_column_id)
+        ticket = values.get(jira_column_id)
+        if uuid and ticket and \
+                ticket_rules.jira_ticket_pattern.match(str(ticket)):
+            resolved[str(uuid)] = ticket
+    return resolved
+
+
+def push_ticket_level(nodes, level, resolved, push_col_map):
+    """Pushes the rows in one level to the Push Tickets Sheet with their
+       parent's new Jira Ticket, and sets the rows to "Pending..." in their
+       Program Plans.
+
+    Args:
+        nodes (dict): The nodes from ticket_dag.waiting_rows
+        level (list): The UUIDs to push
+        resolved (dict): {UUID: Jira Ticket} for the parent rows
+        push_col_map (dict): The column map of the Push Tickets Sheet
+    """
+    tickets_to_create = {}
+    plan_updates = {}
+    for uuid in level:
+        node = nodes[uuid]
+        data = dict(node["data"])
+        data[ticket_dag.parent_ticket_col] = resolved[node["parent_uuid"]]
+        tickets_to_create[uuid] = data
+        new_row = smartsheet.models.Row()
+        new_row.id = node["row"].id
+        new_row.cells.append({
+            'column_id': node["jira_column_id"],
+            'object_value': ticket_rules.pending_value
+        })
+        sheet = node["sheet"]
+        plan_updates.setdefault(sheet.id, (sheet, []))[1].append(new_row)
+
+    rows_to_write = form_rows(tickets_to_create, push_col_map)
+    smartsheet_api.write_rows_to_sheet(rows_to_write,
+                                       config.push_tickets_sheet)
+    for sheet, rows in plan_updates.values():
+        smartsheet_api.write_rows_to_sheet(rows, sheet, write_method="update")
+
+
+def push_ticket_levels(source_sheets, watch_seconds=None, poll_seconds=None):
+    """Pushes rows that are waiting on a parent ticket, one level of the
+       parent/child graph at a time. Each level is pushed as soon as the
+       tickets for its parents exist, so a whole hierarchy is created in
+       one watched run instead of one level per scheduled run.
+
+    Args:
+        source_sheets (list): A list of Smartsheet Sheet objects
+        watch_seconds (int, optional): Maximum seconds to wait for a level's
+            parents. Defaults to ticket_watch_seconds.
+        poll_seconds (int, optional): Seconds between reads of the Push
+            Tickets Sheet. Defaults to ticket_poll_seconds.
 
     Returns:
-        str: A message about whether the interval was modified or remains
-             the same
+        int: The number of rows pushed
     """
-    if not isinstance(time, (int, float)):
-        msg = str("Time must be an int or float, not {}").format(type(time))
-        raise TypeError(msg)
-    if time <= 0:
-        msg = str("Time must be a positive int or float, not {}").format(time)
-        raise ValueError(msg)
+    if watch_seconds is None:
+        watch_seconds = app_vars.ticket_watch_seconds
+    if poll_seconds is None:
+        poll_seconds = app_vars.ticket_poll_seconds
+    # Parent tickets are never created during a dry run, so the plan doesn't
+    # wait for them. Each level is recorded as if its parents were created,
+    # with Pending... in place of the parent tickets that don't exist yet.
+    planning = smartsheet_api.dry_run_active()
+    if planning:
+        watch_seconds = 0
+
+    nodes = ticket_dag.waiting_rows(source_sheets, project_columns)
+    if not nodes:
+        return 0
+    levels = ticket_dag.topological_levels(nodes)
+    msg = str("{} rows are waiting on parent tickets across {} levels."
+              "").format(len(nodes), len(levels))
+    logging.info(msg)
+
+    _, push_col_map = get_push_tickets_sheet()
+    resolved = {}
+    pushed = set()
+    for level in levels:
+        # Rows whose parent was waiting but didn't get pushed can't resolve
+        # in this run.
+        level = [uuid for uuid in level
+                 if nodes[uuid]["parent_uuid"] not in nodes or
+                 nodes[uuid]["parent_uuid"] in pushed]
+        deadline = time.monotonic() + watch_seconds
+        while True:
+            resolved.update(resolve_push_tickets(push_col_map))
+            if planning:
+                for uuid in level:
+                    resolved.setdefault(nodes[uuid]["parent_uuid"],
+                                        ticket_rules.pending_value)
+            ready = [uuid for uuid in level
+                     if nodes[uuid]["parent_uuid"] in resolved]
+            if len(ready) == len(level) or time.monotonic() >= deadline:
+                break
+            time.sleep(poll_seconds)
+        if not ready:
+            msg = str("Parent tickets for {} rows were not created in time. "
+                      "Leaving them for the next run.").format(len(level))
+            logging.info(msg)
+            break
+        push_ticket_level(nodes, ready, resolved, push_col_map)
+        pushed.update(ready)
+        msg = str("Pushed {} of {} rows whose parent tickets were created."
+                  "").format(len(ready), len(level))
+        logging.info(msg)
+    return len(pushed)
 
-    time_in_seconds = time
-    # If time comes in in minutes, make time = 60 seconds
-    if time <= 1:
-        time = time * 60
-
-    # Get currently scheduled interval in minutes
-    jobs = config.scheduler.get_job("create_jira_interval")
-    jobs = str(jobs)
-    split = jobs.split(":")
-    interval = int(split[2])
-
-    # Round time up to the nearest minute
-    time = time // 60 + (time % 60 > 0)
-
-    if interval == time:
-        # Do nothing. Interval is correctly sized
-        msg = str("Job interval and job runtime are within 1 minute of "
-                  "each other. No changes to interval.")
-    elif interval > time:
-        # If the interval is greater than the time it took to run the process,
-        # check to see how much more. If the total time the process took was
-        # over 1 minute less than the interval, reduce the interval by 1
-        # minute.
-        delta = interval - time
-        if delta >= 1:
-            new_interval = interval - 1
-            config.scheduler.reschedule_job("create_jira_interval",
-                                            trigger="interval",
-                                            minutes=int(new_interval))
-            msg = str("Job interval is {} minute(s) longer than the job "
-                      "runtime. Reduced interval to {} minutes"
-                      "").format(int(delta), new_interval)
-        # else:
-        #     msg = str("SUCCESS: Job interval {}, elapsed time {}, delta {}"
-        #               "").format(interval, time, delta)
-
-    elif interval < time:
-        # If the interval is less than the time it took to run the process,
-        # increase the interval. If the delta is less than one minute, add 1
-        # minutes, otherwise add the delta to the interval
-        if isinstance(time_in_seconds, float):
-            elapsed_warning = helper.truncate(time_in_seconds, 2)
-        else:
-            elapsed_warning = time_in_seconds
-        msg = str("Create Jira Tickets took {} seconds longer than "
-                  "the interval").format(elapsed_warning)
-        logging.warning(msg)
-        delta = time - interval
-        if delta <= 1:
-            new_interval = interval + 1
-            config.scheduler.reschedule_job("create_jira_interval",
-                                            trigger="interval",
-                                            minutes=int(new_interval))
-        else:
-            new_interval = interval + delta
-            config.scheduler.reschedule_job("create_jira_interval",
-                                            trigger="interval",
-                                            minutes=int(new_interval))
-        msg = str("New job interval set to {} minutes").format(
-            int(new_interval))
-    else:
-        msg = str("ERROR: Job interval {}, elapsed time {}"
-                  "").format(interval, time)
-    return msg
+
+def watch_ticket_levels(source_sheets):
+    """Starts a one-off scheduler job that runs push_ticket_levels, so the
+       wait for parent tickets isn't part of the create_tickets run or its
+       recorded runtime. Runs push_ticket_levels in place if the scheduler
+       isn't running.
+
+    Args:
+        source_sheets (list): A list of Smartsheet Sheet objects
+
+    Returns:
+        bool: True if the watcher job was scheduled
+    """
+    scheduler = getattr(config, "scheduler", None)
+    if smartsheet_api.dry_run_active() or scheduler is None or \
+            not scheduler.running:
+        push_ticket_levels(source_sheets)
+        return False
+    # A watcher that is still waiting keeps running. The new one replaces
+    # any watcher that hasn't started yet.
+    scheduler.add_job(push_ticket_levels, 'date', args=[source_sheets],
+                      id="push_ticket_levels", replace_existing=True)
+    logging.info("Started the ticket watcher for rows waiting on parent "
+                 "tickets.")
+    return True
 
 
 # TODO: Drop parent rows once written to index sheet by removing the "Create"
 # from the Jira Ticket field and/or filtering out UUID matches + nonNull
 # Jira Ticket field on the Index sheet
+@execution_guard.guarded("create_tickets")
 def create_tickets(minutes=app_vars.dev_minutes):
     """Main function passed to the scheduler to parse and upload data to
        Smartsheet so that new Jira Tickets can be created. Logs a warning
@@ -942,92 +1043,117 @@ def create_tickets(minutes=app_vars.dev_minutes):
         msg = str("Minutes should be >= 0, not {}").format(minutes)
         raise ValueError(msg)
     start = time.time()
+    run_context.start_run()
+    try:
+        # The sheets are shared with the other jobs while they are fresh,
+        # and cold sheets are only polled every few runs. Every sheet is
+        # needed before rows can be matched across sheets, so only the
+        # downloads run as a pipeline. The writes stay on this thread,
+        # where the run's context lives.
+        sheet_ids = data_plane.discover(minutes,
+                                        job_name="create_jira_interval")
+        source_sheets = data_plane.fetch_sheets("create_tickets", sheet_ids,
+                                                minutes)
+        msg = str("Sheet IDs object type {}, object values {}").format(
+            type(sheet_ids), sheet_ids)
+        logging.debug(msg)
 
-    sheet_ids = get_data.get_all_sheet_ids(minutes, config.workspace_id,
-                                           config.index_sheet)
-    msg = str("Sheet IDs object type {}, object values {}").format(
-        type(sheet_ids), sheet_ids)
-    logging.debug(msg)
-    source_sheets = get_data.refresh_source_sheets(sheet_ids, minutes)
-
-    # Load the index sheet and create a column map.
-    index_sheet = smartsheet_api.get_sheet(config.index_sheet, minutes)
-    index_col_map = helper.get_column_map(index_sheet)
-
-    # Copy UUIDs from Push sheet to Index Sheet
-    logging.info("Starting to copy UUIDs from the Push Sheet to the "
-                 "Index Sheet.")
-    result = copy_uuid_to_index_sheet(index_sheet, index_col_map)
-
-    # Refresh the index sheet since we just wrote data
-    if result:
-        index_sheet = smartsheet_api.get_sheet(config.index_sheet,
-                                               config.minutes)
-
-    logging.info("Starting to push sync error messages to the Program Plans.")
-    success_count, failure_count, skip_count = copy_errors_to_sheet()
-    if success_count:
-        msg = str("Successfully pushed {} sync error messages to "
-                  "their respective source sheets.").format(success_count)
-        logging.info(msg)
+        # Load the whole index sheet, the same copy the Jira sync uses, and
+        # create a column map. Every stage shares the sheets loaded for this
+        # run.
+        index_sheet = data_plane.get_sheet(config.index_sheet)
+        index_col_map = helper.get_column_map(index_sheet)
+        run_context.add_sheet(index_sheet, "index")
+        run_context.add_sheets(source_sheets)
+
+        # The Push Sheet is shared by every replica, so only the replica
+        # that writes the Index Sheet copies from it, and only one run at a
+        # time.
+        success_count, failure_count, skip_count = 0, 0, 0
+        if sharding.is_leader() and execution_guard.holds("push_sheet"):
+            # Copy UUIDs from Push sheet to Index Sheet
+            logging.info("Starting to copy UUIDs from the Push Sheet to the "
+                         "Index Sheet.")
+            # The UUIDs written here are applied to the shared Index Sheet,
+            # so it doesn't need to be downloaded again.
+            copy_uuid_to_index_sheet(index_sheet, index_col_map)
+
+            logging.info("Starting to push sync error messages to the "
+                         "Program Plans.")
+            success_count, failure_count, skip_count = copy_errors_to_sheet()
+        if success_count:
+            msg = str("Successfully pushed {} sync error messages to "
+                      "their respective source sheets.").format(success_count)
+            logging.info(msg)
 
-    if failure_count:
-        msg = str("Failed to push {} sync error messages to "
-                  "their respective source sheets.").format(failure_count)
-        logging.info(msg)
+        if failure_count:
+            msg = str("Failed to push {} sync error messages to "
+                      "their respective source sheets.").format(failure_count)
+            logging.info(msg)
 
-    if skip_count:
-        msg = str("{} rows skipped.").format(skip_count)
-        logging.info(msg)
+        if skip_count:
+            msg = str("{} rows skipped.").format(skip_count)
+            logging.info(msg)
 
-    # Copy Jira Tickets from the index sheet back to the source sheets
-    logging.info("Starting to copy Jira Tickets from the Index Sheet to the "
-                 "Program Plans.")
-    sheets_updated = copy_jira_tickets_to_sheets(
-        source_sheets, index_sheet, index_col_map)
-    msg = str("Updated {} Plan sheets with newly created Jira tickets."
-              "").format(sheets_updated)
-    logging.info(msg)
+        # Copy Jira Tickets from the index sheet back to the source sheets
+        logging.info("Starting to copy Jira Tickets from the Index Sheet to "
+                     "the Program Plans.")
+        sheets_updated = copy_jira_tickets_to_sheets(
+            source_sheets, index_sheet, index_col_map)
+        msg = str("Updated {} Plan sheets with newly created Jira tickets."
+                  "").format(sheets_updated)
+        logging.info(msg)
 
-    # Create an index of rows pending ticket creation.
-    tickets_to_create = create_ticket_index(
-        source_sheets, index_sheet, index_col_map)
-    logging.debug("Parent Dict")
-    logging.debug("------------------------")
-    logging.debug(tickets_to_create)
-    msg = str("Parent Length: {}").format(len(tickets_to_create))
-    logging.debug(msg)
+        # Create an index of rows pending ticket creation.
+        tickets_to_create = create_ticket_index(
+            source_sheets, index_sheet, index_col_map)
+        logging.debug("Parent Dict")
+        logging.debug("------------------------")
+        logging.debug(tickets_to_create)
+        msg = str("Parent Length: {}").format(len(tickets_to_create))
+        logging.debug(msg)
 
-    # If there are rows that need tickets, write the rows to the Push Ticket
-    # Sheet. Return true once the rows have been written.
-    if tickets_to_create:
-        _, push_tickets_col_map = get_push_tickets_sheet()
-        rows_to_write = form_rows(tickets_to_create, push_tickets_col_map)
-        smartsheet_api.write_rows_to_sheet(rows_to_write,
-                                           config.push_tickets_sheet)
-        end = time.time()
-        elapsed = end - start
-        elapsed = helper.truncate(elapsed, 2)
-        logging.info("[JOB][CREATE TICKETS] took {} seconds.".format(elapsed))
-        interval_msg = modify_scheduler(elapsed)
-        logging.info(interval_msg)
-        return True
-    elif not tickets_to_create:
-        msg = str("No parent or child rows remain to be written to the "
-                  "Push Tickets Sheet.")
-        logging.info(msg)
-        end = time.time()
-        elapsed = end - start
-        elapsed = helper.truncate(elapsed, 2)
-        logging.info("[JOB][CREATE TICKETS] took {} seconds.".format(elapsed))
-        interval_msg = modify_scheduler(elapsed)
-        logging.info(interval_msg)
-        return False
+        # If there are rows that need tickets, write the rows to the Push
+        # Ticket Sheet. Return true once the rows have been written.
+        if tickets_to_create:
+            _, push_tickets_col_map = get_push_tickets_sheet()
+            rows_to_write = form_rows(tickets_to_create, push_tickets_col_map)
+            smartsheet_api.write_rows_to_sheet(rows_to_write,
+                                               config.push_tickets_sheet)
+            # Push the children as soon as their parent tickets exist.
+            watch_ticket_levels(source_sheets)
+            end = time.time()
+            elapsed = end - start
+            elapsed = helper.truncate(elapsed, 2)
+            logging.info("[JOB][CREATE TICKETS] took {} seconds."
+                         "".format(elapsed))
+            interval_msg = scheduler_controller.record_run(
+                "create_jira_interval", elapsed)
+            logging.info(interval_msg)
+            return True
+        elif not tickets_to_create:
+            msg = str("No parent or child rows remain to be written to the "
+                      "Push Tickets Sheet.")
+            logging.info(msg)
+            # Children of tickets pushed by earlier runs may still be waiting.
+            watch_ticket_levels(source_sheets)
+            end = time.time()
+            elapsed = end - start
+            elapsed = helper.truncate(elapsed, 2)
+            logging.info("[JOB][CREATE TICKETS] took {} seconds."
+                         "".format(elapsed))
+            interval_msg = scheduler_controller.record_run(
+                "create_jira_interval", elapsed)
+            logging.info(interval_msg)
+            return False
+    finally:
+        run_context.end_run()
     # else:
     #     end = time.time()
     #     elapsed = end - start
     #     elapsed = helper.truncate(elapsed, 2)
-    #     interval_msg = modify_scheduler(elapsed)
+    #     interval_msg = scheduler_controller.record_run(
+    #         "create_jira_interval", elapsed)
     #     logging.info(interval_msg)
     #     msg = str("Looping through rows rows to create Jira Tickts "
     #               "failed with an unknown error.")
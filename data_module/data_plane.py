@@ -0,0 +1,422 @@
+"""Shares the sheets loaded by the UUID, ticket creation and sync jobs.
+    Changed sheets are discovered and downloaded once per tick, and each job
+    gets its own snapshot of them while the data is fresh, so the same sheet
+    isn't downloaded once per job. Each job keeps its own schedule.
+
+    Every successful write through smartsheet_api drops the written sheet
+    and moves the generation forward. The list of changed sheets belongs to
+    the generation it was discovered in, so the next job discovers the
+    sheets again after any write. The modified date of each changed sheet
+    is passed to sheet_scheduler, which picks the sheets a job polls, out
+    of the sheets on this replica's shard. The sheets are claimed for the
+    job's run through execution_guard. Shared copies older than
+    data_plane_ttl are dropped whenever a sheet is added.
+
+    A shared sheet can be up to data_plane_ttl old, so jobs that keep a
+    watermark take it from oldest_read instead of the time the run started.
+    Sheets downloaded by the fetch stage of a work_queue pipeline count as
+    read by the job that started the pipeline.
+"""
+import copy
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+import smartsheet
+from smartsheet.types import (Boolean, EnumeratedValue, Number, String,
+                              Timestamp, TypedList, TypedObject)
+
+import app.config as config
+import app.variables as app_vars
+import data_module.execution_guard as execution_guard
+import data_module.sharding as sharding
+import data_module.sheet_scheduler as sheet_scheduler
+import data_module.smartsheet_api as smartsheet_api
+import data_module.work_queue as work_queue
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_reads_lock = threading.Lock()
+_generation = 0
+_sheet_ids = {}
+_sheets = {}
+_listening = False
+_local = threading.local()
+_fields = (Boolean, EnumeratedValue, Number, String, Timestamp, TypedObject)
+hits = 0
+misses = 0
+
+
+def generation():
+    """Gets the current generation. It moves forward every time changed
+       sheets are discovered or a sheet is written.
+
+    Returns:
+        int: The generation
+    """
+    with _lock:
+        return _generation
+
+
+def _copy_fields(model):
+    # The SDK keeps each field in a holder object that is updated in place,
+    # so a plain copy.copy would share them with the original.
+    model_copy = copy.copy(model)
+    state = vars(model_copy)
+    for key, value in state.items():
+        if isinstance(value, _fields):
+            state[key] = copy.copy(value)
+    return model_copy
+
+
+def copy_row(row):
+    """Copies a row and its cells, so they can be changed without changing
+       the shared row. Much cheaper than copy.deepcopy, so only rows that
+       are changed are copied.
+
+    Args:
+        row (smartsheet.models.Row): The row
+
+    Returns:
+        smartsheet.models.Row: The copy
+    """
+    row_copy = _copy_fields(row)
+    row_copy._cells = TypedList(smartsheet.models.Cell)
+    row_copy._cells.load([_copy_fields(cell) for cell in row.cells])
+    return row_copy
+
+
+def snapshot(sheet):
+    """Copies a sheet for one job. The copy has its own fields and list of
+       rows, so a job can add or replace rows without changing what the
+       other jobs see. The rows themselves are shared and must not be
+       changed in place. Replace a row with copy_row before changing it.
+
+    Args:
+        sheet (smartsheet.models.Sheet): The cached sheet
+
+    Returns:
+        smartsheet.models.Sheet: The copy
+    """
+    sheet_copy = _copy_fields(sheet)
+    sheet_copy._rows = TypedList(smartsheet.models.Row)
+    sheet_copy._rows.load(list(sheet.rows))
+    return sheet_copy
+
+
+def start_reads():
+    """Starts tracking the oldest data read on the current thread. Call it
+       before the first read of a run that sets a watermark.
+    """
+    _local.reads = {"oldest": None}
+
+
+def _note_read(fetched_at):
+    reads = getattr(_local, "reads", None)
+    if reads is None:
+        reads = _local.reads = {"oldest": None}
+    with _reads_lock:
+        if reads["oldest"] is None or fetched_at < reads["oldest"]:
+            reads["oldest"] = fetched_at
+
+
+def oldest_read(default):
+    """Gets when the oldest sheet or list of sheets read on the current
+       thread since start_reads was downloaded. Changes made after that may
+       be missing from what the run read, so a watermark must not pass it.
+
+    Args:
+        default (datetime): The time to use if nothing older was read, such
+            as when the run started
+
+    Returns:
+        datetime: The earlier of default and the oldest read, in UTC
+    """
+    reads = getattr(_local, "reads", None)
+    oldest = None if reads is None else reads["oldest"]
+    if oldest is None or default < oldest:
+        return default
+    return oldest
+
+
+def _fresh(fetched_at, ttl):
+    if ttl is None:
+        ttl = app_vars.data_plane_ttl
+    return time.monotonic() - fetched_at <= ttl
+
+
+def _listen():
+    # Called with _lock held.
+    global _listening
+    if not _listening:
+        smartsheet_api.add_write_listener(invalidate)
+        _listening = True
+
+
+def _evict():
+    # Called with _lock held. Drops the copies no job can use any more.
+    for key in [key for key, cached in _sheets.items()
+                if not _fresh(cached[0], None)]:
+        del _sheets[key]
+    for key in [key for key, cached in _sheet_ids.items()
+                if not _fresh(cached[0], None)]:
+        del _sheet_ids[key]
+
+
+def invalidate(sheet_id, rows_to_write=None, write_method=None, result=None):
+    """Drops a sheet that was written to and moves the generation forward.
+       Registered with smartsheet_api.add_write_listener while sheets are
+       cached.
+
+    Args:
+        sheet_id (int): The ID of the sheet that was written to
+        rows_to_write (list, optional): The rows that were sent
+        write_method (str, optional): Whether the rows were added or updated
+        result (smartsheet.models.Result, optional): The API result
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        for key in [key for key in _sheets if key[0] == sheet_id]:
+            del _sheets[key]
+    msg = str("Dropped shared copies of Sheet ID: {}. Generation is now {}."
+              "").format(sheet_id, _generation)
+    logging.debug(msg)
+
+
+def clear():
+    """Drops every shared sheet and stops listening for writes.
+    """
+    global _generation, _listening, hits, misses
+    with _lock:
+        _sheet_ids.clear()
+        _sheets.clear()
+        _generation = 0
+        hits = 0
+        misses = 0
+        if _listening:
+            smartsheet_api.remove_write_listener(invalidate)
+            _listening = False
+
+
+def get_sheet_ids(minutes, ttl=None):
+    """Gets the IDs of the sheets modified in the last N minutes. The IDs
+       are discovered once per generation while they are fresh.
+
+    Args:
+        minutes (int): Number of minutes into the past to check for changes
+        ttl (int, optional): Seconds the IDs are shared for. Defaults to
+            data_plane_ttl.
+
+    Returns:
+        list: The Sheet IDs
+    """
+    import data_module.get_data as get_data
+    global _generation
+
+    with _lock:
+        cached = _sheet_ids.get(minutes)
+        if cached is not None and cached[1] == _generation and \
+                _fresh(cached[0], ttl):
+            _note_read(cached[3])
+            return list(cached[2])
+
+    fetched_at = datetime.now(timezone.utc)
+    modified = {}
+    sheet_ids = list(set(get_data.get_all_sheet_ids(
+        minutes, config.workspace_id, config.index_sheet,
+        modified=modified)))
+    sheet_scheduler.observe(modified)
+    with _lock:
+        _evict()
+        _generation += 1
+        _sheet_ids[minutes] = (time.monotonic(), _generation, sheet_ids,
+                               fetched_at)
+        _listen()
+    _note_read(fetched_at)
+    return list(sheet_ids)
+
+
+def get_sheet(sheet_id, minutes=0, ttl=None, shared=True):
+    """Gets a snapshot of a sheet, downloading it only if no fresh copy is
+       shared.
+
+    Args:
+        sheet_id (int): The Sheet ID
+        minutes (int, optional): Number of minutes into the past to pull
+            rows for. Defaults to 0, which pulls every row.
+        ttl (int, optional): Seconds the sheet is shared for. Defaults to
+            data_plane_ttl.
+        shared (bool, optional): Set to False to always download the sheet
+            and not share it, such as when minutes changes every run.
+            Defaults to True.
+
+    Returns:
+        smartsheet.models.Sheet: The snapshot of the sheet
+    """
+    global hits, misses
+    with _lock:
+        cached = _sheets.get((sheet_id, minutes)) if shared else None
+        if cached is not None and _fresh(cached[0], ttl):
+            hits += 1
+            _note_read(cached[1])
+            return snapshot(cached[2])
+        misses += 1
+
+    fetched_at = datetime.now(timezone.utc)
+    sheet = smartsheet_api.get_sheet(sheet_id, minutes)
+    _note_read(fetched_at)
+    if not shared:
+        return sheet
+    with _lock:
+        _evict()
+        _sheets[(sheet_id, minutes)] = (time.monotonic(), fetched_at, sheet)
+        _listen()
+    return snapshot(sheet)
+
+
+def discover(minutes, ttl=None, job_name=None):
+    """Finds the sheets modified in the last N minutes that this run should
+       process. In a guarded run, only the sheets the run could claim are
+       returned, so call it from the job's own thread.
+
+    Args:
+        minutes (int): Number of minutes into the past to check for changes
+        ttl (int, optional): Seconds the IDs are shared for. Defaults to
+            data_plane_ttl.
+        job_name (str, optional): The job loading the sheets. If passed, cold
+            sheets the job polled recently are left out, see
+            sheet_scheduler.due_sheets. Defaults to None.
+
+    Returns:
+        list: The Sheet IDs
+    """
+    sheet_ids = get_sheet_ids(minutes, ttl)
+    # Other replicas process the sheets that aren't on this replica's shard.
+    sheet_ids = sharding.owned_sheets(sheet_ids)
+    if job_name is not None:
+        sheet_ids = sheet_scheduler.due_sheets(job_name, sheet_ids, minutes)
+    # Sheets held by another run of the same job are left to that run.
+    return execution_guard.claim(sheet_ids)
+
+
+def load_sheets(sheet_ids, minutes, ttl=None):
+    """Gets snapshots of a list of sheets. Only the sheets without a fresh
+       shared copy are downloaded.
+
+    Args:
+        sheet_ids (list): The Sheet IDs
+        minutes (int): Number of minutes into the past to pull rows for
+        ttl (int, optional): Seconds the sheets are shared for. Defaults to
+            data_plane_ttl.
+
+    Returns:
+        list: The snapshots of the sheets
+    """
+    import data_module.get_data as get_data
+    global hits, misses
+
+    shared = []
+    missing = []
+    with _lock:
+        for sheet_id in sheet_ids:
+            cached = _sheets.get((sheet_id, minutes))
+            if cached is not None and _fresh(cached[0], ttl):
+                shared.append(cached[2])
+                _note_read(cached[1])
+            else:
+                missing.append(sheet_id)
+        hits += len(shared)
+        misses += len(missing)
+
+    fetched = []
+    if missing:
+        fetched_at = datetime.now(timezone.utc)
+        fetched = get_data.refresh_source_sheets(missing, minutes)
+        _note_read(fetched_at)
+        now = time.monotonic()
+        with _lock:
+            _evict()
+            for sheet in fetched:
+                _sheets[(sheet.id, minutes)] = (now, fetched_at, sheet)
+            _listen()
+    msg = str("Shared {} sheets and downloaded {} for generation {}"
+              "").format(len(shared), len(fetched), generation())
+    logging.debug(msg)
+    return [snapshot(sheet) for sheet in shared + fetched]
+
+
+def fetch_stage(minutes, ttl=None, workers=None):
+    """Builds a work_queue stage that loads one sheet per Sheet ID, like
+       load_sheets. Call it from the job's own thread, so the sheets are
+       counted by oldest_read on that thread.
+
+    Args:
+        minutes (int): Number of minutes into the past to pull rows for
+        ttl (int, optional): Seconds the sheets are shared for. Defaults to
+            data_plane_ttl.
+        workers (int, optional): Number of sheets downloaded at the same
+            time. Defaults to pipeline_fetch_workers.
+
+    Returns:
+        dict: The stage. Sheets that couldn't be loaded are dropped.
+    """
+    if workers is None:
+        workers = app_vars.pipeline_fetch_workers
+    reads = getattr(_local, "reads", None)
+    if reads is None:
+        reads = _local.reads = {"oldest": None}
+
+    def fetch(sheet_id):
+        _local.reads = reads
+        sheets = load_sheets([sheet_id], minutes, ttl)
+        return sheets[0] if sheets else None
+
+    return {"name": "fetch", "function": fetch, "workers": workers}
+
+
+def fetch_sheets(name, sheet_ids, minutes, ttl=None):
+    """Loads a list of sheets with a work_queue pipeline, so several are
+       downloaded at the same time. For jobs that need every sheet before
+       they can compare rows across sheets.
+
+    Args:
+        name (str): The name of the pipeline, used in logs and metrics
+        sheet_ids (list): The Sheet IDs, from discover
+        minutes (int): Number of minutes into the past to pull rows for
+        ttl (int, optional): Seconds the sheets are shared for. Defaults to
+            data_plane_ttl.
+
+    Returns:
+        list: The snapshots of the sheets, in the order of sheet_ids
+    """
+    if not sheet_ids:
+        return []
+    sheets, _ = work_queue.run_pipeline(name, sheet_ids,
+                                        [fetch_stage(minutes, ttl)])
+    order = {sheet_id: position for position, sheet_id
+             in enumerate(sheet_ids)}
+    return sorted(sheets, key=lambda sheet: order.get(sheet.id, 0))
+
+
+def get_source_sheets(minutes, ttl=None, job_name=None):
+    """Gets snapshots of every sheet modified in the last N minutes. Only the
+       sheets without a fresh shared copy are downloaded. In a guarded run,
+       only the sheets the run could claim are returned.
+
+    Args:
+        minutes (int): Number of minutes into the past to check for changes
+        ttl (int, optional): Seconds the sheets are shared for. Defaults to
+            data_plane_ttl.
+        job_name (str, optional): The job loading the sheets. If passed, cold
+            sheets the job polled recently are left out, see
+            sheet_scheduler.due_sheets. Defaults to None.
+
+    Returns:
+        list: The Sheet IDs
+        list: The snapshots of the sheets
+    """
+    sheet_ids = discover(minutes, ttl, job_name)
+    return sheet_ids, load_sheets(sheet_ids, minutes, ttl)
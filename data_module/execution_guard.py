@@ -0,0 +1,215 @@
+"""Keeps overlapping runs of a job off each other's work. The scheduler lets
+    several runs of a job be in flight when a run takes longer than its
+    interval. Each run claims the sheets and shared work, such as the Index
+    Sheet changes, that it processes. A later run only gets what no other
+    run of the job holds, so it is shortened to the work that doesn't
+    overlap, or skipped if there is none.
+
+    The run is tracked per thread, so the sheets a job loads through
+    data_plane are claimed for the run without passing it around.
+"""
+import collections
+import functools
+import itertools
+import logging
+import threading
+from datetime import datetime, timezone
+
+import data_module.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_local = threading.local()
+_run_ids = itertools.count(1)
+_runs = {}
+_held = {}
+stats = collections.defaultdict(collections.Counter)
+
+
+def start_run(job_name):
+    """Starts a guarded run of a job on the current thread.
+
+    Args:
+        job_name (str): The name of the job
+
+    Raises:
+        TypeError: Job Name must be a str
+
+    Returns:
+        int: The run ID
+    """
+    if not isinstance(job_name, str):
+        msg = str("Job Name must be type: str, not {}"
+                  "").format(type(job_name))
+        raise TypeError(msg)
+    with _lock:
+        run_id = next(_run_ids)
+        in_flight = sum(1 for run in _runs.values()
+                        if run["job"] == job_name)
+        _runs[run_id] = {"job": job_name,
+                         "started": datetime.now(timezone.utc),
+                         "keys": set(), "asked": 0, "claimed": 0}
+    _local.run_id = run_id
+    if in_flight:
+        msg = str("[{}] {} runs still in flight. This run only takes the "
+                  "work they don't hold.").format(job_name, in_flight)
+        logging.info(msg)
+    return run_id
+
+
+def current_run():
+    """Gets the run started on the current thread.
+
+    Returns:
+        int: The run ID, or None if no guarded run is active
+    """
+    return getattr(_local, "run_id", None)
+
+
+def claim(keys, run_id=None):
+    """Claims work for a run. Keys held by another in-flight run of the
+       same job are left out.
+
+    Args:
+        keys (list): The work to claim, such as Sheet IDs
+        run_id (int, optional): The run. Defaults to the current thread's
+            run.
+
+    Returns:
+        list: The keys the run holds, in the same order. Every key if no
+              guarded run is active.
+    """
+    if run_id is None:
+        run_id = current_run()
+    keys = list(keys)
+    with _lock:
+        run = _runs.get(run_id)
+        if run is None:
+            return keys
+        claimed = []
+        for key in keys:
+            holder = _held.setdefault((run["job"], key), run_id)
+            if holder == run_id:
+                run["keys"].add(key)
+                claimed.append(key)
+        run["asked"] += len(keys)
+        run["claimed"] += len(claimed)
+    if len(claimed) < len(keys):
+        msg = str("[{}] Left {} of {} items to runs already in flight."
+                  "").format(run["job"], len(keys) - len(claimed),
+                             len(keys))
+        logging.info(msg)
+    return claimed
+
+
+def holds(key, run_id=None):
+    """Claims a single piece of shared work for a run.
+
+    Args:
+        key (str, int): The work to claim
+        run_id (int, optional): The run. Defaults to the current thread's
+            run.
+
+    Returns:
+        bool: True if the run holds the work
+    """
+    return claim([key], run_id) == [key]
+
+
+def end_run(run_id=None):
+    """Ends a run, releases its work and records whether it was skipped or
+       shortened.
+
+    Args:
+        run_id (int, optional): The run. Defaults to the current thread's
+            run.
+
+    Returns:
+        str: "complete", "shortened" or "skipped", or None if the run isn't
+             active
+    """
+    if run_id is None:
+        run_id = current_run()
+    if current_run() == run_id:
+        _local.run_id = None
+    with _lock:
+        run = _runs.pop(run_id, None)
+        if run is None:
+            return None
+        for key in run["keys"]:
+            if _held.get((run["job"], key)) == run_id:
+                del _held[(run["job"], key)]
+        if run["claimed"] == run["asked"]:
+            outcome = "complete"
+        elif run["claimed"] == 0:
+            outcome = "skipped"
+        else:
+            outcome = "shortened"
+        counts = stats[run["job"]]
+        counts["runs"] += 1
+        counts[outcome] += 1
+        skipped, shortened, runs = counts["skipped"], counts["shortened"], \
+            counts["runs"]
+    metrics.publish(str("execution_guard.{}.skipped").format(run["job"]),
+                    skipped, shortened=shortened, runs=runs)
+    if outcome != "complete":
+        msg = str("[{}] Run {}. {} of {} runs skipped and {} shortened."
+                  "").format(run["job"], outcome, skipped, runs, shortened)
+        logging.info(msg)
+    return outcome
+
+
+def safe_watermark(run_started, run_id=None):
+    """Gets the watermark a run can move to without passing the work of an
+       older run of the job that is still in flight.
+
+    Args:
+        run_started (datetime): When the run started, in UTC
+        run_id (int, optional): The run. Defaults to the current thread's
+            run.
+
+    Returns:
+        datetime: The earlier of run_started and the start of every other
+                  in-flight run of the job
+    """
+    if run_id is None:
+        run_id = current_run()
+    with _lock:
+        run = _runs.get(run_id)
+        if run is None:
+            return run_started
+        started = [other["started"] for other_id, other in _runs.items()
+                   if other_id != run_id and other["job"] == run["job"]]
+    return min([run_started] + started)
+
+
+def guarded(job_name):
+    """Decorates a job so each call is a guarded run.
+
+    Args:
+        job_name (str): The name of the job
+
+    Returns:
+        function: The decorator
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            run_id = start_run(job_name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end_run(run_id)
+        return wrapper
+    return decorator
+
+
+def reset():
+    """Forgets every run and the skipped and shortened counts.
+    """
+    with _lock:
+        _runs.clear()
+        _held.clear()
+        stats.clear()
+    _local.run_id = None
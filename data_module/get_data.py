@@ -1,5 +1,7 @@
 import json
 import logging
+import threading
+import time
 from collections import defaultdict
 from datetime import datetime
 
@@ -7,6 +9,7 @@ import app.config as config
 import pytz
 import smartsheet
 
+import data_module.data_plane as data_plane
 import data_module.helper as helper
 import data_module.smartsheet_api as smartsheet_api
 import app.variables as app_vars
@@ -15,6 +18,60 @@ logger = logging.getLogger(__name__)
 
 utc = pytz.UTC
 
+_column_lock = threading.Lock()
+_column_maps = {}
+
+
+def get_cached_column_map(sheet_id, ttl=None):
+    """Gets the column map cached for a sheet, if it is still fresh.
+
+    Args:
+        sheet_id (int): The Sheet ID
+        ttl (int, optional): Seconds before a cached map expires. Defaults to
+            column_map_ttl.
+
+    Returns:
+        dict: The map of Column Names: Column IDs, or None if the sheet isn't
+              cached or the map expired
+    """
+    if ttl is None:
+        ttl = app_vars.column_map_ttl
+    with _column_lock:
+        cached = _column_maps.get(sheet_id)
+        if cached is None:
+            return None
+        cached_at, col_map = cached
+        if time.monotonic() - cached_at > ttl:
+            del _column_maps[sheet_id]
+            return None
+        return col_map
+
+
+def cache_column_map(sheet_id, col_map):
+    """Caches a sheet's column map so later reads can request only the
+       columns they need.
+
+    Args:
+        sheet_id (int): The Sheet ID
+        col_map (dict): The map of Column Names: Column IDs
+    """
+    with _column_lock:
+        _column_maps[sheet_id] = (time.monotonic(), dict(col_map))
+
+
+def clear_column_maps(sheet_id=None):
+    """Drops the cached column map for a sheet, or for every sheet.
+
+    Args:
+        sheet_id (int, optional): The Sheet ID. Defaults to None, which
+            clears every sheet.
+    """
+    with _column_lock:
+        if sheet_id is None:
+            _column_maps.clear()
+        else:
+            _column_maps.pop(sheet_id, None)
+
 
 def refresh_source_sheets(sheet_ids, minutes=0):
     """Creates a dict of source sheets. If minutes is defined, only gathers
@@ -296,12 +353,15 @@ def get_blank_uuids(source_sheets):
         return None
 
 
-def load_jira_index(index_sheet_id=app_vars.dev_jira_idx_sheet):
-    """Create indexes on the Jira index rows. Pulls from the Smartsheet API
-       every time to get the most up-to-date version of the sheet data.
+def load_jira_index(index_sheet_id=app_vars.dev_jira_idx_sheet, minutes=0):
+    """Create indexes on the Jira index rows. The full sheet is shared with
+       the other jobs while it is fresh, and dropped as soon as it is
+       written. Rows modified in the last N minutes are always downloaded.
 
     Args:
         index_sheet (int): The Jira index sheet to load. Defaults to Dev.
+        minutes (int, optional): Only load rows modified in the last N
+            minutes. Defaults to 0, which loads every row.
 
     Raises:
         TypeError: Index Sheet must be an int.
@@ -328,7 +388,10 @@ def load_jira_index(index_sheet_id=app_vars.dev_jira_idx_sheet):
                              app_vars.dev_jira_idx_sheet)
         raise ValueError(msg)
 
-    jira_index_sheet = smartsheet_api.get_sheet(index_sheet_id, minutes=0)
+    # The minutes since a watermark change every run, so there is nothing
+    # to share.
+    jira_index_sheet = data_plane.get_sheet(index_sheet_id, minutes,
+                                            shared=not minutes)
     msg = str("{} rows loaded from sheet ID: {} | Sheet name: {}"
               "").format(len(jira_index_sheet.rows), jira_index_sheet.id,
                          jira_index_sheet.name)
@@ -395,7 +458,8 @@ def get_sub_indexes(project_data):
 
 def get_all_sheet_ids(minutes=app_vars.dev_minutes,
                       workspace_id=app_vars.dev_workspace_id,
-                      index_sheet=app_vars.dev_jira_idx_sheet):
+                      index_sheet=app_vars.dev_jira_idx_sheet,
+                      modified=None):
     """Get all the sheet IDs from every sheet in every folder, subfolder and
        workspace as defined in the workspace_id.
 
@@ -405,6 +469,8 @@ def get_all_sheet_ids(minutes=app_vars.dev_minutes,
         workspace_id (int, list): One or more Workspaces to check for changes.
                                   Defaults to Dev
         index_sheet (int): The Index Sheet ID. Defaults to Dev
+        modified (dict, optional): Filled with {Sheet ID: modified date} for
+                                   each sheet in the list. Defaults to None.
 
     Raises:
         TypeError: Minutes must be an Int
@@ -473,6 +539,8 @@ def get_all_sheet_ids(minutes=app_vars.dev_minutes,
                                 modified_since, sheet_modified, sheet['name'])
                             logging.debug(msg)
                             sheet_ids.append(sheet['id'])
+                            if modified is not None:
+                                modified[sheet['id']] = sheet_modified
                         else:
                             msg = str("False | Cutoff: {} | Sheet Modified "
                                       "Date: {} | Sheet Name: {}").format(
@@ -1,3 +1,4 @@
+import json
 import logging
 import math
 import os
@@ -6,6 +7,8 @@ from pathlib import Path
 
 import smartsheet
 
+import app.variables as app_vars
+
 logger = logging.getLogger(__name__)
 
 
@@ -373,3 +376,70 @@ def get_local_paths():
     fixtures_dir = p.parent
     fixtures_dir = str(str(fixtures_dir) + "/test_fixtures")
     return root, fixtures_dir
+
+
+def get_state_path(file_name):
+    """Get the full path of a state file, creating the state directory if
+       it doesn't exist yet.
+
+    Args:
+        file_name (str): The name of the state file
+
+    Raises:
+        TypeError: File name must be a str
+        ValueError: File name must not be empty
+
+    Returns:
+        str: The full path to the state file
+    """
+    if not isinstance(file_name, str):
+        msg = str("File name must be type: str, not {}"
+                  "").format(type(file_name))
+        raise TypeError(msg)
+    if not file_name:
+        msg = str("File name must not be empty.")
+        raise ValueError(msg)
+
+    root, _ = get_local_paths()
+    state_dir = os.path.join(root, app_vars.state_location)
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, file_name)
+
+
+def load_state(file_name, default=None):
+    """Load JSON state saved by a previous run.
+
+    Args:
+        file_name (str): The name of the state file
+        default (any, optional): The value to return if the file doesn't
+            exist or can't be parsed. Defaults to None.
+
+    Returns:
+        any: The parsed JSON data, or the default value
+    """
+    path = get_state_path(file_name)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except ValueError:
+        msg = str("State file {} could not be parsed. Starting with "
+                  "empty state.").format(path)
+        logging.warning(msg)
+        return default
+
+
+def save_state(file_name, data):
+    """Save JSON state so that it can be loaded by the next run. Writes to a
+       temporary file first so that a crash never leaves a partial file.
+
+    Args:
+        file_name (str): The name of the state file
+        data (any): JSON serializable data to save
+    """
+    path = get_state_path(file_name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
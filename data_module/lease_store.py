@@ -0,0 +1,308 @@
+"""Stores leases and queued Index Sheet writes in a SQLite file shared by
+    every replica on the host. A lease has a name, an owner and an expiry;
+    the owner keeps it by acquiring it again before it expires. Rows a
+    replica can't write to the Jira Index Sheet itself are queued in the
+    outbox for the replica that holds the Index Sheet lease. The outbox
+    keeps one queued value per row and column, the newest. Writes that
+    keep failing are moved to the dead letter table so they don't hold up
+    the rest of the queue.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import app.variables as app_vars
+import data_module.helper as helper
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_path = None
+
+
+def set_path(path):
+    """Points the lease store at a different file.
+
+    Args:
+        path (str): The path to the SQLite file, or None for the default in
+            the state directory
+    """
+    global _path
+    with _lock:
+        _path = path
+
+
+def get_path():
+    """Gets the path to the SQLite file.
+
+    Returns:
+        str: The path set with set_path, or lease_store_name in the state
+             directory
+    """
+    with _lock:
+        path = _path
+    if path is None:
+        path = helper.get_state_path(app_vars.lease_store_name)
+    return path
+
+
+def connect():
+    """Opens the lease store, creating its tables if needed. Transactions
+       are started explicitly so a lease is checked and taken in one step.
+
+    Returns:
+        sqlite3.Connection: The connection
+    """
+    conn = sqlite3.connect(get_path(), timeout=app_vars.lease_store_timeout,
+                           isolation_level=None)
+    conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, "
+                 "owner TEXT NOT NULL, expires REAL NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY "
+                 "AUTOINCREMENT, sheet_id INTEGER NOT NULL, rows TEXT NOT "
+                 "NULL, created REAL NOT NULL, attempts INTEGER NOT NULL "
+                 "DEFAULT 0)")
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(outbox)")]
+    if "attempts" not in columns:
+        # Outboxes created before writes were retried.
+        conn.execute("ALTER TABLE outbox ADD COLUMN attempts INTEGER NOT "
+                     "NULL DEFAULT 0")
+    conn.execute("CREATE TABLE IF NOT EXISTS dead_letter (id INTEGER "
+                 "PRIMARY KEY, sheet_id INTEGER NOT NULL, rows TEXT NOT "
+                 "NULL, created REAL NOT NULL, attempts INTEGER NOT NULL, "
+                 "failed REAL NOT NULL)")
+    return conn
+
+
+def acquire(name, owner, ttl, now=None):
+    """Takes or renews a lease. The lease is granted if it is free, expired
+       or already held by the owner.
+
+    Args:
+        name (str): The name of the lease
+        owner (str): The replica asking for the lease
+        ttl (int, float): Seconds until the lease expires
+        now (float, optional): The current time. Defaults to time.time().
+
+    Raises:
+        TypeError: Name must be a str
+        TypeError: Owner must be a str
+        ValueError: TTL must be positive
+
+    Returns:
+        bool: True if the owner holds the lease
+    """
+    if not isinstance(name, str):
+        msg = str("Name must be type: str, not {}").format(type(name))
+        raise TypeError(msg)
+    if not isinstance(owner, str):
+        msg = str("Owner must be type: str, not {}").format(type(owner))
+        raise TypeError(msg)
+    if ttl <= 0:
+        msg = str("TTL must be a positive number, not {}").format(ttl)
+        raise ValueError(msg)
+    if now is None:
+        now = time.time()
+    with closing(connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires FROM leases WHERE "
+                               "name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, owner, "
+                         "expires) VALUES (?, ?, ?)", (name, owner, now + ttl))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+    return True
+
+
+def release(name, owner):
+    """Gives up a lease held by the owner.
+
+    Args:
+        name (str): The name of the lease
+        owner (str): The replica holding the lease
+
+    Returns:
+        bool: True if the lease was released
+    """
+    with closing(connect()) as conn:
+        cursor = conn.execute("DELETE FROM leases WHERE name = ? AND "
+                              "owner = ?", (name, owner))
+        return cursor.rowcount > 0
+
+
+def holders(prefix, now=None):
+    """Gets the leases that haven't expired.
+
+    Args:
+        prefix (str): Only leases whose name starts with the prefix
+        now (float, optional): The current time. Defaults to time.time().
+
+    Returns:
+        dict: {lease name: owner}
+    """
+    if now is None:
+        now = time.time()
+    with closing(connect()) as conn:
+        rows = conn.execute("SELECT name, owner FROM leases WHERE "
+                            "substr(name, 1, ?) = ? AND expires > ?",
+                            (len(prefix), prefix, now)).fetchall()
+    return dict(rows)
+
+
+def _cell_keys(rows):
+    return set((row.get("id"), cell.get("columnId"))
+               for row in rows for cell in row.get("cells", []))
+
+
+def _drop_cells(rows, keys):
+    # Removes the cells in keys, and the rows left without cells.
+    kept = []
+    for row in rows:
+        cells = row.get("cells", [])
+        remaining = [cell for cell in cells
+                     if (row.get("id"), cell.get("columnId")) not in keys]
+        if len(remaining) == len(cells):
+            kept.append(row)
+        elif remaining:
+            kept.append(dict(row, cells=remaining))
+    return kept
+
+
+def enqueue(sheet_id, rows, created=None):
+    """Queues rows to be written to a sheet by the replica that owns it.
+       Cells already queued for the same row and column are replaced, so a
+       replica that queues the same rows every run doesn't fill the outbox.
+
+    Args:
+        sheet_id (int): The ID of the sheet to write to
+        rows (list): The rows, as dicts from Row.to_dict()
+        created (float, optional): When the data the rows were built from
+            was read. Queued cells are dropped if their row changes after
+            this. Defaults to time.time().
+
+    Returns:
+        int: The ID of the queued write
+    """
+    if created is None:
+        created = time.time()
+    keys = _cell_keys(rows)
+    with closing(connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            queued = conn.execute("SELECT id, rows FROM outbox WHERE "
+                                  "sheet_id = ?", (sheet_id,)).fetchall()
+            for write_id, data in queued:
+                old_rows = json.loads(data)
+                if not keys & _cell_keys(old_rows):
+                    continue
+                kept = _drop_cells(old_rows, keys)
+                if kept:
+                    conn.execute("UPDATE outbox SET rows = ? WHERE id = ?",
+                                 (json.dumps(kept), write_id))
+                else:
+                    conn.execute("DELETE FROM outbox WHERE id = ?",
+                                 (write_id,))
+            cursor = conn.execute("INSERT INTO outbox (sheet_id, rows, "
+                                  "created) VALUES (?, ?, ?)",
+                                  (sheet_id, json.dumps(rows), created))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+    return cursor.lastrowid
+
+
+def pending(sheet_id, limit=None):
+    """Gets the queued writes for a sheet, oldest first.
+
+    Args:
+        sheet_id (int): The ID of the sheet
+        limit (int, optional): The most writes to return. Defaults to all.
+
+    Returns:
+        list: (write ID, rows, created) tuples
+    """
+    with closing(connect()) as conn:
+        rows = conn.execute("SELECT id, rows, created FROM outbox WHERE "
+                            "sheet_id = ? ORDER BY id LIMIT ?",
+                            (sheet_id, -1 if limit is None else limit)
+                            ).fetchall()
+    return [(write_id, json.loads(data), created)
+            for write_id, data, created in rows]
+
+
+def ack(write_ids):
+    """Removes queued writes once they were written.
+
+    Args:
+        write_ids (list): The IDs of the writes
+
+    Returns:
+        int: The number of writes removed
+    """
+    if not write_ids:
+        return 0
+    with closing(connect()) as conn:
+        cursor = conn.execute("DELETE FROM outbox WHERE id IN ({})".format(
+            ", ".join("?" * len(write_ids))), list(write_ids))
+        return cursor.rowcount
+
+
+def fail(write_id, max_attempts=None):
+    """Records a failed attempt at a queued write. Once the write has
+       failed max_attempts times it is moved to the dead letter table.
+
+    Args:
+        write_id (int): The ID of the write
+        max_attempts (int, optional): The most attempts before the write is
+            given up on. Defaults to outbox_max_attempts.
+
+    Returns:
+        bool: True if the write was moved to the dead letter table
+    """
+    if max_attempts is None:
+        max_attempts = app_vars.outbox_max_attempts
+    with closing(connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE outbox SET attempts = attempts + 1 WHERE "
+                         "id = ?", (write_id,))
+            cursor = conn.execute("INSERT INTO dead_letter (id, sheet_id, "
+                                  "rows, created, attempts, failed) SELECT "
+                                  "id, sheet_id, rows, created, attempts, "
+                                  "? FROM outbox WHERE id = ? AND attempts "
+                                  ">= ?", (time.time(), write_id,
+                                           max_attempts))
+            dead = cursor.rowcount > 0
+            if dead:
+                conn.execute("DELETE FROM outbox WHERE id = ?", (write_id,))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+    return dead
+
+
+def dead_letters(sheet_id):
+    """Gets the queued writes for a sheet that were given up on.
+
+    Args:
+        sheet_id (int): The ID of the sheet
+
+    Returns:
+        list: (write ID, rows, attempts) tuples, oldest first
+    """
+    with closing(connect()) as conn:
+        rows = conn.execute("SELECT id, rows, attempts FROM dead_letter "
+                            "WHERE sheet_id = ? ORDER BY id",
+                            (sheet_id,)).fetchall()
+    return [(write_id, json.loads(data), attempts)
+            for write_id, data, attempts in rows]
@@ -0,0 +1,153 @@
+"""Keeps a persistent index of the last known cell link status of each
+    synced cell, keyed by Sheet ID, Row ID and Column ID. A cell is only
+    checked again with helper.has_cell_link once its row has been modified
+    since the status was recorded. The index can also list every broken
+    link in one pass for reporting.
+"""
+import copy
+import logging
+import threading
+
+import app.variables as app_vars
+import data_module.helper as helper
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+broken_statuses = ("Broken", "BROKEN")
+"""Link statuses that mean the source cell can't be reached. Type: tuple
+    """
+
+_lock = threading.Lock()
+_state = None
+hits = 0
+misses = 0
+
+
+def load_index():
+    """Loads the link status index from disk if it hasn't been loaded yet.
+
+    Returns:
+        dict: The index in the form of {"cells": {"Sheet ID:Row ID:Column
+              ID": {"status": str, "source": [Sheet ID, Row ID, Column ID],
+              "modified": ISO date}}}
+    """
+    global _state
+    with _lock:
+        if _state is None:
+            _state = helper.load_state(app_vars.link_status_name, {})
+            _state.setdefault("cells", {})
+            msg = str("Loaded link status for {} cells"
+                      "").format(len(_state["cells"]))
+            logging.debug(msg)
+        if smartsheet_api.dry_run_active():
+            # Planning only. The plan stages its changes in its own copy,
+            # so the real jobs never see them.
+            return smartsheet_api.dry_run_state(
+                "link_status", lambda: copy.deepcopy(_state))
+        return _state
+
+
+def save_index():
+    """Writes the link status index to disk so that the next run can use it.
+
+    Returns:
+        int: The number of cells in the index
+    """
+    with _lock:
+        if _state is None:
+            return 0
+        if smartsheet_api.dry_run_active():
+            # Planning only. Keep the state on disk as it was.
+            return 0
+        helper.save_state(app_vars.link_status_name, _state)
+        return len(_state["cells"])
+
+
+def reset_index():
+    """Drops the in-memory index so it is reloaded from disk on next use,
+       and resets the hit and miss counts.
+    """
+    global _state, hits, misses
+    with _lock:
+        _state = None
+        hits = 0
+        misses = 0
+
+
+def status_key(sheet_id, row_id, column_id):
+    """Builds the key a cell is stored under.
+
+    Args:
+        sheet_id (int): The Sheet ID
+        row_id (int): The Row ID
+        column_id (int): The Column ID
+
+    Returns:
+        str: The key in the form of "Sheet ID:Row ID:Column ID"
+    """
+    return "{}:{}:{}".format(sheet_id, row_id, column_id)
+
+
+def _source(cell):
+    link = cell.link_in_from_cell
+    if link is None or link.sheet_id is None:
+        return None
+    return [link.sheet_id, link.row_id, link.column_id]
+
+
+def cell_status(sheet_id, row, cell):
+    """Gets the incoming cell link status of a cell. Uses the recorded
+       status if the row hasn't been modified since it was recorded,
+       otherwise checks the cell and records the result.
+
+    Args:
+        sheet_id (int): The ID of the sheet the row is on
+        row (smartsheet.models.Row): The row the cell is on
+        cell (smartsheet.models.Cell): The cell to check
+
+    Returns:
+        str: The status from helper.has_cell_link
+    """
+    global hits, misses
+    state = load_index()
+    key = status_key(sheet_id, row.id, cell.column_id)
+    modified = row.modified_at.isoformat() \
+        if row.modified_at is not None else None
+    with _lock:
+        entry = state["cells"].get(key)
+        if entry is not None and modified is not None and \
+                entry["modified"] == modified:
+            hits += 1
+            return entry["status"]
+        misses += 1
+
+    status = helper.has_cell_link(cell, 'In')
+    with _lock:
+        state["cells"][key] = {"status": status, "source": _source(cell),
+                               "modified": modified}
+    return status
+
+
+def broken_links(sheet_id=None):
+    """Lists every cell whose last known link status is broken.
+
+    Args:
+        sheet_id (int, optional): Only list cells on this sheet. Defaults to
+            None, which lists every sheet.
+
+    Returns:
+        list: (Sheet ID, Row ID, Column ID, source) tuples, where source is
+              the [Sheet ID, Row ID, Column ID] the cell links from
+    """
+    state = load_index()
+    broken = []
+    with _lock:
+        for key, entry in state["cells"].items():
+            if entry["status"] not in broken_statuses:
+                continue
+            cell_sheet, row_id, column_id = (int(x) for x in key.split(":"))
+            if sheet_id is not None and cell_sheet != sheet_id:
+                continue
+            broken.append((cell_sheet, row_id, column_id, entry["source"]))
+    return sorted(broken)
@@ -0,0 +1,77 @@
+"""Keeps the latest value of each metric the jobs publish, with the details
+    that explain it, so they can be logged or read back while the app runs.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+def publish(name, value, **details):
+    """Sets the latest value of a metric.
+
+    Args:
+        name (str): The name of the metric, such as
+                    scheduler.create_jira_interval.interval
+        value (int, float): The value of the metric
+        **details: Any details that explain the value
+
+    Raises:
+        TypeError: Name must be a str
+        TypeError: Value must be an int or float
+
+    Returns:
+        dict: The metric as stored, with its value, details and the time it
+              was published
+    """
+    if not isinstance(name, str):
+        msg = str("Name must be type: str, not {}").format(type(name))
+        raise TypeError(msg)
+    if not isinstance(value, (int, float)):
+        msg = str("Value must be type: int or float, not {}"
+                  "").format(type(value))
+        raise TypeError(msg)
+    metric = {"value": value, "details": dict(details),
+              "published": time.time()}
+    with _lock:
+        _metrics[name] = metric
+    msg = str("[METRIC] {}={} {}").format(name, value, details)
+    logging.debug(msg)
+    return metric
+
+
+def get(name):
+    """Gets the latest value of a metric.
+
+    Args:
+        name (str): The name of the metric
+
+    Returns:
+        dict: The metric, or None if it was never published
+    """
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            return None
+        return dict(metric)
+
+
+def snapshot():
+    """Gets every metric published since startup.
+
+    Returns:
+        dict: {name: metric}
+    """
+    with _lock:
+        return {name: dict(metric) for name, metric in _metrics.items()}
+
+
+def clear():
+    """Drops every metric.
+    """
+    with _lock:
+        _metrics.clear()
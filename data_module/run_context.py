@@ -0,0 +1,263 @@
+"""Holds the sheets loaded for a single create_tickets run so each stage can
+    share them instead of downloading them again. While a run is active,
+    every successful write_rows_to_sheet is patched into the shared copy of
+    the sheet from the rows the API returns, so later stages see the writes
+    without another get_sheet. The rows of sheets from data_plane are shared
+    with other jobs, so a row is replaced with a copy before it is patched.
+
+    Each run has its own context, kept per thread, so overlapping runs of
+    create_tickets don't share or drop each other's sheets.
+"""
+import logging
+import threading
+
+import smartsheet
+
+import data_module.data_plane as data_plane
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_local = threading.local()
+_active = 0
+
+
+def start_run():
+    """Starts a new run with no sheets loaded on the current thread. Any
+       previous run on the thread is dropped.
+
+    Returns:
+        dict: The run's context, holding its sheets
+    """
+    global _active
+    context = {"names": {}, "sheets": {}}
+    with _lock:
+        if current_run() is None:
+            _active += 1
+        _local.run = context
+        smartsheet_api.add_write_listener(apply_result)
+    return context
+
+
+def current_run():
+    """Gets the run started on the current thread.
+
+    Returns:
+        dict: The run's context, or None if no run is active
+    """
+    return getattr(_local, "run", None)
+
+
+def end_run():
+    """Ends the current thread's run and drops every sheet it loaded. Stops
+       listening for writes once no run is active.
+
+    Returns:
+        int: The number of sheets the run held
+    """
+    global _active
+    with _lock:
+        context = current_run()
+        if context is None:
+            return 0
+        _local.run = None
+        _active -= 1
+        if not _active:
+            smartsheet_api.remove_write_listener(apply_result)
+    return len(context["sheets"])
+
+
+def run_active():
+    """Checks whether a run is in progress on the current thread.
+
+    Returns:
+        bool: True if start_run was called and end_run has not been
+    """
+    return current_run() is not None
+
+
+def add_sheet(sheet, name=None):
+    """Shares a sheet with the rest of the run. Does nothing outside a run.
+
+    Args:
+        sheet (smartsheet.models.Sheet): The sheet to share
+        name (str, optional): A name the sheet can also be found by, such
+            as "index" or "push". Defaults to None.
+    """
+    context = current_run()
+    if context is None:
+        return
+    context["sheets"][sheet.id] = sheet
+    if name is not None:
+        context["names"][name] = sheet.id
+
+
+def add_sheets(sheets):
+    """Shares a list of sheets with the rest of the run.
+
+    Args:
+        sheets (list): The smartsheet.models.Sheet objects to share
+    """
+    for sheet in sheets:
+        add_sheet(sheet)
+
+
+def get_sheet(key):
+    """Gets a sheet loaded earlier in the run.
+
+    Args:
+        key (int, str): The Sheet ID, or the name passed to add_sheet
+
+    Returns:
+        smartsheet.models.Sheet: The shared sheet, or None if it wasn't
+            loaded or no run is active
+    """
+    context = current_run()
+    if context is None:
+        return None
+    sheet_id = context["names"].get(key, key)
+    return context["sheets"].get(sheet_id)
+
+
+def _cell_value(cell):
+    if cell.value is not None:
+        return cell.value
+    object_value = cell.object_value
+    if object_value is None:
+        return None
+    return getattr(object_value, "value", object_value)
+
+
+def _written_cell(cell, local_cell):
+    # Builds the cell as the API will return it. The SDK can't clear a value
+    # or hyperlink in place, so the local cell is replaced.
+    written = smartsheet.models.Cell()
+    written.column_id = cell.column_id
+    value = _cell_value(cell)
+    if value is not None:
+        written.value = value
+        written.display_value = str(value)
+    hyperlink = cell.hyperlink
+    if hyperlink is None and local_cell is not None:
+        hyperlink = local_cell.hyperlink
+    if hyperlink and not isinstance(hyperlink,
+                                    smartsheet.models.ExplicitNull):
+        written.hyperlink = hyperlink
+    return written
+
+
+def apply_rows(sheet_id, rows):
+    """Applies the rows that were sent with the "update" method to the
+       shared copy of the sheet. Used when the API result has no rows.
+
+    Args:
+        sheet_id (int): The ID of the sheet the rows were written to
+        rows (list): The smartsheet.models.Row objects that were written
+
+    Returns:
+        int: The number of cells applied
+    """
+    sheet = get_sheet(sheet_id)
+    if sheet is None:
+        return 0
+    row_positions = {row.id: position for position, row
+                     in enumerate(sheet.rows)}
+    applied = 0
+    for row in rows:
+        row_position = row_positions.get(row.id)
+        if row_position is None:
+            continue
+        local_row = data_plane.copy_row(sheet.rows[row_position])
+        sheet.rows[row_position] = local_row
+        positions = {cell.column_id: position for position, cell
+                     in enumerate(local_row.cells)}
+        for cell in row.cells:
+            position = positions.get(cell.column_id)
+            if position is None:
+                local_row.cells.append(_written_cell(cell, None))
+                positions[cell.column_id] = len(local_row.cells) - 1
+            else:
+                local_row.cells[position] = _written_cell(
+                    cell, local_row.cells[position])
+            applied += 1
+    msg = str("Applied {} written cells to Sheet ID: {}"
+              "").format(applied, sheet_id)
+    logging.debug(msg)
+    return applied
+
+
+def _patch_rows(sheet, written_rows, write_method):
+    row_positions = {row.id: position for position, row
+                     in enumerate(sheet.rows)}
+    patched = 0
+    for row in written_rows:
+        row_position = row_positions.get(row.id)
+        if row_position is None:
+            if write_method == "add":
+                sheet.rows.append(row)
+                patched += 1
+            continue
+        local_row = data_plane.copy_row(sheet.rows[row_position])
+        sheet.rows[row_position] = local_row
+        positions = {cell.column_id: position for position, cell
+                     in enumerate(local_row.cells)}
+        for cell in row.cells:
+            position = positions.get(cell.column_id)
+            if position is None:
+                local_row.cells.append(cell)
+                positions[cell.column_id] = len(local_row.cells) - 1
+            else:
+                local_row.cells[position] = cell
+        if row.modified_at is not None:
+            local_row.modified_at = row.modified_at
+        if row.version is not None:
+            local_row.version = row.version
+        patched += 1
+    return patched
+
+
+def apply_result(sheet_id, rows_to_write, write_method, result):
+    """Patches a successful write into the shared copy of the sheet.
+       Registered with smartsheet_api.add_write_listener while a run is
+       active. Uses the rows returned by the API, with their cells, modified
+       date and version, and falls back to the rows that were sent.
+
+       Only writes made by the run itself are patched. Listeners are called
+       on the thread that wrote, so writes by other jobs or runs find no run
+       on the thread, or a run without the sheet. Writes recorded by a dry
+       run are patched from the rows that were sent, so later stages of the
+       plan see the planned state.
+
+    Args:
+        sheet_id (int): The ID of the sheet that was written to
+        rows_to_write (list): The rows that were sent
+        write_method (str): Whether the rows were added or updated
+        result (smartsheet.models.Result): The result returned by the API
+
+    Returns:
+        int: The number of rows patched
+    """
+    sheet = get_sheet(sheet_id)
+    if sheet is None:
+        return 0
+    written_rows = [row for row in (getattr(result, "result", None) or [])
+                    if isinstance(row, smartsheet.models.Row)]
+    if written_rows:
+        patched = _patch_rows(sheet, written_rows, write_method)
+    elif write_method == "update":
+        apply_rows(sheet_id, rows_to_write)
+        patched = len(rows_to_write)
+    elif smartsheet_api.dry_run_active():
+        # Recorded rows never get a Row ID, but the plan still sees them.
+        patched = _patch_rows(sheet, rows_to_write, write_method)
+    else:
+        # Added rows have no Row ID until the API returns them.
+        patched = 0
+    version = getattr(result, "version", None)
+    if version is not None:
+        sheet.version = version
+    msg = str("Patched {} written rows into Sheet ID: {}"
+              "").format(patched, sheet_id)
+    logging.debug(msg)
+    return patched
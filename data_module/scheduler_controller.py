@@ -0,0 +1,177 @@
+"""Sizes the interval of each APScheduler job from how long the job takes to
+    run. A moving average of the runtime is kept per job and the interval is
+    set so the job spends a target fraction of it running, within the bounds
+    set for the job. The interval is read from and written to the job's
+    trigger, and every decision is published as a metric. Runs made during a
+    dry run are planned, not real, so they leave the jobs alone.
+"""
+import logging
+import math
+import threading
+
+from apscheduler.triggers.interval import IntervalTrigger
+
+import app.config as config
+import app.variables as app_vars
+import data_module.metrics as metrics
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_runtimes = {}
+
+
+def get_bounds(job_name):
+    """Gets the minimum and maximum interval for a job.
+
+    Args:
+        job_name (str): The name of the APScheduler job
+
+    Returns:
+        tuple: The minimum and maximum interval in seconds
+    """
+    return app_vars.scheduler_bounds.get(job_name,
+                                         app_vars.scheduler_default_bounds)
+
+
+def update_runtime(job_name, elapsed, alpha=None):
+    """Adds a runtime to the job's moving average. The first runtime seeds
+       the average.
+
+    Args:
+        job_name (str): The name of the APScheduler job
+        elapsed (int, float): How long the job took, in seconds
+        alpha (float, optional): The weight of the new runtime. Defaults to
+            scheduler_alpha.
+
+    Returns:
+        float: The new average runtime in seconds
+    """
+    if alpha is None:
+        alpha = app_vars.scheduler_alpha
+    with _lock:
+        average = _runtimes.get(job_name)
+        if average is None:
+            average = float(elapsed)
+        else:
+            average = alpha * elapsed + (1 - alpha) * average
+        _runtimes[job_name] = average
+    return average
+
+
+def get_runtime(job_name):
+    """Gets the job's average runtime.
+
+    Args:
+        job_name (str): The name of the APScheduler job
+
+    Returns:
+        float: The average runtime in seconds, or None if the job hasn't
+               run
+    """
+    with _lock:
+        return _runtimes.get(job_name)
+
+
+def reset():
+    """Drops the average runtime of every job.
+    """
+    with _lock:
+        _runtimes.clear()
+
+
+def target_interval(runtime, bounds, utilization=None):
+    """Works out the interval that keeps a job busy for the target fraction
+       of the interval.
+
+    Args:
+        runtime (float): The average runtime in seconds
+        bounds (tuple): The minimum and maximum interval in seconds
+        utilization (float, optional): The fraction of the interval the job
+            should spend running. Defaults to scheduler_utilization.
+
+    Returns:
+        int: The interval in seconds, rounded up to the whole second
+        str: Why the interval was chosen: "utilization", "minimum" or
+             "maximum"
+    """
+    if utilization is None:
+        utilization = app_vars.scheduler_utilization
+    minimum, maximum = bounds
+    interval = math.ceil(runtime / utilization)
+    if interval < minimum:
+        return minimum, "minimum"
+    if interval > maximum:
+        return maximum, "maximum"
+    return interval, "utilization"
+
+
+def record_run(job_name, elapsed):
+    """Records how long a job took and reschedules the job if its interval
+       no longer fits the average runtime. Cron jobs are left alone.
+
+    Args:
+        job_name (str): The name of the APScheduler job to modify
+        elapsed (int, float): The amount of time elapsed from the start of
+            the job to the end of the job, in seconds
+
+    Raises:
+        TypeError: Job Name must be a str
+        TypeError: Elapsed must be an int or float
+        ValueError: Elapsed must be a positive int or float
+
+    Returns:
+        str: A message about whether the interval was modified or remains
+             the same
+    """
+    if not isinstance(job_name, str):
+        msg = str("Job Name must be type: str, not {}"
+                  "").format(type(job_name))
+        raise TypeError(msg)
+    if not isinstance(elapsed, (int, float)) or isinstance(elapsed, bool):
+        msg = str("Elapsed must be type: int or float, not {}"
+                  "").format(type(elapsed))
+        raise TypeError(msg)
+    if elapsed <= 0:
+        msg = str("Elapsed must be a positive int or float, not {}"
+                  "").format(elapsed)
+        raise ValueError(msg)
+    if smartsheet_api.dry_run_active():
+        msg = str("[JOB][{}] Dry run. No changes to interval."
+                  "").format(job_name)
+        return msg
+
+    runtime = update_runtime(job_name, elapsed)
+    job = config.scheduler.get_job(job_name)
+    if job is None:
+        msg = str("Job {} not found in the job store. No changes made."
+                  "").format(job_name)
+        return msg
+    if not isinstance(job.trigger, IntervalTrigger):
+        msg = str("[JOB][{}] is not an interval job. Timing is {}. No "
+                  "changes will be made.").format(job_name, job.trigger)
+        return msg
+
+    current = job.trigger.interval.total_seconds()
+    interval, reason = target_interval(runtime, get_bounds(job_name))
+    tolerance = current * app_vars.scheduler_tolerance
+    if abs(interval - current) <= tolerance:
+        action = "kept"
+        msg = str("[JOB][{}] average runtime {:.2f} seconds fits the "
+                  "{:g} second interval. No changes to interval."
+                  "").format(job_name, runtime, current)
+    else:
+        action = "increased" if interval > current else "reduced"
+        config.scheduler.reschedule_job(
+            job.id, trigger=IntervalTrigger(seconds=interval))
+        msg = str("[JOB][{}] average runtime {:.2f} seconds, {} interval "
+                  "from {:g} to {} seconds ({})."
+                  "").format(job_name, runtime, action, current, interval,
+                             reason)
+    metrics.publish(str("scheduler.{}.interval").format(job_name),
+                    interval if action != "kept" else current,
+                    action=action, reason=reason, elapsed=elapsed,
+                    runtime=runtime, previous=current,
+                    utilization=app_vars.scheduler_utilization)
+    return msg
@@ -0,0 +1,372 @@
+"""Splits the sheets between replicas so several containers can run the jobs
+    without writing the same sheet twice. Each replica names itself with the
+    SHARD_REPLICA_ID environment variable and keeps a lease in the lease
+    store. The live replicas are placed on a consistent hash ring and each
+    sheet belongs to the replica that follows it on the ring, so only the
+    sheets of a replica whose lease expires move to the others.
+
+    The Jira Index Sheet is written by one replica at a time, the holder of
+    the Index Sheet lease. The other replicas queue their Index rows in the
+    lease store's outbox for it. Queued cells whose row was edited after the
+    data they were built from was read are dropped instead of written.
+    Without SHARD_REPLICA_ID the replica owns every sheet and writes the
+    Index Sheet itself.
+"""
+import bisect
+import hashlib
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+import smartsheet
+
+import app.config as config
+import app.variables as app_vars
+import data_module.lease_store as lease_store
+import data_module.metrics as metrics
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+replica_prefix = "replica:"
+"""Prefix of the lease each live replica holds. Type: str
+    """
+index_lease = "leader:index_sheet"
+"""Lease held by the replica that writes the Jira Index Sheet. Type: str
+    """
+
+_lock = threading.Lock()
+_replicas = ()
+_ring = []
+_leader = False
+_rebalanced_at = None
+
+
+def get_replica_id():
+    """Gets the name of this replica.
+
+    Returns:
+        str: The SHARD_REPLICA_ID environment variable, or None if sharding
+             is off
+    """
+    return os.environ.get("SHARD_REPLICA_ID") or None
+
+
+def enabled():
+    """Checks whether this replica shares the sheets with others.
+
+    Returns:
+        bool: True if SHARD_REPLICA_ID is set
+    """
+    return get_replica_id() is not None
+
+
+def ring_hash(key):
+    """Hashes a key onto the ring. The hash is stable between processes.
+
+    Args:
+        key (str, int): The key to hash
+
+    Returns:
+        int: The position on the ring
+    """
+    digest = hashlib.md5(str(key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def build_ring(replicas, vnodes=None):
+    """Places each replica on the ring several times, so the sheets are split
+       evenly.
+
+    Args:
+        replicas (list): The names of the live replicas
+        vnodes (int, optional): The points per replica. Defaults to
+            shard_vnodes.
+
+    Returns:
+        list: Sorted (position, replica) tuples
+    """
+    if vnodes is None:
+        vnodes = app_vars.shard_vnodes
+    return sorted((ring_hash(str("{}#{}").format(replica, point)), replica)
+                  for replica in replicas for point in range(vnodes))
+
+
+def ring_owner(ring, key):
+    """Finds the replica that owns a key.
+
+    Args:
+        ring (list): The ring from build_ring
+        key (str, int): The key, such as a Sheet ID
+
+    Returns:
+        str: The replica, or None if the ring is empty
+    """
+    if not ring:
+        return None
+    position = bisect.bisect(ring, (ring_hash(key), ""))
+    return ring[position % len(ring)][1]
+
+
+def heartbeat(now=None):
+    """Renews this replica's lease, tries to take the Index Sheet lease and
+       rebuilds the ring if a replica joined or its lease expired. The Index
+       Sheet owner also writes the rows queued by the other replicas.
+       Scheduled as an interval job by app.main.
+
+    Args:
+        now (float, optional): The current time. Defaults to time.time().
+
+    Returns:
+        str: A message about the replicas and the Index Sheet owner
+    """
+    global _replicas, _ring, _leader, _rebalanced_at
+    replica_id = get_replica_id()
+    if replica_id is None:
+        return "Sharding is off. This replica owns every sheet."
+
+    ttl = app_vars.shard_lease_seconds
+    lease_store.acquire(replica_prefix + replica_id, replica_id, ttl, now)
+    leader = lease_store.acquire(index_lease, replica_id, ttl, now)
+    replicas = tuple(sorted(lease_store.holders(replica_prefix,
+                                                now).values()))
+    with _lock:
+        changed = replicas != _replicas
+        if changed:
+            # The first ring of a process doesn't move any sheets, so
+            # watermarks are only dropped when an existing ring changes.
+            if _replicas:
+                _rebalanced_at = datetime.now(timezone.utc)
+            _replicas = replicas
+            _ring = build_ring(replicas)
+        if leader != _leader:
+            msg = str("Replica {} {} the Jira Index Sheet lease."
+                      "").format(replica_id, "took" if leader else "lost")
+            logging.info(msg)
+        _leader = leader
+    if changed:
+        msg = str("Rebalanced sheets across {} replicas: {}"
+                  "").format(len(replicas), ", ".join(replicas))
+        logging.info(msg)
+    metrics.publish("sharding.replicas", len(replicas), leader=leader,
+                    replica=replica_id, rebalanced=changed)
+    if leader:
+        flush_outbox()
+    return str("Replica {} of {}. Index Sheet owner: {}").format(
+        replica_id, len(replicas), leader)
+
+
+def owns(sheet_id):
+    """Checks whether this replica processes a sheet.
+
+    Args:
+        sheet_id (int): The Sheet ID
+
+    Returns:
+        bool: True if the sheet belongs to this replica
+    """
+    return owned_sheets([sheet_id]) == [sheet_id]
+
+
+def owned_sheets(sheet_ids):
+    """Filters a list of sheets to the ones this replica processes.
+
+    Args:
+        sheet_ids (list): The Sheet IDs
+
+    Returns:
+        list: The Sheet IDs that belong to this replica, in the same order.
+              Empty until the heartbeat job has built the ring. Reading
+              sheets never writes to the lease store.
+    """
+    replica_id = get_replica_id()
+    if replica_id is None:
+        return list(sheet_ids)
+    with _lock:
+        ring = _ring
+    if not ring:
+        logging.info("No ring yet. Waiting for the first heartbeat before "
+                     "processing any sheets.")
+        return []
+    return [sheet_id for sheet_id in sheet_ids
+            if ring_owner(ring, sheet_id) == replica_id]
+
+
+def is_leader():
+    """Checks whether this replica writes the Jira Index Sheet.
+
+    Returns:
+        bool: True if this replica holds the Index Sheet lease, or sharding
+              is off
+    """
+    if not enabled():
+        return True
+    with _lock:
+        return _leader
+
+
+def check_watermark(watermark):
+    """Drops a watermark set before the sheets were last rebalanced. Sheets
+       that moved to this replica may have edits from before the watermark
+       that no replica synced.
+
+    Args:
+        watermark (datetime): A job's watermark, or None
+
+    Returns:
+        datetime: The watermark, or None if the sheets were rebalanced since
+    """
+    with _lock:
+        rebalanced_at = _rebalanced_at
+    if watermark is None or rebalanced_at is None:
+        return watermark
+    if watermark < rebalanced_at:
+        return None
+    return watermark
+
+
+# Cell fields cleared with ExplicitNull. Row.to_dict() writes them as None,
+# which smartsheet.models.Row would otherwise read back as unset.
+_nullable_fields = {"value": "value", "objectValue": "object_value",
+                    "hyperlink": "hyperlink",
+                    "linkInFromCell": "link_in_from_cell"}
+
+
+def load_row(data):
+    """Rebuilds a row queued as a dict, clearing the cell fields that were
+       cleared when it was queued.
+
+    Args:
+        data (dict): The row from Row.to_dict()
+
+    Returns:
+        smartsheet.models.Row: The row
+    """
+    row = smartsheet.models.Row(data)
+    for cell, cell_data in zip(row.cells, data.get("cells", [])):
+        for key, field in _nullable_fields.items():
+            if key in cell_data and cell_data[key] is None:
+                setattr(cell, field, smartsheet.models.ExplicitNull())
+    return row
+
+
+def write_index_rows(rows, index_sheet, read_at=None):
+    """Writes rows to the Jira Index Sheet, or queues them for the Index
+       Sheet owner. During a dry run the rows are recorded like any other
+       write and never queued.
+
+    Args:
+        rows (list): The smartsheet.models.Row objects to update
+        index_sheet (smartsheet.models.Sheet): The Jira Index Sheet
+        read_at (datetime, optional): When the data the rows were built from
+            was read, such as data_plane.oldest_read. Defaults to now.
+
+    Returns:
+        str: "written" if the rows were written, "queued" if the Index Sheet
+             owner will write them later, or "failed"
+    """
+    if is_leader() or smartsheet_api.dry_run_active():
+        result = smartsheet_api.write_rows_to_sheet(rows, index_sheet,
+                                                    "update")
+        if getattr(result, "message", None) == "SUCCESS":
+            return "written"
+        return "failed"
+    created = None if read_at is None else read_at.timestamp()
+    lease_store.enqueue(index_sheet.id, [row.to_dict() for row in rows],
+                        created)
+    msg = str("Queued {} Index rows for the Index Sheet owner."
+              "").format(len(rows))
+    logging.info(msg)
+    return "queued"
+
+
+def merge_outbox(writes):
+    """Merges queued writes into one row per Index row. Cells whose row was
+       changed on the Index Sheet after the data they were built from was
+       read are dropped, so they don't overwrite newer edits. So are cells
+       of rows that no longer exist.
+
+    Args:
+        writes (list): (write ID, rows, created) tuples from
+            lease_store.pending
+
+    Returns:
+        list: The smartsheet.models.Row objects to write
+    """
+    row_ids = sorted(set(row["id"] for _, rows, _ in writes for row in rows))
+    column_ids = sorted(set(cell["columnId"] for _, rows, _ in writes
+                            for row in rows for cell in row.get("cells", [])))
+    if not row_ids or not column_ids:
+        return []
+    live_sheet = smartsheet_api.get_sheet(config.index_sheet, 0,
+                                          row_ids=row_ids,
+                                          column_ids=column_ids)
+    modified = {row.id: row.modified_at for row in live_sheet.rows}
+    merged = {}
+    dropped = 0
+    for _, rows, created in writes:
+        queued_at = datetime.fromtimestamp(created, timezone.utc)
+        for data in rows:
+            row = load_row(data)
+            if row.id not in modified or (modified[row.id] is not None and
+                                          modified[row.id] > queued_at):
+                dropped += len(row.cells)
+                continue
+            if row.id not in merged:
+                merged[row.id] = row
+                continue
+            for cell in row.cells:
+                merged[row.id].cells.append(cell)
+    if dropped:
+        msg = str("Dropped {} queued Index cells. Their rows changed after "
+                  "the cells were queued.").format(dropped)
+        logging.info(msg)
+    return list(merged.values())
+
+
+def flush_outbox(limit=None):
+    """Writes the Index rows queued by the other replicas in one pass, see
+       merge_outbox. If the write fails, the queued writes are retried on
+       the next heartbeat, until a write has failed outbox_max_attempts
+       times and is moved to the dead letter table.
+
+    Args:
+        limit (int, optional): The most queued writes to send. Defaults to
+            all.
+
+    Returns:
+        int: The number of queued writes sent
+    """
+    writes = lease_store.pending(config.index_sheet, limit)
+    if not writes:
+        return 0
+    write_ids = [write_id for write_id, _, _ in writes]
+    rows = merge_outbox(writes)
+    if rows:
+        result = smartsheet_api.write_rows_to_sheet(rows, config.index_sheet,
+                                                    "update")
+        if getattr(result, "message", None) != "SUCCESS":
+            for write_id in write_ids:
+                if lease_store.fail(write_id):
+                    msg = str("Gave up on queued Index write {} after {} "
+                              "attempts. Moved it to the dead letter table."
+                              "").format(write_id,
+                                         app_vars.outbox_max_attempts)
+                    logging.warning(msg)
+            return 0
+    lease_store.ack(write_ids)
+    msg = str("Wrote {} queued Index writes.").format(len(write_ids))
+    logging.info(msg)
+    return len(write_ids)
+
+
+def reset():
+    """Forgets the replicas, the ring and the Index Sheet lease.
+    """
+    global _replicas, _ring, _leader, _rebalanced_at
+    with _lock:
+        _replicas = ()
+        _ring = []
+        _leader = False
+        _rebalanced_at = None
@@ -0,0 +1,228 @@
+"""Polls busy sheets on every run and quiet sheets less often. The workspace
+    listing gives the modified date of each sheet, which is used to keep an
+    average of the time between edits. A sheet is hot while it is edited
+    more often than sheet_hot_seconds and was edited within that time, and
+    is polled on every run of a job. Every other sheet is cold and is only
+    polled once every sheet_cold_seconds per job. Sheets move between the
+    tiers as their edits speed up or slow down.
+
+    Runs that look back further than sheet_sweep_minutes, such as the daily
+    cron jobs, are full sweeps and poll every changed sheet. Polls made
+    during a dry run aren't recorded, so planning doesn't put off a sheet
+    for the real runs.
+"""
+import logging
+import threading
+from datetime import datetime, timezone
+
+import app.variables as app_vars
+import data_module.metrics as metrics
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+HOT = "hot"
+COLD = "cold"
+
+_lock = threading.Lock()
+_sheets = {}
+_deferred = {}
+
+
+def _entry(sheet_id):
+    # Called with _lock held.
+    return _sheets.setdefault(sheet_id, {"modified": None, "interval": None,
+                                         "tier": HOT, "polled": {}})
+
+
+def _tier(entry, now):
+    modified = entry["modified"]
+    if modified is None:
+        # A sheet without a known edit is polled until it has one.
+        return HOT
+    if (now - modified).total_seconds() > app_vars.sheet_hot_seconds:
+        return COLD
+    interval = entry["interval"]
+    if interval is not None and interval > app_vars.sheet_hot_seconds:
+        return COLD
+    return HOT
+
+
+def _set_tier(sheet_id, entry, now):
+    # Called with _lock held.
+    tier = _tier(entry, now)
+    if tier != entry["tier"]:
+        action = "Promoted" if tier == HOT else "Demoted"
+        msg = str("{} Sheet ID: {} to the {} tier.").format(
+            action, sheet_id, tier)
+        logging.info(msg)
+        entry["tier"] = tier
+    return tier
+
+
+def observe(modified, alpha=None):
+    """Records the modified date of each sheet and updates the average time
+       between its edits.
+
+    Args:
+        modified (dict): {Sheet ID: modified date} from the workspace
+                         listing
+        alpha (float, optional): The weight of the newest gap between
+            edits. Defaults to scheduler_alpha.
+
+    Returns:
+        int: The number of sheets with a new edit
+    """
+    if not isinstance(modified, dict):
+        msg = str("Modified must be type: dict, not {}").format(
+            type(modified))
+        raise TypeError(msg)
+    if alpha is None:
+        alpha = app_vars.scheduler_alpha
+    edited = 0
+    with _lock:
+        for sheet_id, modified_at in modified.items():
+            entry = _entry(sheet_id)
+            last = entry["modified"]
+            if last is not None and modified_at <= last:
+                continue
+            if last is not None:
+                gap = (modified_at - last).total_seconds()
+                if entry["interval"] is None:
+                    entry["interval"] = gap
+                else:
+                    entry["interval"] = alpha * gap + \
+                        (1 - alpha) * entry["interval"]
+            entry["modified"] = modified_at
+            edited += 1
+    return edited
+
+
+def get_modified(sheet_id):
+    """Gets the last modified date seen for a sheet.
+
+    Args:
+        sheet_id (int): The Sheet ID
+
+    Returns:
+        datetime: The modified date from the workspace listing, or None if
+                  the sheet was never seen
+    """
+    with _lock:
+        entry = _sheets.get(sheet_id)
+        if entry is None:
+            return None
+        return entry["modified"]
+
+
+def get_tier(sheet_id, now=None):
+    """Gets the tier of a sheet.
+
+    Args:
+        sheet_id (int): The Sheet ID
+        now (datetime, optional): The current time in UTC. Defaults to now.
+
+    Returns:
+        str: "hot" or "cold". Sheets that were never seen are hot.
+    """
+    if now is None:
+        now = datetime.now(timezone.utc)
+    with _lock:
+        entry = _sheets.get(sheet_id)
+        if entry is None:
+            return HOT
+        return _set_tier(sheet_id, entry, now)
+
+
+def due_sheets(job_name, sheet_ids, minutes, now=None):
+    """Picks the changed sheets a job should poll on this run. Hot sheets are
+       always polled. Cold sheets are polled if the job hasn't polled them
+       within sheet_cold_seconds. Every sheet is polled when the run looks
+       back further than sheet_sweep_minutes, or when the look back is too
+       short to still hold an edit that was put off.
+
+    Args:
+        job_name (str): The name of the job polling the sheets
+        sheet_ids (list): The IDs of the sheets modified in the look back
+        minutes (int): Number of minutes the run looks back
+        now (datetime, optional): The current time in UTC. Defaults to now.
+
+    Raises:
+        TypeError: Job Name must be a str
+        TypeError: Sheet IDs must be a list
+        TypeError: Minutes must be an int
+
+    Returns:
+        list: The IDs of the sheets to poll
+    """
+    if not isinstance(job_name, str):
+        msg = str("Job Name must be type: str, not {}"
+                  "").format(type(job_name))
+        raise TypeError(msg)
+    if not isinstance(sheet_ids, list):
+        msg = str("Sheet IDs must be type: list, not {}"
+                  "").format(type(sheet_ids))
+        raise TypeError(msg)
+    if not isinstance(minutes, int):
+        msg = str("Minutes must be type: int, not {}").format(type(minutes))
+        raise TypeError(msg)
+    if now is None:
+        now = datetime.now(timezone.utc)
+
+    sweep = minutes > app_vars.sheet_sweep_minutes or \
+        minutes * 60 <= app_vars.sheet_cold_seconds
+    planning = smartsheet_api.dry_run_active()
+    due = []
+    deferred = {}
+    tiers = {HOT: 0, COLD: 0}
+    with _lock:
+        for sheet_id in sheet_ids:
+            entry = _entry(sheet_id)
+            tier = _set_tier(sheet_id, entry, now)
+            tiers[tier] += 1
+            polled = entry["polled"].get(job_name)
+            if not sweep and tier == COLD and polled is not None and \
+                    (now - polled).total_seconds() < \
+                    app_vars.sheet_cold_seconds:
+                deferred[sheet_id] = polled
+                continue
+            if not planning:
+                entry["polled"][job_name] = now
+            due.append(sheet_id)
+        if not planning:
+            _deferred[job_name] = deferred
+
+    metrics.publish(str("sheet_scheduler.{}.deferred").format(job_name),
+                    len(deferred), due=len(due), hot=tiers[HOT],
+                    cold=tiers[COLD], sweep=sweep)
+    msg = str("[{}] Polling {} of {} changed sheets. {} hot, {} cold, {} put "
+              "off.").format(job_name, len(due), len(sheet_ids), tiers[HOT],
+                             tiers[COLD], len(deferred))
+    logging.debug(msg)
+    return due
+
+
+def safe_watermark(job_name, run_started):
+    """Gets the watermark a job can move to without skipping the edits on
+       sheets it put off. A put off sheet still needs every edit made since
+       the job last polled it.
+
+    Args:
+        job_name (str): The name of the job
+        run_started (datetime): When the run started, in UTC
+
+    Returns:
+        datetime: The earlier of run_started and the oldest poll of a sheet
+                  the job put off on its last run
+    """
+    with _lock:
+        polled = list(_deferred.get(job_name, {}).values())
+    return min([run_started] + polled)
+
+
+def reset():
+    """Forgets every sheet.
+    """
+    with _lock:
+        _sheets.clear()
+        _deferred.clear()
@@ -1,4 +1,7 @@
+import contextvars
 import logging
+import threading
+import time
 import backoff
 
 import smartsheet
@@ -7,6 +10,24 @@ import data_module.helper as helper
 import app.variables as app_vars
 import app.config as config
 
+# Token bucket shared by every API call in the process so that concurrent
+# jobs and prefetch threads stay under the Smartsheet rate limit together.
+_rate_lock = threading.Lock()
+_rate_tokens = float(app_vars.api_rate_limit)
+_rate_updated = time.monotonic()
+
+# Set by start_dry_run for the planning thread only. While set, API calls
+# are counted and writes are recorded instead of being sent to Smartsheet.
+# Worker threads started by the planned job run in a copy of its context,
+# so they take part in the dry run and jobs on other threads don't.
+_dry_run_lock = threading.Lock()
+_dry_run = contextvars.ContextVar("dry_run", default=None)
+
+# Called after every successful write so in-memory copies of the sheet can
+# be patched instead of downloaded again.
+_listener_lock = threading.Lock()
+_write_listeners = []
+
 
 def set_smartsheet_client():
     """Set the SMARTSHEET_ACCESS_TOKEN by pulling from the AWS Secrets API,
@@ -18,6 +39,174 @@ def set_smartsheet_client():
     smartsheet_client = config.smartsheet_client
 
 
+def throttle(kind="read", rate_limit=None):
+    """Blocks until the shared rate limit allows another API request. Tokens
+       refill continuously at rate_limit per minute, up to a full minute of
+       requests.
+
+    Args:
+        kind (str, optional): The kind of request, counted during a dry run.
+            One of read, history or write. Defaults to read.
+        rate_limit (int, optional): Requests allowed per minute. Defaults to
+            api_rate_limit.
+
+    Returns:
+        float: The number of seconds spent waiting
+    """
+    global _rate_tokens, _rate_updated
+    recording = _dry_run.get()
+    if recording is not None:
+        with _dry_run_lock:
+            recording["calls"][kind] += 1
+    if rate_limit is None:
+        rate_limit = app_vars.api_rate_limit
+    per_second = rate_limit / 60.0
+    waited = 0.0
+    while True:
+        with _rate_lock:
+            now = time.monotonic()
+            _rate_tokens = min(float(rate_limit),
+                               _rate_tokens + (now - _rate_updated)
+                               * per_second)
+            _rate_updated = now
+            if _rate_tokens >= 1:
+                _rate_tokens -= 1
+                return waited
+            wait = (1 - _rate_tokens) / per_second
+        time.sleep(wait)
+        waited += wait
+
+
+def start_dry_run():
+    """Starts counting API calls on the current thread. Until stop_dry_run
+       is called, writes made on the thread, or by workers running in a
+       copy of its context, are recorded per sheet and reported as
+       successful without being sent. Other threads keep writing to
+       Smartsheet.
+    """
+    _dry_run.set({"calls": {"read": 0, "history": 0, "write": 0},
+                  "sheets": {}, "state": {}})
+
+
+def stop_dry_run():
+    """Stops the current thread's dry run and returns what it recorded.
+
+    Returns:
+        dict: The calls made per kind, and the rows and cells that would
+              have been written per Sheet ID
+    """
+    recorded = _dry_run.get()
+    _dry_run.set(None)
+    return recorded
+
+
+def dry_run_active():
+    """Checks whether the current thread is in a dry run.
+
+    Returns:
+        bool: True if writes are being recorded instead of sent
+    """
+    return _dry_run.get() is not None
+
+
+def dry_run_state(name, load):
+    """Gets the dry run's own copy of a job's in-memory state, such as the
+       sync snapshot. The first call makes the copy with load, so the plan
+       can stage changes without the real jobs seeing them.
+
+    Args:
+        name (str): The name of the state
+        load (function): Returns a copy of the live state
+
+    Returns:
+        The dry run's copy, or None if no dry run is active
+    """
+    recording = _dry_run.get()
+    if recording is None:
+        return None
+    with _dry_run_lock:
+        if name not in recording["state"]:
+            recording["state"][name] = load()
+        return recording["state"][name]
+
+
+def record_write(sheet_id, sheet_name, rows_to_write, write_method):
+    """Records the rows a write would have sent during a dry run.
+
+    Args:
+        sheet_id (int): The ID of the sheet being written to
+        sheet_name (str): The name of the sheet being written to
+        rows_to_write (list): The rows that would have been written
+        write_method (str): Whether the rows would be added or updated
+    """
+    calls = -(-len(rows_to_write) // 125)
+    recording = _dry_run.get()
+    if recording is None:
+        return
+    with _dry_run_lock:
+        recording["calls"]["write"] += calls
+        sheet = recording["sheets"].setdefault(
+            str(sheet_id), {"name": sheet_name, "rows_added": 0,
+                            "rows_updated": 0, "cells": 0,
+                            "write_calls": 0})
+        if write_method == "add":
+            sheet["rows_added"] += len(rows_to_write)
+        else:
+            sheet["rows_updated"] += len(rows_to_write)
+        sheet["cells"] += sum(len(row.cells) for row in rows_to_write)
+        sheet["write_calls"] += calls
+
+
+def add_write_listener(listener):
+    """Registers a function to call after every successful write.
+
+    Args:
+        listener (function): Called with the Sheet ID, the rows written, the
+            write method and the API result
+    """
+    with _listener_lock:
+        if listener not in _write_listeners:
+            _write_listeners.append(listener)
+
+
+def remove_write_listener(listener):
+    """Stops calling a function registered with add_write_listener.
+
+    Args:
+        listener (function): The function to remove
+    """
+    with _listener_lock:
+        if listener in _write_listeners:
+            _write_listeners.remove(listener)
+
+
+def notify_write(sheet_id, rows_to_write, write_method, result):
+    """Passes a successful write to every registered listener. A listener
+       that fails is logged and skipped so the write itself still succeeds.
+
+    Args:
+        sheet_id (int): The ID of the sheet that was written to
+        rows_to_write (list): The rows that were sent
+        write_method (str): Whether the rows were added or updated
+        result (smartsheet.models.Result): The result returned by the API
+
+    Returns:
+        int: The number of listeners called
+    """
+    if getattr(result, "message", None) != "SUCCESS":
+        return 0
+    with _listener_lock:
+        listeners = list(_write_listeners)
+    for listener in listeners:
+        try:
+            listener(sheet_id, rows_to_write, write_method, result)
+        except Exception as e:
+            msg = str("Write listener {} failed for Sheet ID: {}: {}"
+                      "").format(listener, sheet_id, e)
+            logging.warning(msg)
+    return len(listeners)
+
+
 @backoff.on_exception(backoff.expo,
                       smartsheet.exceptions.SmartsheetException)
 def write_rows_to_sheet(rows_to_write, sheet, write_method="add"):
@@ -73,6 +262,18 @@ def write_rows_to_sheet(rows_to_write, sheet, write_method="add"):
         sheet_id = sheet
         sheet_name = "Sheet Name not provided."
 
+    if dry_run_active():
+        # Planning only. Record the write and report it as successful so
+        # the job carries on as it would after a real write.
+        record_write(sheet_id, sheet_name, rows_to_write, write_method)
+        msg = str("Dry run. Skipped writing {} rows to Sheet ID: {}"
+                  "").format(len(rows_to_write), sheet_id)
+        logging.info(msg)
+        result = smartsheet.models.Result({"message": "SUCCESS",
+                                           "resultCode": 0})
+        notify_write(sheet_id, rows_to_write, write_method, result)
+        return result
+
     if rows_to_write:
         msg = str("Writing {} rows back to Sheet ID: {} "
                   "| Sheet Name: {}").format(len(rows_to_write),
@@ -87,6 +288,7 @@ def write_rows_to_sheet(rows_to_write, sheet, write_method="add"):
                 chunked_cells = helper.chunks(rows_to_write, 125)
                 for i in chunked_cells:
                     try:
+                        throttle("write")
                         result = config.smartsheet_client.Sheets.add_rows(
                             sheet_id, i)
                         msg = str("Smartsheet API responded with the "
@@ -94,12 +296,14 @@ def write_rows_to_sheet(rows_to_write, sheet, write_method="add"):
                                   "").format(result.message,
                                              result.result_code)
                         logging.info(msg)
+                        notify_write(sheet_id, i, write_method, result)
                     except smartsheet.exceptions.SmartsheetException as result:
                         logging.warning(result.message)
                         return result
                 return result
             else:
                 try:
+                    throttle("write")
                     result = config.smartsheet_client.Sheets.add_rows(
                         sheet_id, rows_to_write)
                     msg = str("Smartsheet API responded with the "
@@ -107,6 +311,8 @@ def write_rows_to_sheet(rows_to_write, sheet, write_method="add"):
                               "").format(result.message,
                                          result.result_code)
                     logging.info(msg)
+                    notify_write(sheet_id, rows_to_write, write_method,
+                                 result)
                     return result
                 except Exception as result:
                     logging.warning(result.message)
@@ -120,6 +326,7 @@ def write_rows_to_sheet(rows_to_write, sheet, write_method="add"):
                 chunked_cells = helper.chunks(rows_to_write, 125)
                 for i in chunked_cells:
                     try:
+                        throttle("write")
                         result = config.smartsheet_client.Sheets.update_rows(
                             sheet_id, i)
                         msg = str("Smartsheet API responded with the "
@@ -127,18 +334,22 @@ def write_rows_to_sheet(rows_to_write, sheet, write_method="add"):
                                   "").format(result.message,
                                              result.result_code)
                         logging.info(msg)
+                        notify_write(sheet_id, i, write_method, result)
                     except smartsheet.exceptions.SmartsheetException as result:
                         logging.warning(result.message)
                         return result
                 return result
             else:
                 try:
+                    throttle("write")
                     result = config.smartsheet_client.Sheets.update_rows(
                         sheet_id, rows_to_write)
                     msg = str("Smartsheet API responded with the "
                               "following message: {} | Result Code: {}."
                               "").format(result.message, result.result_code)
                     logging.info(msg)
+                    notify_write(sheet_id, rows_to_write, write_method,
+                                 result)
                     return result
                 except Exception as result:
                     logging.warning(result.message)
@@ -192,12 +403,14 @@ def get_workspace(workspace_id=app_vars.dev_workspace_id):
                 raise ValueError(msg)
 
     if isinstance(workspace_id, int):
+        throttle("read")
         workspace = config.smartsheet_client.Workspaces.get_workspace(
             workspace_id, load_all=True)
         return workspace
     elif isinstance(workspace_id, list):
         workspaces = []
         for ws_id in workspace_id:
+            throttle("read")
             workspace = config.smartsheet_client.Workspaces.get_workspace(
                 ws_id, load_all=True)
             workspaces.append(workspace)
@@ -206,7 +419,8 @@ def get_workspace(workspace_id=app_vars.dev_workspace_id):
 
 @backoff.on_exception(backoff.expo,
                       smartsheet.exceptions.SmartsheetException)
-def get_sheet(sheet_id, minutes=app_vars.dev_minutes):
+def get_sheet(sheet_id, minutes=app_vars.dev_minutes, row_ids=None,
+              column_ids=None):
     """Gets a sheet from the Smartsheet API via Sheet ID.
 
     Args:
@@ -214,11 +428,16 @@ def get_sheet(sheet_id, minutes=app_vars.dev_minutes):
         minutes (int, optional): Limits sheets pulled from the API to the
         number of mintes in the past that the sheet was last modified. Defaults
         to dev_minutes.
+        row_ids (list, optional): Only pull these Row IDs. Defaults to None,
+        which pulls every row.
+        column_ids (list, optional): Only pull cells in these Column IDs.
+        Defaults to None, which pulls every column.
 
     Raises:
         TypeError: Sheet ID must be an INT to query the API correctly
         TypeError: Minutes must be an INT to calculate how far in the past
         the API should pull data
+        TypeError: Row IDs and Column IDs must be lists of INTs
 
     Returns:
         smartsheet.models.Sheet: Returns the sheet in dict/json format for
@@ -236,6 +455,21 @@ def get_sheet(sheet_id, minutes=app_vars.dev_minutes):
         msg = str("Time travel to the future not supported. Minutes must be "
                   "greater than or equal to zero.").format(type(minutes))
         raise ValueError(msg)
+    for ids in (row_ids, column_ids):
+        if ids is None:
+            continue
+        if not isinstance(ids, list) or \
+                not all(isinstance(x, int) for x in ids):
+            msg = str("Row and Column IDs must be type: list of int "
+                      "not type: {}").format(type(ids))
+            raise TypeError(msg)
+
+    # Only ask the API for the rows and columns we need
+    options = {}
+    if row_ids:
+        options["row_ids"] = row_ids
+    if column_ids:
+        options["column_ids"] = column_ids
 
     # If minutes is greater than zero, calculate n minutes into the past and
     # return the datetime. Pass that to the API to only get rows modified
@@ -243,20 +477,23 @@ def get_sheet(sheet_id, minutes=app_vars.dev_minutes):
     if minutes > 0:
         _, modified_since = helper.get_timestamp(minutes)
 
+        throttle("read")
         sheet = config.smartsheet_client.Sheets.get_sheet(
             sheet_id, include='object_value', level=2,
-            rows_modified_since=modified_since)
+            rows_modified_since=modified_since, **options)
     # If minutes is zero, get all rows regardless of modified date
     elif minutes == 0:
+        throttle("read")
         sheet = config.smartsheet_client.Sheets.get_sheet(
-            sheet_id, include='object_value', level=2)
+            sheet_id, include='object_value', level=2, **options)
     # If somehow minutes is less than zero but doesn't raise a ValueError,
     # default to dev_minutes and return the sheet.
     else:
         modified_since, _ = helper.get_timestamp(app_vars.dev_minutes)
+        throttle("read")
         sheet = config.smartsheet_client.Sheets.get_sheet(
             sheet_id, include='object_value', level=2,
-            rows_modified_since=modified_since)
+            rows_modified_since=modified_since, **options)
     return sheet
 
 
@@ -296,6 +533,7 @@ def get_row(sheet_id, row_id):
                   "").format()
         raise ValueError(msg)
 
+    throttle("read")
     row = config.smartsheet_client.Sheets.get_row(sheet_id, row_id,
                                                   include='objectValue')
     return row
@@ -306,6 +544,7 @@ def get_row(sheet_id, row_id):
 def get_cell_history(sheet_id, row_id, column_id,
                      page_size=1, page=1):
     try:
+        throttle("history")
         response = config.smartsheet_client.Cells.get_cell_history(
             sheet_id, row_id, column_id, page_size, page)
         logging.info("{}, type: {}".format(response, type(response)))
@@ -0,0 +1,113 @@
+"""Orders the Program Plan rows that are waiting on a parent ticket. Each row
+    points at its parent through the ParentUUID column, so the waiting rows
+    form a dependency graph across every sheet. The graph is split into
+    topological levels: a level can be pushed to Jira as soon as the tickets
+    for the level before it exist.
+"""
+import logging
+
+import app.variables as app_vars
+import data_module.helper as helper
+import data_module.ticket_rules as ticket_rules
+
+logger = logging.getLogger(__name__)
+
+parent_uuid_col = "ParentUUID"
+"""Column that holds the UUID of the parent row. Type: str
+    """
+parent_ticket_col = "Parent Ticket"
+"""Column that holds the parent row's Jira Ticket. Type: str
+    """
+waiting_rules = ("parent_pending", ticket_rules.UNMATCHED)
+"""Rules that match a row whose parent ticket doesn't exist yet. Type: tuple
+    """
+
+
+def waiting_rows(source_sheets, columns):
+    """Finds every row that asks for a ticket but is waiting on a parent
+       ticket that is still being created.
+
+    Args:
+        source_sheets (list): A list of Smartsheet Sheet objects
+        columns (list): The columns copied into the row data for a new
+                        ticket
+
+    Returns:
+        dict: {UUID: node}, where each node holds the sheet, row, row data,
+              parent UUID and Jira column ID for the row
+    """
+    nodes = {}
+    for sheet in source_sheets:
+        col_map = helper.get_column_map(sheet)
+        if app_vars.uuid_col not in col_map or \
+                parent_uuid_col not in col_map:
+            continue
+        compiled = ticket_rules.compile_sheet(col_map, columns)
+        for row in sheet.rows:
+            rule, _, values = ticket_rules.classify_row(row, compiled)
+            if rule not in waiting_rules:
+                continue
+            data = ticket_rules.row_data(row, compiled, values)
+            if data.get(app_vars.jira_col) not in ticket_rules.create_values:
+                continue
+            if data.get(parent_ticket_col) not in \
+                    ticket_rules.create_values + (ticket_rules.pending_value,):
+                continue
+            parent_uuid = data.get(parent_uuid_col)
+            if not parent_uuid:
+                # Without the parent's UUID the parent ticket can't be found.
+                continue
+            nodes[data[app_vars.uuid_col]] = {
+                "sheet": sheet,
+                "row": row,
+                "data": data,
+                "parent_uuid": str(parent_uuid),
+                "jira_column_id": compiled["jira_column_id"]
+            }
+    return nodes
+
+
+def topological_levels(nodes):
+    """Splits the waiting rows into levels. Level 0 waits on parents outside
+       the graph, which were pushed earlier. Every later level waits on the
+       level before it.
+
+    Args:
+        nodes (dict): The nodes from waiting_rows
+
+    Returns:
+        list: A list of levels, each a sorted list of UUIDs. Rows in a
+              parent cycle are left out.
+    """
+    children = {}
+    remaining = {}
+    for uuid, node in nodes.items():
+        parent = node["parent_uuid"]
+        if parent == uuid:
+            # A row that is its own parent can never be placed.
+            remaining[uuid] = 1
+        elif parent in nodes:
+            children.setdefault(parent, []).append(uuid)
+            remaining[uuid] = 1
+        else:
+            remaining[uuid] = 0
+
+    levels = []
+    level = sorted(uuid for uuid, count in remaining.items() if count == 0)
+    placed = 0
+    while level:
+        levels.append(level)
+        placed += len(level)
+        next_level = []
+        for uuid in level:
+            for child in children.get(uuid, []):
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    next_level.append(child)
+        level = sorted(next_level)
+
+    if placed < len(nodes):
+        msg = str("{} rows are in a parent cycle and were skipped."
+                  "").format(len(nodes) - placed)
+        logging.warning(msg)
+    return levels
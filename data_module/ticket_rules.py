@@ -0,0 +1,178 @@
+"""Classifies Program Plan rows for Jira Ticket creation. The rules are
+    evaluated in order and the first rule that matches decides what happens
+    to the row. Column IDs are resolved once per sheet and each row is read
+    in a single pass over its cells.
+"""
+import collections
+import logging
+import re
+import threading
+
+import app.variables as app_vars
+
+logger = logging.getLogger(__name__)
+
+SKIP = "skip"
+CREATE = "create"
+PENDING = "pending"
+PARENT_PENDING = "parent_pending"
+UNMATCHED = "unmatched"
+
+jira_ticket_pattern = re.compile(r"[a-zA-Z]+-\d+")
+"""Matches a Jira Ticket such as JAR-123. Type: re.Pattern
+    """
+create_values = ("Create", "create")
+"""Jira Ticket values that ask for a new ticket. Type: tuple
+    """
+pending_value = "Pending..."
+"""Jira Ticket value while a ticket is being created. Type: str
+    """
+sub_task = "Sub-Task"
+"""Issue Type the Jira connector can't create. Type: str
+    """
+sync_error = "reasonPhrase"
+"""Text found in a Jira Ticket cell that holds a Jira sync error.
+    Type: str
+    """
+
+rule_columns = [app_vars.jira_col, app_vars.summary_col, "Team",
+                app_vars.uuid_col, "Issue Type", "Parent Issue Type",
+                "Parent Ticket"]
+"""Columns the rules read. Type: list
+    """
+
+
+def _is_ticket(value):
+    return value is not None and \
+        jira_ticket_pattern.match(str(value)) is not None
+
+
+def _parent_has_value(values):
+    return values["Parent Ticket"] not in create_values + \
+        (pending_value, None)
+
+
+rules = [
+    ("jira_empty", lambda v: v[app_vars.jira_col] is None, SKIP),
+    ("jira_ticket", lambda v: _is_ticket(v[app_vars.jira_col]), SKIP),
+    ("summary_row", lambda v: v[app_vars.summary_col] == "True", SKIP),
+    ("team_empty", lambda v: v["Team"] is None, SKIP),
+    ("uuid_empty", lambda v: v[app_vars.uuid_col] is None, SKIP),
+    ("sub_task", lambda v: v["Issue Type"] == sub_task, SKIP),
+    ("parent_sub_task", lambda v: v["Parent Issue Type"] == sub_task, SKIP),
+    ("parent_sync_error",
+     lambda v: bool(v["Parent Ticket"]) and
+     sync_error in str(v["Parent Ticket"]), SKIP),
+    ("jira_sync_error", lambda v: sync_error in str(v[app_vars.jira_col]),
+     SKIP),
+    ("create_top_level",
+     lambda v: v["Parent Ticket"] is None and
+     v[app_vars.jira_col] in create_values, CREATE),
+    ("pending", lambda v: v[app_vars.jira_col] == pending_value, PENDING),
+    ("parent_pending", lambda v: v["Parent Ticket"] == pending_value,
+     PARENT_PENDING),
+    ("parent_invalid",
+     lambda v: _parent_has_value(v) and not _is_ticket(v["Parent Ticket"]),
+     SKIP),
+    ("create_child",
+     lambda v: _parent_has_value(v) and
+     v[app_vars.jira_col] in create_values, CREATE),
+]
+"""Ordered (name, test, outcome) rules. Each test gets the row's values by
+    column name. A row that matches no rule is unmatched. Type: list
+    """
+
+_lock = threading.Lock()
+hits = collections.Counter()
+
+
+def compile_sheet(col_map, columns):
+    """Resolves the column IDs the rules and the row data need for a sheet.
+
+    Args:
+        col_map (dict): The column map of Column Name: Column ID
+        columns (list): The columns copied into the row data for a new
+                        ticket
+
+    Returns:
+        dict: The column IDs by name for the rules, and the columns in the
+              row data that exist on the sheet
+    """
+    return {
+        "rule_columns": [(col, col_map.get(col)) for col in rule_columns],
+        "data_columns": [(col, col_map[col]) for col in columns
+                         if col in col_map],
+        "jira_column_id": col_map.get(app_vars.jira_col)
+    }
+
+
+def row_values(row):
+    """Reads every cell value in a row in one pass.
+
+    Args:
+        row (smartsheet.models.Row): The row to read
+
+    Returns:
+        dict: {Column ID: value}
+    """
+    return {cell.column_id: cell.value for cell in row.cells}
+
+
+def classify_row(row, compiled):
+    """Finds the first rule that matches a row.
+
+    Args:
+        row (smartsheet.models.Row): The row to classify
+        compiled (dict): The sheet compiled with compile_sheet
+
+    Returns:
+        str: The name of the rule that matched, or unmatched
+        str: The outcome, one of skip, create, pending, parent_pending or
+             unmatched
+        dict: The row's values by Column ID
+    """
+    values = row_values(row)
+    named = {col: values.get(column_id)
+             for col, column_id in compiled["rule_columns"]}
+    for name, test, outcome in rules:
+        if test(named):
+            return name, outcome, values
+    return UNMATCHED, UNMATCHED, values
+
+
+def row_data(row, compiled, values=None):
+    """Builds the row data to create a new ticket, the same as
+       create_jira_tickets.build_row_data.
+
+    Args:
+        row (smartsheet.models.Row): The row to copy
+        compiled (dict): The sheet compiled with compile_sheet
+        values (dict, optional): The values from row_values. Read from the
+            row if not passed.
+
+    Returns:
+        dict: The value of each data column on the sheet, plus the row number
+    """
+    if values is None:
+        values = row_values(row)
+    data = {col: values.get(column_id)
+            for col, column_id in compiled["data_columns"]}
+    data["row_num"] = row.row_number
+    return data
+
+
+def record_hits(counts):
+    """Adds a run's rule hits to the totals kept since startup.
+
+    Args:
+        counts (collections.Counter): Hits per rule name
+    """
+    with _lock:
+        hits.update(counts)
+
+
+def reset_hits():
+    """Clears the rule hit totals.
+    """
+    with _lock:
+        hits.clear()
@@ -0,0 +1,227 @@
+"""Runs a job as a pipeline of stages connected by bounded queues. Discovery
+    puts work items on the first queue and each stage takes items from its
+    queue, processes them on its own workers and puts the results on the
+    next queue. A full queue blocks the stage before it, so a slow stage
+    holds back the ones before it instead of letting items pile up in
+    memory.
+
+    A stage is a dict with:
+        name (str): The name used in logs and metrics
+        function (function): Called with each item, or with a list of items
+            for a batched stage. Returning None drops the item.
+        workers (int, optional): Number of threads running the stage.
+            Defaults to 1.
+        batch (int, optional): Collect up to this many items and pass them
+            to the function as a list. Defaults to no batching.
+        executor (concurrent.futures.Executor, optional): Run the function
+            in this executor, such as the process pool from
+            get_process_pool. Defaults to the stage's own threads.
+
+    The throughput, busy time and deepest queue of each stage are published
+    as metrics once the pipeline finishes. Every stage thread runs in a copy
+    of the caller's context, so a dry run started by the caller covers the
+    whole pipeline.
+"""
+import concurrent.futures
+import contextvars
+import logging
+import queue
+import threading
+import time
+
+import app.variables as app_vars
+import data_module.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_lock = threading.Lock()
+_process_pool = None
+
+
+def get_process_pool():
+    """Gets the process pool for CPU bound stages, sized like the scheduler's
+       processpool executor. The pool is created on first use.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: The pool, or None if
+            pipeline_processes is off
+    """
+    global _process_pool
+    if not app_vars.pipeline_processes:
+        return None
+    with _lock:
+        if _process_pool is None:
+            _process_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=app_vars.process_workers)
+        return _process_pool
+
+
+def shutdown_process_pool():
+    """Stops the process pool, if one was created.
+    """
+    global _process_pool
+    with _lock:
+        pool = _process_pool
+        _process_pool = None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _validate(stages):
+    if not isinstance(stages, list) or not stages:
+        msg = str("Stages must be a non-empty list, not {}"
+                  "").format(stages)
+        raise TypeError(msg)
+    for stage in stages:
+        if not isinstance(stage, dict) or "name" not in stage or \
+                not callable(stage.get("function")):
+            msg = str("Each stage must be a dict with a name and a function, "
+                      "not {}").format(stage)
+            raise ValueError(msg)
+        if stage.get("workers", 1) < 1:
+            msg = str("Stage {} must have at least one worker, not {}"
+                      "").format(stage["name"], stage["workers"])
+            raise ValueError(msg)
+
+
+def run_pipeline(name, items, stages, queue_size=None):
+    """Runs work items through a list of stages.
+
+    Args:
+        name (str): The name of the pipeline, used in logs and metrics
+        items (iterable): The work items produced by discovery. Read lazily,
+            so a generator is only advanced as the first queue has room.
+        stages (list): The stages, in order. See the module docstring.
+        queue_size (int, optional): The most items waiting between two
+            stages. Defaults to pipeline_queue_size.
+
+    Raises:
+        TypeError: Stages must be a non-empty list
+        ValueError: Stages must be dicts with a name and a function
+        Exception: The first error raised by a stage, once every stage has
+            stopped
+
+    Returns:
+        list: The results of the last stage
+        dict: The stats of each stage by name
+    """
+    _validate(stages)
+    if queue_size is None:
+        queue_size = app_vars.pipeline_queue_size
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    results = []
+    errors = []
+    failed = threading.Event()
+    stats = {stage["name"]: {"items": 0, "busy": 0.0, "max_depth": 0}
+             for stage in stages}
+    stats_lock = threading.Lock()
+
+    def put(position, item):
+        queues[position].put(item)
+        depth = queues[position].qsize()
+        stage_stats = stats[stages[position]["name"]]
+        with stats_lock:
+            if depth > stage_stats["max_depth"]:
+                stage_stats["max_depth"] = depth
+
+    def call(stage, item):
+        executor = stage.get("executor")
+        if executor is None:
+            return stage["function"](item)
+        return executor.submit(stage["function"], item).result()
+
+    def process(position, stage, item, count):
+        started = time.perf_counter()
+        try:
+            result = call(stage, item)
+        except Exception as e:
+            msg = str("[{}] Stage {} failed: {}").format(name, stage["name"],
+                                                         e)
+            logging.error(msg)
+            errors.append(e)
+            failed.set()
+            return
+        with stats_lock:
+            stage_stats = stats[stage["name"]]
+            stage_stats["items"] += count
+            stage_stats["busy"] += time.perf_counter() - started
+        if result is None:
+            return
+        if position + 1 < len(stages):
+            put(position + 1, result)
+        else:
+            with stats_lock:
+                results.append(result)
+
+    def work(position, stage):
+        batch_size = stage.get("batch")
+        batch = []
+        while True:
+            item = queues[position].get()
+            if item is _DONE:
+                break
+            if failed.is_set():
+                # Drain the queue so the stage before this one can finish.
+                continue
+            if batch_size:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    process(position, stage, batch, len(batch))
+                    batch = []
+            else:
+                process(position, stage, item, 1)
+        if batch and not failed.is_set():
+            process(position, stage, batch, len(batch))
+
+    def produce():
+        try:
+            for item in items:
+                if failed.is_set():
+                    break
+                put(0, item)
+        except Exception as e:
+            msg = str("[{}] Discovery failed: {}").format(name, e)
+            logging.error(msg)
+            errors.append(e)
+            failed.set()
+
+    start = time.perf_counter()
+    workers = []
+    for position, stage in enumerate(stages):
+        workers.append([threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(work, position, stage), daemon=True)
+            for _ in range(stage.get("workers", 1))])
+        for thread in workers[-1]:
+            thread.start()
+    producer = threading.Thread(target=contextvars.copy_context().run,
+                                args=(produce,), daemon=True)
+    producer.start()
+    producer.join()
+    # Stop each stage once the stage before it has finished.
+    for position, stage_workers in enumerate(workers):
+        for _ in stage_workers:
+            queues[position].put(_DONE)
+        for thread in stage_workers:
+            thread.join()
+    elapsed = time.perf_counter() - start
+
+    for stage in stages:
+        stage_stats = stats[stage["name"]]
+        stage_stats["throughput"] = stage_stats["items"] / elapsed \
+            if elapsed > 0 else 0.0
+        metrics.publish(str("pipeline.{}.{}.throughput").format(
+            name, stage["name"]), stage_stats["throughput"],
+            items=stage_stats["items"], busy=stage_stats["busy"],
+            max_depth=stage_stats["max_depth"],
+            workers=stage.get("workers", 1))
+    msg = str("[{}] Pipeline finished in {:.3f} seconds. {}").format(
+        name, elapsed, ", ".join(
+            str("{} {} items").format(stage["name"],
+                                      stats[stage["name"]]["items"])
+            for stage in stages))
+    logging.debug(msg)
+    if errors:
+        raise errors[0]
+    return results, stats
@@ -1,9 +1,13 @@
+import contextvars
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import smartsheet
 
 import data_module.build_data as build_data
 import data_module.get_data as get_data
 import data_module.helper as helper
+import data_module.link_status as link_status
 import data_module.smartsheet_api as smartsheet_api
 import app.variables as app_vars
 
@@ -75,21 +79,130 @@ def write_uuids(sheets_to_update):
     return sheets_updated
 
 
+def load_dest_sheet(sheet_id, columns):
+    """Gets a destination sheet for cell linking. If the sheet's column map
+       is cached, only the columns that are linked are requested.
+
+    Args:
+        sheet_id (int): The Sheet ID
+        columns (list): The names of the columns to link
+
+    Returns:
+        smartsheet.models.Sheet: The destination sheet
+        dict: The map of Column Names: Column IDs for the sheet
+    """
+    col_map = get_data.get_cached_column_map(sheet_id)
+    if col_map and all(col in col_map for col in columns):
+        dest_sheet = smartsheet_api.get_sheet(
+            sheet_id, minutes=0,
+            column_ids=[col_map[col] for col in columns])
+    else:
+        dest_sheet = smartsheet_api.get_sheet(sheet_id, minutes=0)
+        col_map = helper.get_column_map(dest_sheet)
+        get_data.cache_column_map(sheet_id, col_map)
+    return dest_sheet, col_map
+
+
+def link_dest_sheet(dest_sheet, dest_col_map, columns_to_link,
+                    jira_index_sheet, jira_index_col_map, jira_index_rows):
+    """Builds the cell links for every row in a destination sheet that has a
+       Jira Ticket in the Index Sheet, and writes them back to the sheet.
+
+    Args:
+        dest_sheet (smartsheet.models.Sheet): The destination sheet
+        dest_col_map (dict): The column name:id map for the destination sheet
+        columns_to_link (list): The columns to link to the Index Sheet
+        jira_index_sheet (smartsheet.models.Sheet): The Jira Index Sheet
+        jira_index_col_map (dict): The column name:id map for the
+                                   Jira Index Sheet
+        jira_index_rows (dict): The Jira Index rows in the form of
+                                Jira Ticket: Row ID
+
+    Returns:
+        str: A message with the number of rows written, or that no updates
+             were needed
+    """
+    # Create an empty list of cell links to update.
+    cell_links_to_update = []
+
+    # Iterate through each row in the sheet.
+    for row in dest_sheet.rows:
+        # Get the value of the Jira Ticket cell and validate that there
+        # is a value in the cell.
+        jira_cell = helper.get_cell_data(
+            row, app_vars.jira_col, dest_col_map)
+        if jira_cell is None or jira_cell.value is None:
+            logging.debug(
+                "Jira Ticket not found in Dest Sheet row. Skipping")
+            continue
+
+        # Set a friendly variable names, validate that the row ID is
+        # present in the sheet, and create a new row with the cell
+        # links.
+        try:
+            idx_row_id = jira_index_rows[jira_cell.value]
+        except KeyError:
+            logging.debug(
+                "{} not found in Row Index. Skipping"
+                "".format(jira_cell.value))
+            continue
+
+        new_row = build_data.build_row(row, columns_to_link,
+                                       dest_col_map,
+                                       jira_index_sheet,
+                                       jira_index_col_map,
+                                       idx_row_id,
+                                       sheet_id=dest_sheet.id)
+        if new_row:
+            cell_links_to_update.append(new_row)
+            msg = str("Writing {} cells to Row ID: {} | "
+                      "Sheet Name: {}."
+                      "").format(len(new_row.cells),
+                                 new_row.id,
+                                 dest_sheet.name)
+            logging.debug(msg)
+        else:
+            continue
+
+    # Write back new cell links to the Sheet
+    if cell_links_to_update:
+        msg = str("Writing {} cell link rows back to Sheet ID: {} | "
+                  "Sheet Name: {}."
+                  "").format(len(cell_links_to_update), dest_sheet.id,
+                             dest_sheet.name)
+        logging.info(msg)
+
+        smartsheet_api.write_rows_to_sheet(cell_links_to_update,
+                                           dest_sheet,
+                                           write_method="update")
+    else:
+        msg = str("No Jira Ticket updates needed for Sheet ID: {} | "
+                  "Sheet Name {}.").format(dest_sheet.id,
+                                           dest_sheet.name)
+        logging.info(msg)
+    return msg
+
+
 def write_jira_index_cell_links(project_sub_index,
-                                index_sheet=app_vars.dev_jira_idx_sheet):
+                                index_sheet=app_vars.dev_jira_idx_sheet,
+                                workers=None):
     """For each sheet in the destination sheet index, parse through the rows,
        determine if cells need to be linked, create cell links and then write
-       the rows back to the sheet.
+       the rows back to the sheet. The destination sheets are loaded
+       concurrently and each one is linked and written as soon as it
+       arrives.
 
     Args:
         project_sub_index (dict): The list of projects that have a
                                   UUID:Jira Ticket map.
         index_sheet (int): The Jira Index Sheet to write cell links to.
             Defaults to the Dev Jira Index Sheet
+        workers (int, optional): The number of sheets to load at the same
+            time. Defaults to link_workers.
 
     Returns:
-        bool: True if any links were written, False if no data was
-              written back to any sheet.
+        str: One message per destination sheet, with the number of rows
+             written or that no updates were needed
     """
     if not isinstance(project_sub_index, dict):
         msg = str("Project sub-index must be type: dict, not"
@@ -108,6 +221,8 @@ def write_jira_index_cell_links(project_sub_index,
                       " not value: {} | type: {} | IndexDump {}"
                       "").format(v, type(v), project_sub_index)
             raise ValueError(msg)
+    if workers is None:
+        workers = app_vars.link_workers
 
     # Create a copy of the project_sub_index so that we don't alter any
     # other function's data set.
@@ -126,73 +241,32 @@ def write_jira_index_cell_links(project_sub_index,
     jira_index_sheet, jira_index_col_map, jira_index_rows = \
         get_data.load_jira_index(index_sheet)
 
-    # Iterate through each sheet ID in the smaller sheet index.
-    for sheet_id in dest_sheet_index.keys():
-        # Get the sheet data for the ID.
-        dest_sheet = smartsheet_api.get_sheet(sheet_id, minutes=0)
-
-        # Build a column map for easier column name to ID reference
-        dest_col_map = helper.get_column_map(dest_sheet)
-
-        # Create an empty list of cell links to update.
-        cell_links_to_update = []
-
-        # Iterate through each row in the sheet.
-        for row in dest_sheet.rows:
-            # Get the value of the Jira Ticket cell and validate that there
-            # is a value in the cell.
-            jira_cell = helper.get_cell_data(
-                row, app_vars.jira_col, dest_col_map)
-            if jira_cell is None or jira_cell.value is None:
-                logging.debug(
-                    "Jira Ticket not found in Dest Sheet row. Skipping")
-                continue
-
-            # Set a friendly variable names, validate that the row ID is
-            # present in the sheet, and create a new row with the cell
-            # links.
-            try:
-                idx_row_id = jira_index_rows[jira_cell.value]
-            except KeyError:
-                logging.debug(
-                    "{} not found in Row Index. Skipping"
-                    "".format(jira_cell.value))
-                continue
-
-            new_row = build_data.build_row(row, columns_to_link,
-                                           dest_col_map,
-                                           jira_index_sheet,
-                                           jira_index_col_map,
-                                           idx_row_id)
-            if new_row:
-                cell_links_to_update.append(new_row)
-                msg = str("Writing {} cells to Row ID: {} | "
-                          "Sheet Name: {}."
-                          "").format(len(new_row.cells),
-                                     new_row.id,
-                                     dest_sheet.name)
-                logging.debug(msg)
-            else:
-                continue
-
-        # Write back new cell links to the Sheet
-        if cell_links_to_update:
-            msg = str("Writing {} cell link rows back to Sheet ID: {} | "
-                      "Sheet Name: {}."
-                      "").format(len(cell_links_to_update), dest_sheet.id,
-                                 dest_sheet.name)
-            logging.info(msg)
-
-            smartsheet_api.write_rows_to_sheet(cell_links_to_update,
-                                               dest_sheet,
-                                               write_method="update")
-            return msg
-        else:
-            msg = str("No Jira Ticket updates needed for Sheet ID: {} | "
-                      "Sheet Name {}.").format(dest_sheet.id,
-                                               dest_sheet.name)
-            logging.info(msg)
-            return msg
+    def link_sheet(loaded):
+        dest_sheet, dest_col_map = loaded
+        return link_dest_sheet(dest_sheet, dest_col_map, columns_to_link,
+                               jira_index_sheet, jira_index_col_map,
+                               jira_index_rows)
+
+    # Load the destination sheets several at a time if workers are
+    # configured. Each sheet is linked and written as soon as it arrives.
+    messages = []
+    sheet_ids = list(dest_sheet_index.keys())
+    if workers > 1 and len(sheet_ids) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(contextvars.copy_context().run,
+                                       load_dest_sheet, sheet_id,
+                                       columns_to_link)
+                       for sheet_id in sheet_ids]
+            for future in as_completed(futures):
+                messages.append(link_sheet(future.result()))
+    else:
+        for sheet_id in sheet_ids:
+            messages.append(link_sheet(load_dest_sheet(sheet_id,
+                                                       columns_to_link)))
+
+    # Keep the link statuses for the next run.
+    link_status.save_index()
+    return "\n".join(messages)
 
 
 # def write_predecessor_dates(src_data, project_data_index):
@@ -1,18 +1,32 @@
 import gc
-import json
 import logging
+import threading
 import time
+from datetime import datetime, timezone
 
 import app.config as config
 import app.variables as app_vars
+import data_module.cell_history as cell_history
+import data_module.data_plane as data_plane
+import data_module.execution_guard as execution_guard
 import data_module.get_data as get_data
 import data_module.helper as helper
-import data_module.jobs as jobs
+import data_module.scheduler_controller as scheduler_controller
+import data_module.sharding as sharding
+import data_module.sheet_scheduler as sheet_scheduler
 import data_module.smartsheet_api as smartsheet_api
+import data_module.work_queue as work_queue
 import smartsheet
+import sync_module.reverse_index as reverse_index
+import sync_module.sync_snapshot as sync_snapshot
 
 logger = logging.getLogger(__name__)
 
+# Count of cell history API calls avoided by the snapshot comparison during
+# the current run. Calls made are counted by the cell history cache.
+_history_lock = threading.Lock()
+history_calls_avoided = 0
+
 # General Approach: Load up the Index Sheet. Collect all rows with UUIDs.
 # On subset of Index Sheet rows with UUIDs, look up the sheet and row IDs
 # For each cell in the sheet row, match column names to the Index Sheet
@@ -200,10 +214,14 @@ def rebuild_cell(cell, column_id):
     else:
         # Default to setting basic cell value
         rebuilt_cell.value = cell.value
-    # Set the hyperlink if there is one.
+    # Set the hyperlink if there is one. Copy the fields directly rather
+    # than serializing the source hyperlink.
     if cell.hyperlink:
-        link = str({}).format(cell.hyperlink)
-        link = json.loads(link)
+        link = smartsheet.models.Hyperlink()
+        link.url = cell.hyperlink.url
+        link.sheet_id = cell.hyperlink.sheet_id
+        link.report_id = cell.hyperlink.report_id
+        link.sight_id = cell.hyperlink.sight_id
         rebuilt_cell.hyperlink = link
 
     if not rebuilt_cell.value:
@@ -218,12 +236,378 @@ def rebuild_cell(cell, column_id):
     return rebuilt_cell
 
 
+def count_history_calls(avoided=0):
+    """Adds to the count of cell history API calls avoided during the
+       current run.
+
+    Args:
+        avoided (int, optional): Number of calls avoided. Defaults to 0.
+    """
+    global history_calls_avoided
+    with _history_lock:
+        history_calls_avoided += avoided
+
+
+def reset_history_counts():
+    """Resets the cell history call counts at the start of a run.
+    """
+    global history_calls_avoided
+    with _history_lock:
+        history_calls_avoided = 0
+    cell_history.reset_counts()
+
+
+def get_ticket(index_row, jira_index_col_map):
+    """Gets the Jira Ticket from an Index row. The Jira Ticket keys the
+       snapshot of the last synced values.
+
+    Args:
+        index_row (smartsheet.Row): The Index row
+        jira_index_col_map (dict): The Jira Index Sheet column map
+
+    Returns:
+        str: The Jira Ticket, or None if the row doesn't have one
+    """
+    if app_vars.jira_col not in jira_index_col_map:
+        return None
+    ticket_cell = helper.get_cell_data(index_row, app_vars.jira_col,
+                                       jira_index_col_map)
+    if not ticket_cell:
+        return None
+    return ticket_cell.value
+
+
+def cells_match(index_cell, plan_cell):
+    """Checks whether the Index and Plan cells already hold the same value
+       and hyperlink.
+
+    Args:
+        index_cell (smartsheet.models.Cell): The Index cell
+        plan_cell (smartsheet.models.Cell): The Plan cell
+
+    Returns:
+        bool: True if nothing needs to be synced
+    """
+    if index_cell.value == plan_cell.value or\
+            index_cell.object_value == plan_cell.value:
+        # Check the hyperlink property to ensure we arent missing a URL
+        # between the two. Mostly for links to Jira tickets.
+        return index_cell.hyperlink == plan_cell.hyperlink
+    return False
+
+
+def compile_columns(jira_index_col_map, plan_col_map, columns_to_compare):
+    """Resolves the Index and Plan column IDs for each column to compare
+    once per Program Plan, instead of looking them up by name per row.
+
+    Args:
+        jira_index_col_map (dict): The Jira Index Sheet column map
+        plan_col_map (dict): The Program Plan column map
+        columns_to_compare (list): A list of columns to compare between the
+                                   rows
+
+    Returns:
+        dict: {Column Name: (Index Column ID, Plan Column ID)} for every
+              column that exists on both sheets
+    """
+    columns = {}
+    for col in columns_to_compare:
+        if col in jira_index_col_map and col in plan_col_map:
+            columns[col] = (jira_index_col_map[col], plan_col_map[col])
+    return columns
+
+
+def row_cells(row):
+    """Maps a row's cells by Column ID so each cell is found without
+    scanning the row.
+
+    Args:
+        row (smartsheet.models.Row): The row to map
+
+    Returns:
+        dict: {Column ID: Cell}
+    """
+    return {cell.column_id: cell for cell in row.cells}
+
+
+def ticket_columns(jira_index_sheet, jira_index_col_map, index_row,
+                   plan_entries, columns_to_compare, column_plans=None):
+    """Collects, per column to compare, the Index cell and the cell of every
+    Plan row whose sheet has the column.
+
+    Args:
+        jira_index_sheet (smartsheet.Sheet): The Jira Index Sheet
+        jira_index_col_map (dict): The Jira Index Sheet column map
+        index_row (smartsheet.Row): The Index row to evaluate
+        plan_entries (list): The Plan rows that reference the Jira Ticket as
+                             (Plan Sheet, Plan Column Map, Plan Row) tuples
+        columns_to_compare (list): A list of columns to compare between the
+                                   rows
+        column_plans (dict, optional): Compiled columns per Sheet ID from
+            compile_columns. Compiled on the fly if not passed.
+
+    Returns:
+        list: (Column Name, sources, cells, positions) tuples. Sources are
+              the (Sheet ID, Row, Column ID) of each cell, Index first.
+              Positions are the index in plan_entries of each Plan cell.
+    """
+    plans = []
+    for plan_sheet, plan_col_map, plan_row in plan_entries:
+        columns = None
+        if column_plans is not None:
+            columns = column_plans.get(plan_sheet.id)
+        if columns is None:
+            columns = compile_columns(jira_index_col_map, plan_col_map,
+                                      columns_to_compare)
+        plans.append((plan_sheet.id, plan_row, columns, row_cells(plan_row)))
+
+    index_cells = row_cells(index_row)
+    compared = []
+    for col in columns_to_compare:
+        if col not in jira_index_col_map:
+            continue
+        index_col_id = jira_index_col_map[col]
+        sources = [(jira_index_sheet.id, index_row, index_col_id)]
+        cells = [index_cells.get(index_col_id) or smartsheet.models.Cell()]
+        positions = []
+        for position, (sheet_id, plan_row, columns, plan_cells) in \
+                enumerate(plans):
+            if col not in columns:
+                continue
+            plan_col_id = columns[col][1]
+            sources.append((sheet_id, plan_row, plan_col_id))
+            cells.append(plan_cells.get(plan_col_id) or
+                         smartsheet.models.Cell())
+            positions.append(position)
+        if positions:
+            compared.append((col, sources, cells, positions))
+    return compared
+
+
+def column_keys(cells):
+    """Normalizes the Index cell and every Plan cell for one column. A Plan
+       cell that already matches the Index cell shares its key.
+
+    Args:
+        cells (list): The cells for the column, Index first
+
+    Returns:
+        list: The normalized keys in the same order
+    """
+    index_cell = cells[0]
+    index_key = sync_snapshot.cell_key(index_cell)
+    keys = [index_key]
+    for plan_cell in cells[1:]:
+        plan_key = sync_snapshot.cell_key(plan_cell)
+        if plan_key != index_key and cells_match(index_cell, plan_cell):
+            plan_key = index_key
+        keys.append(plan_key)
+    return keys
+
+
+def history_lookups(jira_index_sheet, jira_index_col_map, index_row,
+                    plan_entries, columns_to_compare, column_plans=None):
+    """Lists the cell history lookups build_ticket_rows will need for a Jira
+       Ticket, so they can be prefetched before the rows are compared.
+
+    Args:
+        jira_index_sheet (smartsheet.Sheet): The Jira Index Sheet
+        jira_index_col_map (dict): The Jira Index Sheet column map
+        index_row (smartsheet.Row): The Index row to evaluate
+        plan_entries (list): The Plan rows that reference the Jira Ticket as
+                             (Plan Sheet, Plan Column Map, Plan Row) tuples
+        columns_to_compare (list): A list of columns to compare between the
+                                   rows
+        column_plans (dict, optional): Compiled columns per Sheet ID from
+            compile_columns. Defaults to None.
+
+    Returns:
+        list: Cache keys for every changed cell in a conflicting column
+    """
+    ticket = get_ticket(index_row, jira_index_col_map)
+    lookups = []
+    for col, sources, cells, _ in ticket_columns(
+            jira_index_sheet, jira_index_col_map, index_row, plan_entries,
+            columns_to_compare, column_plans):
+        if col == app_vars.jira_col:
+            continue
+        keys = column_keys(cells)
+        last_key = None
+        if ticket is not None:
+            last_key = sync_snapshot.get_value(ticket, col)
+        changed = sync_snapshot.changed_keys(keys, last_key)
+        if len(changed) < 2:
+            continue
+        for (sheet_id, row, column_id), key in zip(sources, keys):
+            if key in changed:
+                lookups.append(cell_history.history_key(sheet_id, row,
+                                                        column_id))
+    return lookups
+
+
+def newest_cell(sources, keys, changed):
+    """Uses the cell history to find the most recently modified of the
+       changed cells in a conflicting column.
+
+    Args:
+        sources (list): The (Sheet ID, Row, Column ID) of each cell, Index
+                        first
+        keys (list): The normalized keys from column_keys
+        changed (list): The changed keys from sync_snapshot.changed_keys
+
+    Returns:
+        int: The position of the newest cell, where 0 is the Index cell, or
+             None if no history was found or the two newest different
+             values were modified within 1 second of each other
+    """
+    modified = []
+    for position, ((sheet_id, row, column_id), key) in \
+            enumerate(zip(sources, keys)):
+        if key not in changed:
+            continue
+        # Defaults to only pulling the most recent history object, from the
+        # cache if the row hasn't changed since the last lookup.
+        history = cell_history.get_history(sheet_id, row, column_id)
+        if history:
+            modified.append((history[0].modified_at, position))
+    if not modified:
+        return None
+
+    # Newest first. Equal dates keep the Index, then the first Plan row, so
+    # every run picks the same cell.
+    modified.sort(key=lambda item: (item[0], -item[1]), reverse=True)
+    newest_at, newest = modified[0]
+    for modified_at, position in modified[1:]:
+        if keys[position] == keys[newest]:
+            continue
+        # Set threshold for cell detection to 1 seconds
+        if (newest_at - modified_at).total_seconds() <= 1:
+            return None
+        break
+    return newest
+
+
+def build_ticket_rows(jira_index_sheet, jira_index_col_map, index_row,
+                      plan_entries, columns_to_compare,
+                      snapshot_updates=None, column_plans=None):
+    """Builds the row data to update the Index Sheet and every Program Plan
+    row that references the same Jira Ticket. Each column is compared once
+    across all of the rows against the snapshot of the last synced value.
+    If only one value changed since the last sync it wins. Otherwise the
+    cell history decides. The winning value is fanned out to every row that
+    doesn't already have it. Columns missing from a sheet are skipped.
+
+    Args:
+        jira_index_sheet (smartsheet.Sheet): The Jira Index Sheet
+        jira_index_col_map (dict): The Jira Index Sheet column map in the form
+                                   of Column Name: Column ID
+        index_row (smartsheet.Row): The Index row to evaluate
+        plan_entries (list): The Plan rows that reference the Jira Ticket as
+                             (Plan Sheet, Plan Column Map, Plan Row) tuples
+        columns_to_compare (list): A list of columns to compare between the
+                                   rows
+        snapshot_updates (list, optional): If passed, the new snapshot values
+            are appended as (Jira Ticket, Column, key) so they can be saved
+            once the rows are written. Otherwise the snapshot is updated
+            immediately. Defaults to None.
+        column_plans (dict, optional): Compiled columns per Sheet ID from
+            compile_columns. Compiled on the fly if not passed.
+
+    Returns:
+        smartsheet.models.Row, list: A Smartsheet Row to update the Index
+            Sheet, and a Smartsheet Row to update each Plan row in the same
+            order as plan_entries
+    """
+    # Create new row for the Index Sheet and copy the row's ID
+    updated_index_row = smartsheet.models.Row()
+    updated_index_row.id = index_row.id
+
+    # Create a new row object for each Plan row and copy the row's ID
+    updated_plan_rows = []
+    for _, _, plan_row in plan_entries:
+        updated_plan_row = smartsheet.models.Row()
+        updated_plan_row.id = plan_row.id
+        updated_plan_rows.append(updated_plan_row)
+
+    ticket = get_ticket(index_row, jira_index_col_map)
+
+    def record(col, key):
+        if snapshot_updates is None:
+            sync_snapshot.set_value(ticket, col, key)
+        else:
+            snapshot_updates.append((ticket, col, key))
+
+    # Interate through each column that we want to sync data
+    for col, sources, cells, positions in ticket_columns(
+            jira_index_sheet, jira_index_col_map, index_row, plan_entries,
+            columns_to_compare, column_plans):
+        index_cell = cells[0]
+
+        # Always write the Jira Col on the plan sheet if not hyperlinked
+        if col == app_vars.jira_col:
+            index_link = sync_snapshot.link_key(index_cell.hyperlink)
+            for (_, _, plan_col_id), plan_cell, position in \
+                    zip(sources[1:], cells[1:], positions):
+                if cells_match(index_cell, plan_cell):
+                    continue
+                if sync_snapshot.link_key(plan_cell.hyperlink) == index_link:
+                    logging.debug("URL links match, skipping {}.".format(col))
+                    continue
+                updated_plan_rows[position].cells.append(
+                    rebuild_cell(index_cell, plan_col_id))
+            continue
+
+        # Compare every cell to the last synced value. Only the sides that
+        # changed since the last sync differ from the snapshot.
+        keys = column_keys(cells)
+        last_key = None
+        if ticket is not None:
+            last_key = sync_snapshot.get_value(ticket, col)
+        changed = sync_snapshot.changed_keys(keys, last_key)
+        if not changed:
+            logging.debug("Values Match, skipping {}".format(col))
+            record(col, keys[0])
+            continue
+        if len(changed) == 1:
+            newer = keys.index(changed[0])
+            count_history_calls(avoided=len(keys))
+        else:
+            # More than one side changed, or the column was never synced.
+            newer = newest_cell(sources, keys, changed)
+        if newer is None:
+            # Newer Cell was modified within 1 second of another, skip
+            msg = str("Newer {} cell is None, skipping.").format(col)
+            logging.debug(msg)
+            continue
+
+        newer_key = keys[newer]
+        newer_cell = cells[newer]
+        if newer == 0:
+            msg = str("Newer {} cell is the Index cell.").format(col)
+        else:
+            msg = str("Newer {} cell is the Plan cell.").format(col)
+        logging.debug(msg)
+        record(col, newer_key)
+        # Copy the newer cell to every row that doesn't have its value,
+        # using that row's column ID. Update the cell even if it's None.
+        if keys[0] != newer_key:
+            updated_index_row.cells.append(
+                rebuild_cell(newer_cell, sources[0][2]))
+        for (_, _, plan_col_id), key, position in \
+                zip(sources[1:], keys[1:], positions):
+            if key != newer_key:
+                updated_plan_rows[position].cells.append(
+                    rebuild_cell(newer_cell, plan_col_id))
+
+    return updated_index_row, updated_plan_rows
+
+
 def build_row(jira_index_sheet, jira_index_col_map, index_row, plan_sheet,
-              plan_col_map, plan_row, columns_to_compare):
-    """Builds the row data necessary to update both the Index Sheet and the
-    Program Plan sheet(s). Parses through the cell history of each row and
-    determines which cell is the most recent, then creates new rows with the
-    updated data and adds it to the list
+              plan_col_map, plan_row, columns_to_compare,
+              snapshot_updates=None):
+    """Builds the row data necessary to update both the Index Sheet and a
+    single Program Plan row. See build_ticket_rows for how the newer cell
+    is chosen.
 
     Args:
         jira_index_sheet (smartsheet.Sheet): The Jira Index Sheet
@@ -236,6 +620,10 @@ def build_row(jira_index_sheet, jira_index_col_map, index_row, plan_sheet,
                              Column Name: Column ID
         columns_to_compare (list): A list of columns to compare between the
                                    two rows
+        snapshot_updates (list, optional): If passed, the new snapshot values
+            are appended as (Jira Ticket, Column, key) so they can be saved
+            once the rows are written. Otherwise the snapshot is updated
+            immediately. Defaults to None.
 
     Returns:
         list, list: A Smartsheet Row to update the Index Sheet, and a
@@ -272,99 +660,17 @@ def build_row(jira_index_sheet, jira_index_col_map, index_row, plan_sheet,
     if not columns_to_compare:
         msg = str("Columns to compare cannot be an enpty list.")
         raise ValueError(msg)
-    # Create new row for the Index Sheet and copy the row's ID
-    updated_index_row = smartsheet.models.Row()
-    updated_index_row.id = index_row.id
-
-    # Create a new row object for the plan sheet and copy the plan_row ID
-    updated_plan_row = smartsheet.models.Row()
-    updated_plan_row.id = plan_row.id
-
-    # Interate through each column that we want to sync data
-    for col in columns_to_compare:
-        # Get the cell data for matching columns between the two rows
-        index_cell = helper.get_cell_data(index_row, col, jira_index_col_map)
-        plan_cell = helper.get_cell_data(plan_row, col, plan_col_map)
-        # logging.debug("Index v: {}, ov: {}, hl: {}".format(
-        #     index_cell.value, index_cell.object_value,
-        #     index_cell.hyperlink))
-        # logging.debug("Plan v: {}, ov: {}, hl: {}".format(
-        #     plan_cell.value, plan_cell.object_value,
-        #     plan_cell.hyperlink))
-
-        # If the index cell and plan cell values match, continue to the
-        # next column.
-        if index_cell.value == plan_cell.value or\
-                index_cell.object_value == plan_cell.value:
-            # Check the hyperlink property to ensure we arent missing a URL
-            # between the two. Mostly for links to Jira tickets.
-            if index_cell.hyperlink == plan_cell.hyperlink:
-                logging.debug("Values Match, skipping {}".format(col))
-                continue
-
-        # Always write the Jira Col on the plan sheet if not hyperlinked
-        if col == app_vars.jira_col:
-            # logging.debug("Jira Col found, returning Index")
-            newer = "Index"
-            plan_link = str({}).format(plan_cell.hyperlink)
-            index_link = str({}).format(index_cell.hyperlink)
-            if plan_link == index_link:
-                logging.debug("URL links match, skipping {}.".format(col))
-                continue
-        else:
-            # Query the cell history for both cells from the API.
-            # Defaults to only pulling the most recent history object.
-            index_cell_history = smartsheet_api.get_cell_history(
-                jira_index_sheet.id, index_row.id, jira_index_col_map[col]
-            )
-            plan_cell_history = smartsheet_api.get_cell_history(
-                plan_sheet.id, plan_row.id, plan_col_map[col]
-            )
-            # Get the newer of the two cells
-            newer = compare_dates(index_cell_history, plan_cell_history)
-
-        if not newer:
-            # Newer Cell was modified within the last 30 seconds, skip
-            msg = str("Newer {} cell is None, skipping.").format(col)
-            logging.debug(msg)
-            continue
-        if newer == "Index":
-            # Index Cell was the newer cell. Copy the Plan Cell column
-            # ID to the newer cell object, and append it to the new plan
-            # row object.
-            msg = str("Newer {} cell is the {} cell.").format(col, newer)
-            logging.debug(msg)
-            newer_cell = rebuild_cell(index_cell, plan_col_map[col])
-            # Update the cell even if it's None
-            updated_plan_row.cells.append(newer_cell)
-            # if newer_cell.object_value or newer_cell.value:
-            #     updated_plan_row.cells.append(newer_cell)
-            # else:
-            #     logging.debug("Skipped {} because value: {} | "
-            #                   "object_value: {}".format(col,
-            #                             newer_cell.value,
-            #                             newer_cell.object_value))
-        if newer == "Plan":
-            # Plan Cell was the newer cell. Copy the Index Cell column
-            # ID to the newer cell object, and append it to the new index
-            # row object.
-            msg = str("Newer {} cell is the {} cell.").format(col, newer)
-            logging.debug(msg)
-            newer_cell = rebuild_cell(plan_cell, jira_index_col_map[col])
-            updated_index_row.cells.append(newer_cell)
-            # if newer_cell.object_value or newer_cell.value:
-            #     updated_plan_row.cells.append(newer_cell)
-            # else:
-            #     logging.debug("Skipped {} because value: {} | "
-            #                   "object_value: {}".format(col,
-            #                             newer_cell.value,
-            #                             newer_cell.object_value))
-
-    return updated_index_row, updated_plan_row
+    updated_index_row, updated_plan_rows = build_ticket_rows(
+        jira_index_sheet, jira_index_col_map, index_row,
+        [(plan_sheet, plan_col_map, plan_row)], columns_to_compare,
+        snapshot_updates)
+    return updated_index_row, updated_plan_rows[0]
 
 
 def drop_dupes(row_list):
-    """Drops duplicate row IDs from the list of rows to update
+    """Merges rows that share a Row ID so each row is only written once.
+    Cells from later duplicates are added for any column the earlier rows
+    didn't update. If two rows update the same column, the first cell wins.
 
     Args:
         row_list (list): List of Smartsheet Row objects to parse
@@ -374,7 +680,8 @@ def drop_dupes(row_list):
         ValueError: Row List must not be empty
 
     Returns:
-        list: A new list with only unique Row IDs
+        list: A new list with only unique Row IDs, in the order each Row ID
+              first appeared
     """
     if not isinstance(row_list, list):
         msg = str("Project data must be type: list, not"
@@ -385,17 +692,274 @@ def drop_dupes(row_list):
                   "").format()
         raise ValueError(msg)
 
-    row_ids = []
-    list_copy = row_list
-    for row in list_copy:
-        if row.id in row_ids:
-            index = list_copy.index(row)
-            del list_copy[index]
-        else:
-            row_ids.append(row.id)
-    return list_copy
+    grouped = {}
+    for row in row_list:
+        grouped.setdefault(row.id, []).append(row)
+
+    unique_rows = []
+    for row_id, rows in grouped.items():
+        # Keep the original object when there is nothing to merge.
+        if len(rows) == 1:
+            unique_rows.append(rows[0])
+            continue
+        merged_row = smartsheet.models.Row()
+        merged_row.id = row_id
+        columns = set()
+        for row in rows:
+            for cell in row.cells:
+                if cell.column_id in columns:
+                    continue
+                columns.add(cell.column_id)
+                merged_row.cells.append(cell)
+        unique_rows.append(merged_row)
+    return unique_rows
+
+
+def write_succeeded(result):
+    """Checks the result of a write to the Smartsheet API.
+
+    Args:
+        result (smartsheet.models.Result): The result of write_rows_to_sheet
+
+    Returns:
+        bool: True if the API reported success
+    """
+    return getattr(result, "message", None) == "SUCCESS"
 
 
+def group_by_ticket(source_sheets, jira_index_rows, warn_missing=True):
+    """Groups every Program Plan row that references a Jira Ticket in the
+    Index Sheet by ticket, so each ticket is only compared once.
+
+    Args:
+        source_sheets (list): The Program Plan sheets to sync
+        jira_index_rows (dict): The Jira Index rows in the form of
+                                Jira Ticket: Row ID
+        warn_missing (bool, optional): Write a warning to Plan rows whose
+            Jira Ticket isn't in jira_index_rows. Set to False when only
+            part of the Index Sheet was loaded. Defaults to True.
+
+    Returns:
+        dict, dict: The Plan rows per Jira Ticket as (Plan Sheet, Plan
+                    Column Map, Plan Row) tuples, sorted by Sheet ID and
+                    Row ID, and the warning rows to write per Sheet ID
+    """
+    tickets = {}
+    warnings = {}
+    for plan_sheet in source_sheets:
+        plan_col_map = helper.get_column_map(plan_sheet)
+        # Skip the sheet if it doesn't have a Jira column
+        if app_vars.jira_col not in plan_col_map.keys():
+            continue
+
+        # Loop through each row. Look for a Jira Ticket value. Look up that
+        # value against all the tickets in the Index Sheet.
+        for plan_row in plan_sheet.rows:
+            plan_jira_cell = helper.get_cell_data(
+                plan_row, app_vars.jira_col, plan_col_map)
+            if not plan_jira_cell:
+                # Plan Jira cell never had a value
+                continue
+            if not plan_jira_cell.value:
+                # Plan Jira cell value is blank
+                continue
+            if plan_jira_cell.value not in jira_index_rows.keys():
+                if not warn_missing:
+                    continue
+                # Plan Jira cell value isn't in the Jira Index Sheet.
+                # Raise error by setting plan jira cell value
+                msg = str("[WARNING]; {} not found in the index sheet. "
+                          "Check that the ticket was created or modified "
+                          "within the last 3 months and try again."
+                          "").format(plan_jira_cell.value)
+                # The Plan row is shared with the other jobs, so the warning
+                # goes on a new cell.
+                warning_cell = smartsheet.models.Cell()
+                warning_cell.column_id = plan_jira_cell.column_id
+                warning_cell.value = msg
+                new_row = smartsheet.models.Row()
+                new_row.id = plan_row.id
+                new_row.cells.append(warning_cell)
+                warnings.setdefault(plan_sheet.id, []).append(new_row)
+                continue
+            tickets.setdefault(plan_jira_cell.value, []).append(
+                (plan_sheet, plan_col_map, plan_row))
+
+    for plan_entries in tickets.values():
+        plan_entries.sort(key=lambda entry: (entry[0].id, entry[2].id))
+    return tickets, warnings
+
+
+def diff_tickets(jira_index_sheet, jira_index_col_map, index_rows, tickets,
+                 columns_to_compare, column_plans, workers=None):
+    """Runs build_ticket_rows for every Jira Ticket as the compare stage of
+       a work_queue pipeline, several tickets at a time. The results come
+       back in ticket order, so the rows written are the same however many
+       workers are used.
+
+    Args:
+        jira_index_sheet (smartsheet.Sheet): The Jira Index Sheet
+        jira_index_col_map (dict): The Jira Index Sheet column map
+        index_rows (dict): The Index row for each Jira Ticket
+        tickets (dict): The Plan rows for each Jira Ticket, from
+            group_by_ticket
+        columns_to_compare (list): A list of columns to compare between the
+                                   rows
+        column_plans (dict): Compiled columns per Sheet ID from
+            compile_columns
+        workers (int, optional): Number of tickets diffed at the same time.
+            Defaults to sync_workers.
+
+    Returns:
+        list: (Jira Ticket, Index row update, Plan row updates, snapshot
+              updates) for each ticket
+    """
+    if workers is None:
+        workers = app_vars.sync_workers
+    if not tickets:
+        return []
+
+    def diff_ticket(item):
+        position, ticket = item
+        snapshot_updates = []
+        updated_index_row, updated_plan_rows = build_ticket_rows(
+            jira_index_sheet, jira_index_col_map, index_rows[ticket],
+            tickets[ticket], columns_to_compare, snapshot_updates,
+            column_plans)
+        return position, (ticket, updated_index_row, updated_plan_rows,
+                          snapshot_updates)
+
+    results, _ = work_queue.run_pipeline(
+        "sync_jira", enumerate(tickets),
+        [{"name": "compare", "function": diff_ticket, "workers": workers}])
+    return [diff for _, diff in sorted(results, key=lambda item: item[0])]
+
+
+def choose_sync_mode(plan_sheets_changed, watermark):
+    """Picks how the sync finds the rows to compare, before any Program Plan
+    is downloaded. Plan driven compares every recently modified Program Plan
+    row and loads the whole Jira Index Sheet. Index driven only loads the
+    Index rows modified since the watermark and the Plan rows that
+    reference them.
+
+    This doesn't weigh the changed rows of one side against the other. The
+    number of changed Plan rows isn't known until the Program Plans are
+    downloaded, and the Index driven sync can't see changes made on a
+    Program Plan. So any Program Plan changed since the watermark picks
+    Plan driven, however few of its rows changed, and Index driven only
+    runs in cycles where nothing but Jira changed.
+
+    Args:
+        plan_sheets_changed (int): Number of Program Plans modified since
+                                   the watermark, from count_changed_sheets
+        watermark (datetime): The watermark of the last completed sync, or
+                              None if no sync has completed
+
+    Returns:
+        str: Plan or Index
+    """
+    if watermark is None:
+        # Without a watermark the reverse index can't be trusted yet.
+        return "Plan"
+    if plan_sheets_changed:
+        return "Plan"
+    return "Index"
+
+
+def count_changed_sheets(sheet_ids, watermark):
+    """Counts the sheets modified since the watermark, from the modified
+    dates in the workspace listing, so no sheet has to be downloaded.
+
+    Args:
+        sheet_ids (list): The Sheet IDs to check
+        watermark (datetime): The watermark of the last completed sync, or
+                              None to count every sheet
+
+    Returns:
+        int: The number of sheets modified since the watermark. Sheets
+             without a known modified date are counted.
+    """
+    count = 0
+    for sheet_id in sheet_ids:
+        modified = sheet_scheduler.get_modified(sheet_id)
+        if watermark is not None and modified is not None and \
+                modified < watermark:
+            continue
+        count += 1
+    return count
+
+
+def fetch_ticket_rows(tickets, loaded):
+    """Fetches the Plan rows that reference each Jira Ticket according to
+    the reverse index, one request per Program Plan, skipping rows that are
+    already loaded. Locations that no longer reference the ticket are
+    removed from the reverse index.
+
+    Args:
+        tickets (list): The Jira Tickets that changed on the Index Sheet
+        loaded (set): (Sheet ID, Row ID) tuples that are already loaded
+
+    Returns:
+        list: Program Plan sheets that only contain the fetched rows
+    """
+    rows_by_sheet = {}
+    expected = {}
+    for ticket in tickets:
+        for sheet_id, row_id in reverse_index.get_locations(ticket):
+            if (sheet_id, row_id) in loaded:
+                continue
+            rows_by_sheet.setdefault(sheet_id, []).append(row_id)
+            expected.setdefault((sheet_id, row_id), []).append(ticket)
+
+    sheets = []
+    for sheet_id, row_ids in rows_by_sheet.items():
+        plan_sheet = smartsheet_api.get_sheet(sheet_id, minutes=0,
+                                              row_ids=sorted(set(row_ids)))
+        plan_col_map = helper.get_column_map(plan_sheet)
+        found = {}
+        for plan_row in plan_sheet.rows:
+            jira_cell = helper.get_cell_data(plan_row, app_vars.jira_col,
+                                             plan_col_map)
+            if jira_cell:
+                found[plan_row.id] = jira_cell.value
+        for row_id in row_ids:
+            for ticket in expected[(sheet_id, row_id)]:
+                if found.get(row_id) != ticket:
+                    # The row was deleted or now references another ticket
+                    reverse_index.remove_location(ticket, sheet_id, row_id)
+        sheets.append(plan_sheet)
+    msg = str("Fetched {} Plan rows across {} sheets for {} changed Jira "
+              "Tickets").format(sum(len(x) for x in rows_by_sheet.values()),
+                                len(rows_by_sheet), len(tickets))
+    logging.debug(msg)
+    return sheets
+
+
+def changed_index_tickets(jira_index_sheet, jira_index_col_map, watermark):
+    """Lists the Jira Tickets whose Index row was modified since the
+    watermark.
+
+    Args:
+        jira_index_sheet (smartsheet.models.Sheet): The Jira Index Sheet
+        jira_index_col_map (dict): The Jira Index Sheet column map
+        watermark (datetime): The watermark of the last completed sync, or
+                              None to include every row
+
+    Returns:
+        list: The Jira Tickets on rows modified since the watermark
+    """
+    tickets = []
+    for row in jira_index_sheet.rows:
+        if watermark is not None and row.modified_at is not None and \
+                row.modified_at < watermark:
+            continue
+        ticket = get_ticket(row, jira_index_col_map)
+        if ticket:
+            tickets.append(ticket)
+    return tickets
+
+
+@execution_guard.guarded("bidirectional_sync")
 def bidirectional_sync(minutes):
     """Main execution for syncing bidirectionally between Program Plan sheets
     and the Jira Index Sheet, and by extension, Jira.
@@ -416,6 +980,7 @@ def bidirectional_sync(minutes):
         raise ValueError(msg)
 
     start = time.time()
+    reset_history_counts()
     msg = str("Starting bidirectinal sync between the Jira Index Sheet "
               "and all available Program Plans. "
               "Looking back {} minutes from {}"
@@ -432,96 +997,169 @@ def bidirectional_sync(minutes):
     columns_to_compare = [app_vars.jira_col, app_vars.jira_status_col,
                           app_vars.task_col, app_vars.assignee_col]
 
-    # Get all sheet IDs modified within the last N minutes
-    sheet_ids = get_data.get_all_sheet_ids(minutes, config.workspace_id,
-                                           config.index_sheet)
-    # Pull the sheets from the API and add them to a list.
-    source_sheets = get_data.refresh_source_sheets(sheet_ids, minutes)
-    # Pull the Jira Index Sheet and get the sheet data and columns
-    jira_index_sheet, jira_index_col_map, jira_index_rows =\
-        get_data.load_jira_index(config.index_sheet)
+    # Find the sheets modified within the last N minutes. Only the workspace
+    # listing is read, so the mode is picked before any Program Plan is
+    # downloaded. Cold sheets are only polled every few runs.
+    run_started = datetime.now(timezone.utc)
+    data_plane.start_reads()
+    sheet_ids = data_plane.discover(minutes, job_name='sync_jira_interval')
+    # Sheets that moved to this replica need a full sync.
+    watermark = sharding.check_watermark(reverse_index.get_watermark())
+    plan_sheets_changed = count_changed_sheets(sheet_ids, watermark)
+    mode = choose_sync_mode(plan_sheets_changed, watermark)
+    if mode == "Index":
+        # Only Jira changed. Pull the Index rows modified since the last
+        # sync, then just the Plan rows that reference them. None of the
+        # Program Plans changed, so they aren't downloaded.
+        source_sheets = []
+        jira_index_sheet, jira_index_col_map, jira_index_rows =\
+            get_data.load_jira_index(
+                config.index_sheet, reverse_index.minutes_since(watermark))
+    else:
+        # The sheets are shared with the other jobs while they are fresh.
+        # Tickets are matched across every sheet, so the sheets are all
+        # downloaded before the tickets are diffed.
+        source_sheets = data_plane.fetch_sheets("sync_jira", sheet_ids,
+                                                minutes)
+        # Pull the Jira Index Sheet and get the sheet data and columns
+        jira_index_sheet, jira_index_col_map, jira_index_rows =\
+            get_data.load_jira_index(config.index_sheet)
 
-    # Loop through the list of sheets modified in the last N minutes
-    for plan_sheet in source_sheets:
-        # Loop through each row. Look for a Jira Ticket value. Look up that
-        # value against all the tickets in the Index Sheet.
-        plan_rows_to_update = []
-        index_rows_to_update = []
-        plan_col_map = helper.get_column_map(plan_sheet)
-        # Skip the sheet if it doesn't have a Jira column
-        if app_vars.jira_col not in plan_col_map.keys():
-            continue
+    # Add the Plan rows for tickets that changed on the Index Sheet but
+    # aren't on a Program Plan that was already loaded. Only one run at a
+    # time follows the Index changes.
+    index_claimed = execution_guard.holds("index_changes")
+    changed_tickets = []
+    if watermark is not None and index_claimed:
+        changed_tickets = changed_index_tickets(
+            jira_index_sheet, jira_index_col_map, watermark)
+    loaded = set((plan_sheet.id, plan_row.id) for plan_sheet in source_sheets
+                 for plan_row in plan_sheet.rows)
+    source_sheets.extend(fetch_ticket_rows(changed_tickets, loaded))
+    msg = str("[JOB][JIRA SYNC] {} driven sync. {} Plan sheets and {} "
+              "Index rows changed.").format(mode, plan_sheets_changed,
+                                            len(changed_tickets))
+    logging.info(msg)
 
-        for plan_row in plan_sheet.rows:
-            plan_jira_cell = helper.get_cell_data(
-                plan_row, app_vars.jira_col, plan_col_map)
-            if not plan_jira_cell:
-                # Plan Jira cell never had a value
-                continue
-            if not plan_jira_cell.value:
-                # Plan Jira cell value is blank
-                continue
-            if plan_jira_cell.value not in jira_index_rows.keys():
-                # Plan Jira cell value isn't in the Jira Index Sheet.
-                # Raise error by setting plan jira cell value
-                msg = str("[WARNING]; {} not found in the index sheet. Check "
-                          "that the ticket was created or modified within the "
-                          "last 3 months and try again."
-                          "").format(plan_jira_cell.value)
-                plan_jira_cell.value = msg
-                new_row = smartsheet.models.Row()
-                new_row.id = plan_row.id
-                new_row.append(plan_jira_cell)
-                plan_rows_to_update.append(new_row)
-                continue
-            else:
-                index_row = get_index_row(
-                    jira_index_sheet, jira_index_rows[plan_jira_cell.value])
-            # index_row = smartsheet_api.get_row(
-            #     jira_index_sheet.id, jira_index_rows[plan_jira_cell.value])
-            msg = str("Index Row type: {}, Data: {}"
-                      "").format(type(index_row), index_row)
-            logging.debug(msg)
-            msg = str("Plan Row type: {}, Data: {}"
-                      "").format(type(plan_row), plan_row)
-            logging.debug(msg)
-            # newer = compare_dates(index_row, plan_row, "Row")
-            # if not newer:
-            #     # Skip to next row if rows were updated within 30 seconds of
-            #     # each other.
-            #     continue
-            # else:
-            updated_index_row, updated_plan_row = build_row(
-                jira_index_sheet, jira_index_col_map, index_row,
-                plan_sheet, plan_col_map, plan_row, columns_to_compare)
-            if updated_index_row.cells:
-                index_rows_to_update.append(updated_index_row)
-            else:
-                logging.debug("No Index Rows to Update")
+    # Group the Plan rows by Jira Ticket so each ticket is compared once,
+    # however many Plan rows reference it.
+    tickets, plan_updates = group_by_ticket(source_sheets, jira_index_rows,
+                                            mode == "Plan")
+    sheets = {plan_sheet.id: plan_sheet for plan_sheet in source_sheets}
+    # Look the Index rows up by Row ID instead of scanning the Index Sheet
+    # once per ticket.
+    index_rows_by_id = {row.id: row for row in jira_index_sheet.rows}
+    index_rows = {}
+    for ticket in tickets.keys():
+        index_rows[ticket] = index_rows_by_id.get(jira_index_rows[ticket])
+
+    # Resolve the column ID pairs once per Program Plan.
+    column_plans = {}
+    for plan_entries in tickets.values():
+        for plan_sheet, plan_col_map, _ in plan_entries:
+            if plan_sheet.id not in column_plans:
+                column_plans[plan_sheet.id] = compile_columns(
+                    jira_index_col_map, plan_col_map, columns_to_compare)
+
+    # Collect every cell history lookup up front and resolve them
+    # concurrently before comparing rows.
+    lookups = []
+    for ticket, plan_entries in tickets.items():
+        lookups.extend(history_lookups(
+            jira_index_sheet, jira_index_col_map, index_rows[ticket],
+            plan_entries, columns_to_compare, column_plans))
+    cell_history.prefetch(lookups)
+
+    # Diff the tickets, several at a time if workers are configured.
+    diffs = diff_tickets(jira_index_sheet, jira_index_col_map, index_rows,
+                         tickets, columns_to_compare, column_plans)
+
+    index_rows_to_update = []
+    # Snapshot values staged per ticket, saved once the rows are written.
+    staged_updates = []
+    for ticket, updated_index_row, updated_plan_rows, snapshot_updates \
+            in diffs:
+        plan_entries = tickets[ticket]
+        sheet_ids = set()
+        for (plan_sheet, _, _), updated_plan_row in zip(plan_entries,
+                                                        updated_plan_rows):
             if updated_plan_row.cells:
-                plan_rows_to_update.append(updated_plan_row)
-            else:
-                logging.debug("No Plan Rows to Update")
-        if index_rows_to_update:
-            # Drop multiple references to the same row
-            index_rows_to_update = drop_dupes(index_rows_to_update)
-            smartsheet_api.write_rows_to_sheet(
-                index_rows_to_update, jira_index_sheet, "update")
-        if plan_rows_to_update:
-            # Drop multiple references to the same row. This should never
-            # happen since the Jira Index Sheet can't contain more than
-            # 1 reference to a Jira Key, but adding it to be safe.
-            plan_rows_to_update = drop_dupes(plan_rows_to_update)
-            smartsheet_api.write_rows_to_sheet(
-                plan_rows_to_update, plan_sheet, "update")
+                plan_updates.setdefault(plan_sheet.id, []).append(
+                    updated_plan_row)
+                sheet_ids.add(plan_sheet.id)
+        if updated_index_row.cells:
+            index_rows_to_update.append(updated_index_row)
+        else:
+            logging.debug("No Index Rows to Update")
+        staged_updates.append((updated_index_row, sheet_ids,
+                               snapshot_updates))
+
+    def write_plan(sheet_id):
+        # Drop multiple references to the same row. This should never
+        # happen since a Plan row only references one Jira Ticket, but
+        # adding it to be safe.
+        plan_rows_to_update = drop_dupes(plan_updates[sheet_id])
+        result = smartsheet_api.write_rows_to_sheet(
+            plan_rows_to_update, sheets[sheet_id], "update")
+        return sheet_id, write_succeeded(result)
+
+    # Write the Plan sheets, several at a time if workers are configured,
+    # then write the Jira Index Sheet in one pass.
+    plan_written = {}
+    if plan_updates:
+        results, _ = work_queue.run_pipeline(
+            "sync_jira", list(plan_updates),
+            [{"name": "write", "function": write_plan,
+              "workers": app_vars.sync_workers}])
+        plan_written = dict(results)
+    # Only one replica writes the Index Sheet. The others queue their rows
+    # for it. Queued rows aren't written yet, so the snapshot and watermark
+    # wait until a later run sees the owner's write. Queueing the same rows
+    # again replaces them, and the owner drops cells whose row was edited
+    # after this run read it.
+    index_written = True
+    if index_rows_to_update:
+        index_written = sharding.write_index_rows(
+            index_rows_to_update, jira_index_sheet,
+            data_plane.oldest_read(run_started)) == "written"
+
+    # Only save snapshot values for rows that were written. Otherwise
+    # the next run would see the unwritten side as the changed side.
+    for updated_index_row, sheet_ids, snapshot_updates in staged_updates:
+        if updated_index_row.cells and not index_written:
+            continue
+        if not all(plan_written[sheet_id] for sheet_id in sheet_ids):
+            continue
+        sync_snapshot.set_values(snapshot_updates)
+
+    # Persist the last synced values for the next run.
+    sync_snapshot.save_snapshot()
+    # Remember where each ticket lives. Only move the watermark past the
+    # Index changes once every row was written, so failures are retried.
+    # Shared sheets hold it back to when they were downloaded, cold sheets
+    # that were put off to when they were last polled, and older runs
+    # still in flight to their start. A run that didn't follow the Index
+    # changes leaves it alone.
+    reverse_index.add_locations(tickets)
+    if index_claimed and index_written and all(plan_written.values()):
+        reverse_index.set_watermark(sheet_scheduler.safe_watermark(
+            'sync_jira_interval', execution_guard.safe_watermark(
+                data_plane.oldest_read(run_started))))
+    reverse_index.save_index()
 
     end = time.time()
     elapsed = end - start
     elapsed = helper.truncate(elapsed, 3)
     msg = str("[JOB][JIRA SYNC] took {} seconds.").format(elapsed)
     logging.info(msg)
-    interval_msg = jobs.modify_scheduler(
-        elapsed, 'sync_jira_interval', 'seconds', 1)
+    msg = str("[JOB][JIRA SYNC] made {} cell history calls. {} lookups "
+              "were served from the history cache. {} calls were avoided by "
+              "the sync snapshot.").format(cell_history.misses,
+                                           cell_history.hits,
+                                           history_calls_avoided)
+    logging.info(msg)
+    interval_msg = scheduler_controller.record_run(
+        'sync_jira_interval', elapsed)
     logging.info(interval_msg)
     gc.collect()
     return True
@@ -1,18 +1,114 @@
 import gc
 import logging
 import time
+from datetime import datetime, timezone
 
-import app.config as config
+import app.variables as app_vars
+import data_module.cell_link_sheet_data as cell_links
+import data_module.data_plane as data_plane
+import data_module.execution_guard as execution_guard
 import data_module.helper as helper
-import data_module.jobs as jobs
+import data_module.link_status as link_status
+import data_module.scheduler_controller as scheduler_controller
+import data_module.sharding as sharding
+import data_module.sheet_scheduler as sheet_scheduler
+import data_module.smartsheet_api as smartsheet_api
+import sync_module.link_graph as link_graph
 
 
-def full_smartsheet_sync(minutes):
-    """Sync Smartsheet data between rows using UUID
+def load_link_rows(edges, source_sheets):
+    """Makes sure both rows of every link are loaded. Rows that weren't
+       modified in the lookback window are fetched with one request per
+       sheet. Links whose destination row no longer exists are removed from
+       the link graph.
+
+    Args:
+        edges (dict): {Destination UUID: Source UUID}
+        source_sheets (list): The sheets loaded for the sync
+
+    Returns:
+        list: The loaded sheets, plus any sheet that had to be fetched
+    """
+    sheets = {sheet.id: sheet for sheet in source_sheets}
+    needed = {}
+    for dest_uuid, source_uuid in edges.items():
+        for uuid in (dest_uuid, source_uuid):
+            sheet_id, row_id = uuid.split("-")[0:2]
+            needed.setdefault(int(sheet_id), set()).add(int(row_id))
+
+    fetched = 0
+    for sheet_id, row_ids in needed.items():
+        sheet = sheets.get(sheet_id)
+        loaded = set(row.id for row in sheet.rows) if sheet else set()
+        missing = sorted(row_ids - loaded)
+        if not missing:
+            continue
+        link_sheet = smartsheet_api.get_sheet(sheet_id, minutes=0,
+                                              row_ids=missing)
+        if sheet is None:
+            sheets[sheet_id] = link_sheet
+        else:
+            sheet.rows.extend(link_sheet.rows)
+        fetched += len(missing)
+
+    for dest_uuid in edges:
+        sheet_id, row_id = dest_uuid.split("-")[0:2]
+        sheet = sheets.get(int(sheet_id))
+        if sheet is None or \
+                int(row_id) not in set(row.id for row in sheet.rows):
+            link_graph.remove_edge(dest_uuid)
+    msg = str("Fetched {} linked rows that weren't modified in the lookback "
+              "window").format(fetched)
+    logging.debug(msg)
+    return list(sheets.values())
+
+
+def link_row_data(sheets, uuids):
+    """Builds the row data write_uuid_cell_links needs for the linked rows.
+
+    Args:
+        sheets (list): The sheets holding the linked rows
+        uuids (set): The UUIDs of both rows of every link
+
+    Returns:
+        dict: {UUID: {Column Name: value}} for every sheet column
     """
-    import data_module.get_data as get_data
+    project_data_index = {}
+    for sheet in sheets:
+        col_map = helper.get_column_map(sheet)
+        uuid_id = col_map.get(app_vars.uuid_col)
+        if uuid_id is None:
+            continue
+        for row in sheet.rows:
+            values = {cell.column_id: cell.value for cell in row.cells}
+            uuid = values.get(uuid_id)
+            if uuid not in uuids:
+                continue
+            project_data_index[uuid] = {
+                col: values.get(col_map.get(col))
+                for col in app_vars.sheet_columns}
+    return project_data_index
+
+
+@execution_guard.guarded("intersheet_sync")
+def full_smartsheet_sync(minutes):
+    """Sync Smartsheet data between rows using UUID. Rows link to another
+       row by putting its UUID in the Description column. Only the links
+       where either row changed since the last sync are checked, and the
+       cell links are written in one batch per destination sheet.
 
-    # import data_module.write_data as write_data
+    Args:
+        minutes (int): The number of minutes to look back for changed sheets
+                       and rows
+
+    Raises:
+        TypeError: Minutes must be an int
+        ValueError: Minutes must be greater than or equal to zero
+
+    Returns:
+        bool: True once the sync finished
+        str: A message if there were no sheets to sync
+    """
     if not isinstance(minutes, int):
         msg = str("Minutes should be type: int, not {}").format(type(minutes))
         raise TypeError(msg)
@@ -28,13 +124,17 @@ def full_smartsheet_sync(minutes):
                                        time.localtime(start)))
     logging.debug(msg)
 
-    sheet_ids = get_data.get_all_sheet_ids(
-        minutes, config.workspace_id, config.index_sheet)
-    sheet_ids = list(set(sheet_ids))
+    run_started = datetime.now(timezone.utc)
+    data_plane.start_reads()
 
     # Calculate a number minutes ago to get only the rows that were modified
-    # since the last run.
-    source_sheets = get_data.refresh_source_sheets(sheet_ids, minutes)
+    # since the last run. The sheets are shared with the other jobs, and
+    # cold sheets are only polled every few runs. The links are checked
+    # across every sheet at once, so only the downloads run as a pipeline.
+    sheet_ids = data_plane.discover(minutes,
+                                    job_name='sync_intersheet_interval')
+    source_sheets = data_plane.fetch_sheets("sync_intersheet", sheet_ids,
+                                            minutes)
 
     if not source_sheets:
         end = time.time()
@@ -45,11 +145,35 @@ def full_smartsheet_sync(minutes):
         logging.info(msg)
         return msg
 
-    # with project_index_lock:
-    #     project_uuid_index = get_data.get_all_row_data(
-    #         source_sheets, app_vars.sheet_columns, config.minutes)
+    # Record the links from the rows that changed since the last sync, then
+    # only re-check the links where either row changed.
+    # Sheets that moved to this replica need every link checked.
+    watermark = sharding.check_watermark(link_graph.get_watermark())
+    changed = link_graph.update_edges(source_sheets, watermark)
+    edges = link_graph.dirty_edges(changed)
+    results = {}
+    if edges:
+        link_sheets = load_link_rows(edges, source_sheets)
+        uuids = set(edges.keys()) | set(edges.values())
+        project_uuid_index = link_row_data(link_sheets, uuids)
+        results = cell_links.write_uuid_cell_links(
+            project_uuid_index, link_sheets, dest_uuids=set(edges.keys()))
+        link_status.save_index()
+    msg = str("[JOB][INTERSHEET SYNC] {} rows changed. Checked {} links "
+              "and wrote {} sheets.").format(len(changed), len(edges),
+                                             len(results))
+    logging.info(msg)
 
-    # write_uuid_cell_links(project_uuid_index, source_sheets)
+    # Only move the watermark once every sheet was written, so failed
+    # links are checked again on the next run. Shared sheets hold it back
+    # to when they were downloaded, cold sheets that were put off to when
+    # they were last polled, and older runs still in flight to their start.
+    if all(getattr(result, "message", None) == "SUCCESS"
+           for result in results.values()):
+        link_graph.set_watermark(sheet_scheduler.safe_watermark(
+            'sync_intersheet_interval', execution_guard.safe_watermark(
+                data_plane.oldest_read(run_started))))
+    link_graph.save_graph()
 
     end = time.time()
     elapsed = end - start
@@ -57,8 +181,8 @@ def full_smartsheet_sync(minutes):
     msg = str("[JOB][INTERSHEET SYNC] took {} seconds."
               "").format(elapsed)
     logging.info(msg)
-    interval_msg = jobs.modify_scheduler(
-        elapsed, 'sync_intersheet_interval', 'seconds', 1)
+    interval_msg = scheduler_controller.record_run(
+        'sync_intersheet_interval', elapsed)
     logging.info(interval_msg)
     gc.collect()
     return True
@@ -0,0 +1,212 @@
+"""Keeps a persistent graph of the UUID links made through the Description
+    column. Each edge points from the row that pulls data in through cell
+    links to the row the data comes from. Together with the watermark of the
+    last completed intersheet sync, it lets a sync re-check only the links
+    whose rows changed. Self links and cycles are found when the edges
+    change, not on every run.
+"""
+import copy
+import logging
+import re
+import threading
+from datetime import datetime, timezone
+
+import app.variables as app_vars
+import data_module.helper as helper
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+uuid_pattern = re.compile(r"\d+-\d+-\d+-\d+")
+"""Matches a UUID in the Description column. Type: re.Pattern
+    """
+
+_lock = threading.Lock()
+_state = None
+
+
+def load_graph():
+    """Loads the link graph from disk if it hasn't been loaded yet.
+
+    Returns:
+        dict: The link graph in the form of {"watermark": ISO date,
+              "edges": {Destination UUID: Source UUID},
+              "invalid": {Destination UUID: "self" or "cycle"}}
+    """
+    global _state
+    with _lock:
+        if _state is None:
+            _state = helper.load_state(app_vars.link_graph_name, {})
+            _state.setdefault("watermark", None)
+            _state.setdefault("edges", {})
+            _state.setdefault("invalid", {})
+            msg = str("Loaded link graph with {} links"
+                      "").format(len(_state["edges"]))
+            logging.debug(msg)
+        if smartsheet_api.dry_run_active():
+            # Planning only. The plan stages its changes in its own copy,
+            # so the real jobs never see them.
+            return smartsheet_api.dry_run_state(
+                "link_graph", lambda: copy.deepcopy(_state))
+        return _state
+
+
+def save_graph():
+    """Writes the link graph to disk so that the next run can use it.
+
+    Returns:
+        int: The number of links in the graph
+    """
+    with _lock:
+        if _state is None:
+            return 0
+        if smartsheet_api.dry_run_active():
+            # Planning only. Keep the state on disk as it was.
+            return 0
+        helper.save_state(app_vars.link_graph_name, _state)
+        return len(_state["edges"])
+
+
+def reset_graph():
+    """Drops the in-memory link graph so it is reloaded from disk on next
+       use.
+    """
+    global _state
+    with _lock:
+        _state = None
+
+
+def get_watermark():
+    """Gets the start time of the last completed intersheet sync.
+
+    Returns:
+        datetime: The watermark in UTC, or None if no sync has completed
+    """
+    state = load_graph()
+    with _lock:
+        watermark = state["watermark"]
+    if watermark is None:
+        return None
+    return datetime.fromisoformat(watermark)
+
+
+def set_watermark(watermark):
+    """Records the start time of a completed intersheet sync.
+
+    Args:
+        watermark (datetime): The time the sync started, timezone aware
+    """
+    state = load_graph()
+    with _lock:
+        state["watermark"] = watermark.astimezone(timezone.utc).isoformat()
+
+
+def find_invalid(edges):
+    """Finds the links that can never be written: a row that links to
+       itself, or a chain of links that leads back to where it started.
+
+    Args:
+        edges (dict): {Destination UUID: Source UUID}
+
+    Returns:
+        dict: {Destination UUID: "self" or "cycle"}
+    """
+    invalid = {}
+    done = set()
+    for start in edges:
+        path = []
+        on_path = {}
+        uuid = start
+        while uuid in edges and uuid not in done and uuid not in on_path:
+            on_path[uuid] = len(path)
+            path.append(uuid)
+            uuid = edges[uuid]
+        if uuid in on_path:
+            cycle = path[on_path[uuid]:]
+            reason = "self" if len(cycle) == 1 else "cycle"
+            for member in cycle:
+                invalid[member] = reason
+        done.update(path)
+    return invalid
+
+
+def update_edges(source_sheets, watermark):
+    """Records the link in the Description column of every row modified
+       since the watermark. When the links change, self links and cycles
+       are found again and any new ones are logged.
+
+    Args:
+        source_sheets (list): The sheets loaded for the sync
+        watermark (datetime): The watermark of the last completed sync, or
+                              None to read every row
+
+    Returns:
+        set: The UUIDs of the rows modified since the watermark
+    """
+    state = load_graph()
+    changed = set()
+    with _lock:
+        edges = state["edges"]
+        edges_changed = False
+        for sheet in source_sheets:
+            col_map = helper.get_column_map(sheet)
+            uuid_id = col_map.get(app_vars.uuid_col)
+            desc_id = col_map.get(app_vars.description_col)
+            if uuid_id is None or desc_id is None:
+                continue
+            for row in sheet.rows:
+                if watermark is not None and row.modified_at is not None \
+                        and row.modified_at < watermark:
+                    continue
+                values = {cell.column_id: cell.value for cell in row.cells}
+                uuid = values.get(uuid_id)
+                if not uuid:
+                    continue
+                changed.add(uuid)
+                description = values.get(desc_id)
+                if description and uuid_pattern.match(str(description)):
+                    if edges.get(uuid) != description:
+                        edges[uuid] = str(description)
+                        edges_changed = True
+                elif edges.pop(uuid, None) is not None:
+                    edges_changed = True
+
+        if edges_changed:
+            invalid = find_invalid(edges)
+            for uuid, reason in invalid.items():
+                if uuid in state["invalid"]:
+                    continue
+                msg = str("UUID {} links to {} and is part of a {} link. "
+                          "Skipping the link until the Description "
+                          "changes.").format(uuid, edges[uuid], reason)
+                logging.warning(msg)
+            state["invalid"] = invalid
+    return changed
+
+
+def dirty_edges(changed):
+    """Gets the links to re-check because either row changed.
+
+    Args:
+        changed (set): The UUIDs of the rows modified since the watermark
+
+    Returns:
+        dict: {Destination UUID: Source UUID}, without self links or cycles
+    """
+    state = load_graph()
+    with _lock:
+        return {dest: source for dest, source in state["edges"].items()
+                if (dest in changed or source in changed)
+                and dest not in state["invalid"]}
+
+
+def remove_edge(uuid):
+    """Forgets the link for a row that no longer exists.
+
+    Args:
+        uuid (str): The Destination UUID
+    """
+    state = load_graph()
+    with _lock:
+        if state["edges"].pop(uuid, None) is not None:
+            state["invalid"] = find_invalid(state["edges"])
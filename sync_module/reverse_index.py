@@ -0,0 +1,159 @@
+"""Keeps a persistent reverse index from each Jira Ticket to the Program
+    Plan rows that reference it, plus the watermark of the last completed
+    bidirectional sync. Together they let a sync that only saw changes on the
+    Jira Index Sheet fetch just the affected Plan rows instead of scanning
+    every Program Plan.
+"""
+import copy
+import logging
+import math
+import threading
+from datetime import datetime, timezone
+
+import app.variables as app_vars
+import data_module.helper as helper
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = None
+
+
+def load_index():
+    """Loads the reverse index from disk if it hasn't been loaded yet.
+
+    Returns:
+        dict: The reverse index in the form of {"watermark": ISO date,
+              "tickets": {Jira Ticket: [[Sheet ID, Row ID]]}}
+    """
+    global _state
+    with _lock:
+        if _state is None:
+            _state = helper.load_state(app_vars.reverse_index_name, {})
+            _state.setdefault("watermark", None)
+            _state.setdefault("tickets", {})
+            msg = str("Loaded reverse index with {} Jira Tickets"
+                      "").format(len(_state["tickets"]))
+            logging.debug(msg)
+        if smartsheet_api.dry_run_active():
+            # Planning only. The plan stages its changes in its own copy,
+            # so the real jobs never see them.
+            return smartsheet_api.dry_run_state(
+                "reverse_index", lambda: copy.deepcopy(_state))
+        return _state
+
+
+def save_index():
+    """Writes the reverse index to disk so that the next run can use it.
+
+    Returns:
+        int: The number of Jira Tickets in the reverse index
+    """
+    with _lock:
+        if _state is None:
+            return 0
+        if smartsheet_api.dry_run_active():
+            # Planning only. Keep the state on disk as it was.
+            return 0
+        helper.save_state(app_vars.reverse_index_name, _state)
+        return len(_state["tickets"])
+
+
+def reset_index():
+    """Drops the in-memory reverse index so it is reloaded from disk on next
+       use.
+    """
+    global _state
+    with _lock:
+        _state = None
+
+
+def get_watermark():
+    """Gets the start time of the last completed bidirectional sync.
+
+    Returns:
+        datetime: The watermark in UTC, or None if no sync has completed
+    """
+    state = load_index()
+    with _lock:
+        watermark = state["watermark"]
+    if watermark is None:
+        return None
+    return datetime.fromisoformat(watermark)
+
+
+def set_watermark(watermark):
+    """Records the start time of a completed bidirectional sync.
+
+    Args:
+        watermark (datetime): The time the sync started, timezone aware
+    """
+    state = load_index()
+    with _lock:
+        state["watermark"] = watermark.astimezone(timezone.utc).isoformat()
+
+
+def minutes_since(watermark, now=None):
+    """Converts the watermark into the number of minutes the API should look
+       back, rounded up with one extra minute so no change is missed.
+
+    Args:
+        watermark (datetime): The watermark in UTC
+        now (datetime, optional): The current time. Defaults to now.
+
+    Returns:
+        int: Minutes since the watermark, always at least 1
+    """
+    if now is None:
+        now = datetime.now(timezone.utc)
+    elapsed = (now - watermark).total_seconds()
+    return max(math.ceil(elapsed / 60), 0) + 1
+
+
+def get_locations(ticket):
+    """Gets every Plan row known to reference a Jira Ticket.
+
+    Args:
+        ticket (str): The Jira Ticket
+
+    Returns:
+        list: (Sheet ID, Row ID) tuples
+    """
+    state = load_index()
+    with _lock:
+        return [tuple(location)
+                for location in state["tickets"].get(ticket, [])]
+
+
+def add_locations(tickets):
+    """Records the Plan rows seen for each Jira Ticket during a sync.
+
+    Args:
+        tickets (dict): The Plan rows per Jira Ticket from group_by_ticket
+    """
+    state = load_index()
+    with _lock:
+        for ticket, plan_entries in tickets.items():
+            locations = state["tickets"].setdefault(ticket, [])
+            for plan_sheet, _, plan_row in plan_entries:
+                location = [plan_sheet.id, plan_row.id]
+                if location not in locations:
+                    locations.append(location)
+
+
+def remove_location(ticket, sheet_id, row_id):
+    """Forgets a Plan row that no longer references a Jira Ticket.
+
+    Args:
+        ticket (str): The Jira Ticket
+        sheet_id (int): The Program Plan Sheet ID
+        row_id (int): The Program Plan Row ID
+    """
+    state = load_index()
+    with _lock:
+        locations = state["tickets"].get(ticket, [])
+        if [sheet_id, row_id] in locations:
+            locations.remove([sheet_id, row_id])
+        if not locations:
+            state["tickets"].pop(ticket, None)
@@ -0,0 +1,173 @@
+"""Keeps a persistent snapshot of the last value synced between the Jira
+    Index Sheet and the Program Plans for each Jira Ticket and column. The
+    snapshot is the common ancestor for a three-way merge: whichever side
+    differs from the snapshot is the side that changed. Cell history is only
+    needed when more than one side changed since the last sync.
+"""
+import copy
+import logging
+import threading
+
+import app.variables as app_vars
+import data_module.helper as helper
+import data_module.smartsheet_api as smartsheet_api
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def link_key(hyperlink):
+    """Normalizes a hyperlink into a hashable key.
+
+    Args:
+        hyperlink (smartsheet.models.Hyperlink): The hyperlink to normalize
+
+    Returns:
+        tuple: The (url, sheet_id, report_id, sight_id) target, or None if
+               there is no hyperlink
+    """
+    if not hyperlink:
+        return None
+    return (hyperlink.url, hyperlink.sheet_id, hyperlink.report_id,
+            hyperlink.sight_id)
+
+
+def cell_key(cell):
+    """Normalizes a cell into a key that can be compared against the
+       snapshot. Uses the basic value, falling back to the object value, plus
+       the hyperlink target.
+
+    Args:
+        cell (smartsheet.models.Cell): The cell to normalize
+
+    Returns:
+        tuple: The normalized (value, hyperlink) pair
+    """
+    if cell is None:
+        return (None, None)
+    value = cell.value
+    if value is None and cell.object_value is not None:
+        value = str(cell.object_value)
+    return (value, link_key(cell.hyperlink))
+
+
+def _from_json(key):
+    # JSON stores the tuples from cell_key as lists.
+    if key is None:
+        return None
+    value, link = key
+    if link is not None:
+        link = tuple(link)
+    return (value, link)
+
+
+def load_snapshot():
+    """Loads the snapshot from disk if it hasn't been loaded yet.
+
+    Returns:
+        dict: The snapshot in the form of {Jira Ticket: {Column: key}}
+    """
+    global _snapshot
+    with _lock:
+        if _snapshot is None:
+            _snapshot = helper.load_state(app_vars.sync_snapshot_name, {})
+            msg = str("Loaded sync snapshot with {} Jira Tickets"
+                      "").format(len(_snapshot))
+            logging.debug(msg)
+        if smartsheet_api.dry_run_active():
+            # Planning only. The plan stages its changes in its own copy,
+            # so the real jobs never see them.
+            return smartsheet_api.dry_run_state(
+                "sync_snapshot", lambda: copy.deepcopy(_snapshot))
+        return _snapshot
+
+
+def save_snapshot():
+    """Writes the snapshot to disk so that the next run can use it.
+
+    Returns:
+        int: The number of Jira Tickets in the snapshot
+    """
+    with _lock:
+        if _snapshot is None:
+            return 0
+        if smartsheet_api.dry_run_active():
+            # Planning only. Keep the state on disk as it was.
+            return 0
+        helper.save_state(app_vars.sync_snapshot_name, _snapshot)
+        return len(_snapshot)
+
+
+def reset_snapshot():
+    """Drops the in-memory snapshot so it is reloaded from disk on next use.
+    """
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def get_value(ticket, column):
+    """Gets the last synced key for a Jira Ticket and column.
+
+    Args:
+        ticket (str): The Jira Ticket
+        column (str): The column name
+
+    Returns:
+        tuple: The last synced key, or None if it was never synced
+    """
+    snapshot = load_snapshot()
+    with _lock:
+        return _from_json(snapshot.get(ticket, {}).get(column))
+
+
+def set_value(ticket, column, key):
+    """Records the key that both sides agree on after a sync.
+
+    Args:
+        ticket (str): The Jira Ticket
+        column (str): The column name
+        key (tuple): The normalized cell key from cell_key
+    """
+    if ticket is None:
+        return
+    snapshot = load_snapshot()
+    with _lock:
+        snapshot.setdefault(ticket, {})[column] = key
+
+
+def set_values(updates):
+    """Records a batch of keys staged by build_row once the rows have been
+       written.
+
+    Args:
+        updates (list): A list of (Jira Ticket, Column, key) tuples
+    """
+    for ticket, column, key in updates:
+        set_value(ticket, column, key)
+
+
+def changed_keys(keys, last_key):
+    """Finds the distinct values that changed since the last sync across the
+       Index cell and every Plan cell for a Jira Ticket and column.
+
+    Args:
+        keys (list): The normalized cell keys, Index first
+        last_key (tuple): The last synced key, or None if never synced
+
+    Returns:
+        list: The distinct changed keys. Empty if every cell matches. More
+              than one key, or any mismatch without a snapshot, is a
+              conflict that needs the cell history.
+    """
+    distinct = []
+    for key in keys:
+        if key not in distinct:
+            distinct.append(key)
+    if len(distinct) == 1:
+        return []
+    if last_key is None:
+        return distinct
+    return [key for key in distinct if key != last_key]
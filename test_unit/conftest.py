@@ -1,3 +1,4 @@
+import importlib
 import json
 import logging
 
@@ -152,3 +153,49 @@ def set_init_fixture():
     global smartsheet_client
     smartsheet_client = config.smartsheet_client
     return smartsheet_client
+
+
+# Module level caches, counters and in-memory state files, as (module,
+# reset function) pairs. Each is dropped before and after every test, so no
+# test sees what another left behind.
+state_resets = [
+    ("sync_module.sync_snapshot", "reset_snapshot"),
+    ("sync_module.bidirectional_sync", "reset_history_counts"),
+    ("data_module.cell_history", "clear_cache"),
+    ("sync_module.reverse_index", "reset_index"),
+    ("data_module.smartsheet_api", "stop_dry_run"),
+    ("data_module.get_data", "clear_column_maps"),
+    ("data_module.run_context", "end_run"),
+    ("data_module.ticket_rules", "reset_hits"),
+    ("sync_module.link_graph", "reset_graph"),
+    ("data_module.link_status", "reset_index"),
+    ("data_module.data_plane", "clear"),
+    ("data_module.scheduler_controller", "reset"),
+    ("data_module.metrics", "clear"),
+    ("data_module.sheet_scheduler", "reset"),
+    ("data_module.sharding", "reset"),
+    ("data_module.execution_guard", "reset"),
+]
+# Environment variables unset for every test.
+state_env = ["SHARD_REPLICA_ID"]
+
+
+@pytest.fixture(autouse=True)
+def reset_state_fixture(monkeypatch):
+    for name in state_env:
+        monkeypatch.delenv(name, raising=False)
+    resets = [getattr(importlib.import_module(module), name)
+              for module, name in state_resets]
+    for reset in resets:
+        reset()
+    yield
+    for reset in resets:
+        reset()
+
+
+@pytest.fixture
+def lease_store_fixture(tmp_path):
+    import data_module.lease_store as lease_store
+    lease_store.set_path(str(tmp_path / "leases.sqlite3"))
+    yield lease_store
+    lease_store.set_path(None)
@@ -6,9 +6,8 @@ import smartsheet
 import sync_module.bidirectional_sync as sync
 import data_module.helper as helper
 import app.variables as app_vars
-# from datetime import datetime
-
-# from unittest.mock import patch
+from datetime import datetime, timezone
+from unittest.mock import patch
 
 # from freezegun import freeze_time
 
@@ -89,7 +88,15 @@ def test_rebuild_cell_0(sheet_fixture, cell_fixture):
 
 
 def test_rebuild_cell_1():
-    pass
+    cell = smartsheet.models.Cell(
+        {"columnId": 1, "value": "JAR-1",
+         "hyperlink": {"url": "https://jira/JAR-1", "sheetId": 7}})
+    rebuilt = sync.rebuild_cell(cell, 2)
+    assert rebuilt.column_id == 2
+    assert rebuilt.value == "JAR-1"
+    assert rebuilt.hyperlink is not cell.hyperlink
+    assert rebuilt.hyperlink.url == "https://jira/JAR-1"
+    assert rebuilt.hyperlink.sheet_id == 7
 
 
 def test_build_row_0(index_sheet_fixture, sheet_fixture, row_fixture):
@@ -128,8 +135,73 @@ def test_build_row_0(index_sheet_fixture, sheet_fixture, row_fixture):
                        plan_sheet, plan_col_map, plan_row, [])
 
 
+def build_sync_pair(index_value, plan_value):
+    columns = [{"id": 101, "title": app_vars.jira_col},
+               {"id": 102, "title": app_vars.task_col}]
+    index_sheet = smartsheet.models.Sheet({"id": 1, "columns": columns})
+    plan_sheet = smartsheet.models.Sheet(
+        {"id": 2, "columns": [{"id": 201, "title": app_vars.jira_col},
+                              {"id": 202, "title": app_vars.task_col}]})
+    index_row = smartsheet.models.Row(
+        {"id": 11, "cells": [{"columnId": 101, "value": "JAR-1"},
+                             {"columnId": 102, "value": index_value}]})
+    plan_row = smartsheet.models.Row(
+        {"id": 21, "cells": [{"columnId": 201, "value": "JAR-1"},
+                             {"columnId": 202, "value": plan_value}]})
+    return index_sheet, {app_vars.jira_col: 101, app_vars.task_col: 102}, \
+        index_row, plan_sheet, \
+        {app_vars.jira_col: 201, app_vars.task_col: 202}, plan_row
+
+
 def test_build_row_1():
-    pass
+    index_sheet, index_col_map, index_row, plan_sheet, plan_col_map, \
+        plan_row = build_sync_pair("Old Task", "New Task")
+    snapshot = {"JAR-1": {app_vars.task_col: ["Old Task", None]}}
+
+    @patch("sync_module.sync_snapshot.load_snapshot", return_value=snapshot)
+    @patch("data_module.smartsheet_api.get_cell_history")
+    def test_0(mock_0, mock_1):
+        updates = []
+        result = sync.build_row(index_sheet, index_col_map, index_row,
+                                plan_sheet, plan_col_map, plan_row,
+                                [app_vars.jira_col, app_vars.task_col],
+                                updates)
+        return result, updates, mock_0
+
+    (index_update, plan_update), updates, history = test_0()
+    # Only the Plan changed since the last sync, so no history is needed.
+    assert history.call_count == 0
+    assert len(index_update.cells) == 1
+    assert index_update.cells[0].value == "New Task"
+    assert index_update.cells[0].column_id == 102
+    assert not plan_update.cells
+    assert updates == [("JAR-1", app_vars.task_col, ("New Task", None))]
+
+
+def test_build_row_2():
+    index_sheet, index_col_map, index_row, plan_sheet, plan_col_map, \
+        plan_row = build_sync_pair("Index Task", "Plan Task")
+    snapshot = {"JAR-1": {app_vars.task_col: ["Old Task", None]}}
+    index_history = smartsheet.models.CellHistory(
+        {"modifiedAt": "2022-05-08T19:00:22Z"})
+    plan_history = smartsheet.models.CellHistory(
+        {"modifiedAt": "2022-05-08T19:10:22Z"})
+
+    @patch("sync_module.sync_snapshot.load_snapshot", return_value=snapshot)
+    @patch("data_module.smartsheet_api.get_cell_history",
+           side_effect=[[index_history], [plan_history]])
+    def test_0(mock_0, mock_1):
+        result = sync.build_row(index_sheet, index_col_map, index_row,
+                                plan_sheet, plan_col_map, plan_row,
+                                [app_vars.jira_col, app_vars.task_col])
+        return result, mock_0
+
+    (index_update, plan_update), history = test_0()
+    # Both sides changed, so the cell history decides. Plan is newer.
+    assert history.call_count == 2
+    assert index_update.cells[0].value == "Plan Task"
+    assert not plan_update.cells
+    assert snapshot["JAR-1"][app_vars.task_col] == ("Plan Task", None)
 
 
 def test_drop_dupes_0():
@@ -145,8 +217,26 @@ def test_drop_dupes_1(row_fixture):
     _, unlinked_row = row_fixture
     row_list = [unlinked_row, unlinked_row, unlinked_row, single_row]
     unique = sync.drop_dupes(row_list)
+    assert len(unique) == 2
     assert unique[0].id == unlinked_row.id
-    assert unique[1].id == unlinked_row.id
+    assert len(unique[0].cells) == len(unlinked_row.cells)
+    assert unique[1] is single_row
+
+
+def test_drop_dupes_2():
+    first = smartsheet.models.Row(
+        {"id": 11, "cells": [{"columnId": 101, "value": "First"},
+                             {"columnId": 102, "value": "Task"}]})
+    second = smartsheet.models.Row(
+        {"id": 11, "cells": [{"columnId": 101, "value": "Second"},
+                             {"columnId": 103, "value": "Status"}]})
+    other = smartsheet.models.Row(
+        {"id": 12, "cells": [{"columnId": 101, "value": "Other"}]})
+    unique = sync.drop_dupes([first, other, second])
+    assert [row.id for row in unique] == [11, 12]
+    assert [(cell.column_id, cell.value) for cell in unique[0].cells] == \
+        [(101, "First"), (102, "Task"), (103, "Status")]
+    assert unique[1] is other
 
 
 def test_bidirectional_sync_0():
@@ -154,3 +244,187 @@ def test_bidirectional_sync_0():
         sync.bidirectional_sync("config.minutes")
     with pytest.raises(ValueError):
         sync.bidirectional_sync(-1337)
+
+
+def test_history_lookups_0():
+    index_sheet, index_col_map, index_row, plan_sheet, plan_col_map, \
+        plan_row = build_sync_pair("Index Task", "Plan Task")
+    plan_entries = [(plan_sheet, plan_col_map, plan_row)]
+    columns = [app_vars.jira_col, app_vars.task_col]
+
+    @patch("sync_module.sync_snapshot.load_snapshot",
+           return_value={"JAR-1": {app_vars.task_col: ["Old Task", None]}})
+    def test_0(mock_0):
+        return sync.history_lookups(index_sheet, index_col_map, index_row,
+                                    plan_entries, columns)
+
+    @patch("sync_module.sync_snapshot.load_snapshot",
+           return_value={"JAR-1": {app_vars.task_col: ["Index Task", None]}})
+    def test_1(mock_0):
+        return sync.history_lookups(index_sheet, index_col_map, index_row,
+                                    plan_entries, columns)
+    assert test_0() == [(1, 11, 102, None), (2, 21, 202, None)]
+    # Only the Plan changed, so no history is needed.
+    assert test_1() == []
+
+
+def test_build_ticket_rows_0():
+    index_sheet, index_col_map, index_row, plan_sheet, plan_col_map, \
+        plan_row = build_sync_pair("Old Task", "New Task")
+    _, _, _, other_sheet, other_col_map, other_row = \
+        build_sync_pair("Old Task", "Old Task")
+    other_sheet.id = 3
+    plan_entries = [(plan_sheet, plan_col_map, plan_row),
+                    (other_sheet, other_col_map, other_row)]
+    snapshot = {"JAR-1": {app_vars.task_col: ["Old Task", None]}}
+
+    @patch("sync_module.sync_snapshot.load_snapshot", return_value=snapshot)
+    @patch("data_module.smartsheet_api.get_cell_history")
+    def test_0(mock_0, mock_1):
+        result = sync.build_ticket_rows(
+            index_sheet, index_col_map, index_row, plan_entries,
+            [app_vars.jira_col, app_vars.task_col])
+        return result, mock_0
+
+    (index_update, plan_updates), history = test_0()
+    assert history.call_count == 0
+    # The one changed Plan row wins and is fanned out to the other.
+    assert [cell.value for cell in index_update.cells] == ["New Task"]
+    assert not plan_updates[0].cells
+    assert [cell.value for cell in plan_updates[1].cells] == ["New Task"]
+    assert snapshot["JAR-1"][app_vars.task_col] == ("New Task", None)
+
+
+def test_diff_tickets_0():
+    index_sheet, index_col_map, _, plan_sheet, plan_col_map, _ = \
+        build_sync_pair("Task", "Task")
+    columns = [app_vars.jira_col, app_vars.task_col]
+    column_plans = {plan_sheet.id: sync.compile_columns(
+        index_col_map, plan_col_map, columns)}
+    index_rows = {}
+    tickets = {}
+    snapshot = {}
+    for number in range(1, 9):
+        ticket = str("JAR-{}").format(number)
+        index_rows[ticket] = smartsheet.models.Row(
+            {"id": 100 + number, "cells": [
+                {"columnId": 101, "value": ticket},
+                {"columnId": 102, "value": "Old Task"}]})
+        plan_row = smartsheet.models.Row(
+            {"id": 200 + number, "cells": [
+                {"columnId": 201, "value": ticket},
+                {"columnId": 202, "value": str("Task {}").format(number)}]})
+        tickets[ticket] = [(plan_sheet, plan_col_map, plan_row)]
+        snapshot[ticket] = {app_vars.task_col: ["Old Task", None]}
+
+    @patch("sync_module.sync_snapshot.load_snapshot", return_value=snapshot)
+    def test_0(mock_0):
+        return [[(ticket, index_update.to_dict(),
+                  [row.to_dict() for row in plan_updates], updates)
+                 for ticket, index_update, plan_updates, updates
+                 in sync.diff_tickets(index_sheet, index_col_map, index_rows,
+                                      tickets, columns, column_plans,
+                                      workers)]
+                for workers in (1, 4)]
+
+    serial, parallel = test_0()
+    # The tickets are diffed concurrently, with the same result.
+    assert parallel == serial
+    assert [diff[0] for diff in parallel] == list(tickets)
+    assert parallel[2][1]["cells"][0]["value"] == "Task 3"
+
+
+def test_compile_columns_0():
+    index_col_map = {app_vars.jira_col: 101, app_vars.task_col: 102,
+                     app_vars.status_col: 103}
+    plan_col_map = {app_vars.jira_col: 201, app_vars.task_col: 202}
+    columns = [app_vars.jira_col, app_vars.task_col, app_vars.status_col,
+               app_vars.assignee_col]
+    result = sync.compile_columns(index_col_map, plan_col_map, columns)
+    assert result == {app_vars.jira_col: (101, 201),
+                      app_vars.task_col: (102, 202)}
+
+
+def test_build_ticket_rows_1():
+    # A column missing from the Plan is skipped instead of raising.
+    index_sheet, index_col_map, index_row, plan_sheet, plan_col_map, \
+        plan_row = build_sync_pair("Old Task", "New Task")
+    index_col_map[app_vars.status_col] = 103
+    plan_entries = [(plan_sheet, plan_col_map, plan_row)]
+    snapshot = {"JAR-1": {app_vars.task_col: ["Old Task", None]}}
+    column_plans = {plan_sheet.id: sync.compile_columns(
+        index_col_map, plan_col_map,
+        [app_vars.task_col, app_vars.status_col])}
+
+    @patch("sync_module.sync_snapshot.load_snapshot", return_value=snapshot)
+    def test_0(mock_0):
+        return sync.build_ticket_rows(
+            index_sheet, index_col_map, index_row, plan_entries,
+            [app_vars.task_col, app_vars.status_col],
+            column_plans=column_plans)
+
+    index_update, plan_updates = test_0()
+    assert [cell.column_id for cell in index_update.cells] == [102]
+    assert not plan_updates[0].cells
+
+
+def test_group_by_ticket_0():
+    _, _, _, plan_sheet, _, plan_row = build_sync_pair("Task", "Task")
+    _, _, _, other_sheet, _, other_row = build_sync_pair("Task", "Task")
+    other_sheet.id = 1
+    missing_row = smartsheet.models.Row(
+        {"id": 22, "cells": [{"columnId": 201, "value": "JAR-404"}]})
+    plan_sheet.rows.append(plan_row)
+    plan_sheet.rows.append(missing_row)
+    other_sheet.rows.append(other_row)
+
+    tickets, warnings = sync.group_by_ticket([plan_sheet, other_sheet],
+                                             {"JAR-1": 11})
+    assert list(tickets.keys()) == ["JAR-1"]
+    assert [entry[0].id for entry in tickets["JAR-1"]] == [1, 2]
+    assert list(warnings.keys()) == [2]
+    assert warnings[2][0].id == 22
+    assert "JAR-404" in warnings[2][0].cells[0].value
+
+
+def test_choose_sync_mode_0():
+    watermark = datetime(2022, 5, 8, 19, 0, 22, tzinfo=timezone.utc)
+    assert sync.choose_sync_mode(0, None) == "Plan"
+    assert sync.choose_sync_mode(3, watermark) == "Plan"
+    assert sync.choose_sync_mode(0, watermark) == "Index"
+
+
+def test_count_changed_sheets_0():
+    import data_module.sheet_scheduler as sheet_scheduler
+    watermark = datetime(2022, 5, 8, 19, 0, 22, tzinfo=timezone.utc)
+    sheet_scheduler.observe({
+        1: datetime(2022, 5, 8, 18, 0, tzinfo=timezone.utc),
+        2: datetime(2022, 5, 8, 19, 30, tzinfo=timezone.utc)})
+    # Sheet 3 was never seen in a listing, so it counts as changed.
+    assert sync.count_changed_sheets([1, 2, 3], watermark) == 2
+    assert sync.count_changed_sheets([1], watermark) == 0
+    assert sync.count_changed_sheets([1, 2, 3], None) == 3
+
+
+def test_fetch_ticket_rows_0():
+    _, _, _, plan_sheet, _, plan_row = build_sync_pair("Task", "Task")
+    moved_row = smartsheet.models.Row(
+        {"id": 22, "cells": [{"columnId": 201, "value": "JAR-2"}]})
+    plan_sheet.rows.append(plan_row)
+    plan_sheet.rows.append(moved_row)
+    locations = {"JAR-1": [(2, 21), (2, 22), (3, 31)]}
+
+    @patch("sync_module.reverse_index.remove_location")
+    @patch("sync_module.reverse_index.get_locations",
+           side_effect=lambda ticket: locations.get(ticket, []))
+    @patch("data_module.smartsheet_api.get_sheet", return_value=plan_sheet)
+    def test_0(mock_0, mock_1, mock_2):
+        sheets = sync.fetch_ticket_rows(["JAR-1"], {(3, 31)})
+        return sheets, mock_0, mock_2
+
+    sheets, get_sheet, remove_location = test_0()
+    assert sheets == [plan_sheet]
+    # The already loaded row isn't fetched again.
+    get_sheet.assert_called_once_with(2, minutes=0, row_ids=[21, 22])
+    # Row 22 now references another ticket.
+    remove_location.assert_called_once_with("JAR-1", 2, 22)
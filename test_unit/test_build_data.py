@@ -1,4 +1,6 @@
+import json
 import logging
+from unittest.mock import patch
 
 import pytest
 import smartsheet
@@ -189,6 +191,41 @@ def test_build_row_1(row_fixture, columns_to_link, sheet_fixture,
     assert new_row.id == row.id
 
 
+def test_build_row_2(row_fixture, columns_to_link, sheet_fixture):
+    import data_module.build_data as build_data
+    import data_module.link_status as link_status
+    _, dest_col_map, _, _ = sheet_fixture
+    # Read the Index Sheet directly, since load_jira_index only accepts the
+    # Index Sheet IDs configured for the environment.
+    with open(cwd + '/dev_jira_index_sheet.json') as f:
+        index_sheet = smartsheet.models.Sheet(json.load(f))
+    index_col_map = helper.get_column_map(index_sheet)
+    with open(cwd + '/dev_jira_index_row.json') as f:
+        index_row = smartsheet.models.Row(json.load(f))
+    _, row = row_fixture
+
+    with pytest.raises(TypeError):
+        build_data.build_row(row, columns_to_link, dest_col_map,
+                             index_sheet, index_col_map, index_row.id,
+                             sheet_id="sheet_id")
+
+    @patch("data_module.helper.has_cell_link",
+           wraps=helper.has_cell_link)
+    @patch("data_module.helper.load_state", return_value={})
+    def test_0(mock_0, mock_1):
+        rows = [build_data.build_row(row, columns_to_link, dest_col_map,
+                                     index_sheet, index_col_map,
+                                     index_row.id, sheet_id=1)
+                for _ in range(2)]
+        return rows, mock_1.call_count
+
+    rows, checks = test_0()
+    # The second pass reads every status from the link status index.
+    assert checks == len(columns_to_link)
+    assert link_status.hits == len(columns_to_link)
+    assert rows[0].to_dict() == rows[1].to_dict()
+
+
 # TODO: Failing pynguin tests
 # Automatically generated by Pynguin.
 # import data_module.build_data as module_0
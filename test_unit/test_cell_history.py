@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+import smartsheet
+import app.variables as app_vars
+import data_module.cell_history as cell_history
+
+
+def build_row(row_id, modified_at="2022-05-08T19:00:22Z"):
+    return smartsheet.models.Row({"id": row_id, "modifiedAt": modified_at})
+
+
+def test_get_history_0(cell_history_fixture):
+    row = build_row(11)
+
+    @patch("data_module.smartsheet_api.get_cell_history",
+           return_value=[cell_history_fixture])
+    def test_0(mock_0):
+        first = cell_history.get_history(1, row, 101)
+        second = cell_history.get_history(1, row, 101)
+        return first, second, mock_0
+    first, second, api = test_0()
+    assert first == second == [cell_history_fixture]
+    assert api.call_count == 1
+    assert cell_history.hits == 1
+    assert cell_history.misses == 1
+
+
+def test_get_history_1(cell_history_fixture):
+    row = build_row(11)
+    changed_row = build_row(11, "2022-05-09T19:00:22Z")
+
+    @patch("data_module.smartsheet_api.get_cell_history",
+           return_value=[cell_history_fixture])
+    def test_0(mock_0):
+        cell_history.get_history(1, row, 101)
+        cell_history.get_history(1, changed_row, 101)
+        return mock_0
+    api = test_0()
+    # A newer row modified date is a different key.
+    assert api.call_count == 2
+
+
+def test_get_history_2(cell_history_fixture):
+    rows = [build_row(row_id) for row_id in range(1, 4)]
+
+    @patch("app.variables.history_cache_size", 2)
+    @patch("data_module.smartsheet_api.get_cell_history",
+           return_value=[cell_history_fixture])
+    def test_0(mock_0):
+        for row in rows:
+            cell_history.get_history(1, row, 101)
+        # Row 1 was evicted as the least recently used entry.
+        cell_history.get_history(1, rows[0], 101)
+        return mock_0
+    api = test_0()
+    assert api.call_count == 4
+    assert app_vars.history_cache_size != 2
+
+
+def test_prefetch_0(cell_history_fixture):
+    rows = [build_row(row_id) for row_id in range(1, 6)]
+    keys = [cell_history.history_key(1, row, 101) for row in rows]
+
+    @patch("data_module.smartsheet_api.get_cell_history",
+           return_value=[cell_history_fixture])
+    def test_0(mock_0):
+        fetched = cell_history.prefetch(keys + keys, workers=3)
+        again = cell_history.prefetch(keys, workers=3)
+        for row in rows:
+            cell_history.get_history(1, row, 101)
+        return fetched, again, mock_0
+    fetched, again, api = test_0()
+    assert fetched == 5
+    assert again == 0
+    assert api.call_count == 5
+    assert cell_history.hits == 5
+
+
+def test_prefetch_1():
+    row = build_row(11)
+
+    @patch("data_module.smartsheet_api.get_cell_history",
+           side_effect=KeyError("data"))
+    def test_0(mock_0):
+        return cell_history.prefetch([cell_history.history_key(1, row, 101)])
+    assert test_0() == 0
@@ -1,7 +1,9 @@
 import logging
+from unittest.mock import patch
 
 import app.config as config
 import pytest
+import smartsheet
 import data_module.cell_link_sheet_data as cell_links
 import data_module.get_data as get_data
 import data_module.helper as helper
@@ -56,3 +58,45 @@ def test_write_uuid_cell_links(project_data_index, sheet_fixture,
     with pytest.raises(TypeError):
         cell_links.write_uuid_cell_links(project_data_index, [sheet],
                                          "smartsheet_client")
+
+
+def build_link_sheet(sheet_id, row_id, column_base, description):
+    columns = [{"id": column_base + i, "title": col}
+               for i, col in enumerate(app_vars.sheet_columns)]
+    cells = [{"columnId": column_base + i, "value": None}
+             for i in range(len(app_vars.sheet_columns))]
+    desc_index = app_vars.sheet_columns.index(app_vars.description_col)
+    cells[desc_index]["value"] = description
+    rows = [{"id": row_id + offset, "cells": cells} for offset in (1, 0, 2)]
+    return smartsheet.models.Sheet({"id": sheet_id, "name": str(sheet_id),
+                                    "columns": columns, "rows": rows})
+
+
+def test_write_uuid_cell_links_0():
+    dest_sheet = build_link_sheet(10, 100, 1000, "20-200-3-4")
+    src_sheet = build_link_sheet(20, 200, 2000, None)
+    other_sheet = build_link_sheet(30, 300, 3000, None)
+    empty = {app_vars.jira_col: None, app_vars.predecessor_col: None,
+             app_vars.start_col: None}
+    project_data_index = {
+        "10-100-1-1": dict(empty, **{app_vars.description_col: "20-200-3-4"}),
+        "20-200-3-4": dict(empty, **{app_vars.description_col: None})
+    }
+
+    @patch("data_module.smartsheet_api.write_rows_to_sheet")
+    def test_0(mock_0):
+        cell_links.write_uuid_cell_links(
+            project_data_index, [other_sheet, src_sheet, dest_sheet])
+        return mock_0
+
+    write_rows = test_0()
+    assert write_rows.call_count == 1
+    rows, sheet = write_rows.call_args[0]
+    assert sheet is dest_sheet
+    assert [row.id for row in rows] == [100]
+    links = {cell.column_id: cell.link_in_from_cell.column_id
+             for cell in rows[0].cells}
+    sync_ids = [app_vars.sheet_columns.index(col)
+                for col in app_vars.sync_columns]
+    assert links == {1000 + i: 2000 + i for i in sync_ids}
+    assert {cell.link_in_from_cell.row_id for cell in rows[0].cells} == {200}
@@ -376,6 +376,40 @@ def test_copy_jira_tickets_to_sheet_2(sheet_fixture, index_sheet_fixture,
     assert result_3 == 0
 
 
+def test_copy_jira_tickets_to_sheet_3():
+    columns = [{"id": 101, "title": app_vars.uuid_col},
+               {"id": 102, "title": app_vars.jira_col}]
+    plan_rows = [
+        {"id": 21, "cells": [{"columnId": 101, "value": "2-21-1-1"},
+                             {"columnId": 102, "value": "Pending..."}]},
+        {"id": 22, "cells": [{"columnId": 101, "value": "2-99-1-1"},
+                             {"columnId": 102, "value": "Pending..."}]}]
+    index_rows = [
+        {"id": 11, "cells": [{"columnId": 101, "value": "2-21-1-1"},
+                             {"columnId": 102, "value": "JAR-1"}]},
+        {"id": 12, "cells": [{"columnId": 101, "value": "2-99-1-1"},
+                             {"columnId": 102, "value": "JAR-2"}]}]
+    sheet = smartsheet.models.Sheet({"id": 2, "name": "Plan",
+                                     "columns": columns, "rows": plan_rows})
+    index_sheet = smartsheet.models.Sheet({"id": 1, "columns": columns,
+                                           "rows": index_rows})
+    index_col_map = {app_vars.uuid_col: 101, app_vars.jira_col: 102}
+
+    @patch("data_module.smartsheet_api.write_rows_to_sheet")
+    def test_0(mock_0):
+        sheets_updated = jira.copy_jira_tickets_to_sheets([sheet],
+                                                          index_sheet,
+                                                          index_col_map)
+        return sheets_updated, mock_0
+
+    sheets_updated, write_rows = test_0()
+    assert sheets_updated == 1
+    # The UUID pointing at a row that isn't on the sheet is skipped.
+    rows = write_rows.call_args[0][0]
+    assert [row.id for row in rows] == [21]
+    assert rows[0].cells[0].object_value.value == "JAR-1"
+
+
 def test_copy_errors_to_sheet_0(sheet_fixture, push_tickets_sheet_fixture,
                                 row_fixture):
     sheet, col_map, _, _ = sheet_fixture
@@ -490,6 +524,52 @@ def test_copy_errors_to_sheet_3(sheet_fixture, push_tickets_sheet_fixture,
     assert isinstance(result_2, int)
 
 
+def test_copy_errors_to_sheet_4():
+    push_columns = [{"id": 301, "title": app_vars.uuid_col},
+                    {"id": 302, "title": "Sync Status"}]
+    push_rows = [
+        {"id": 31, "cells": [{"columnId": 301, "value": "2-21-1-1"},
+                             {"columnId": 302, "value": "Error 1"}]},
+        {"id": 32, "cells": [{"columnId": 301, "value": "2-22-1-1"},
+                             {"columnId": 302, "value": "Error 2"}]},
+        {"id": 33, "cells": [{"columnId": 301, "value": "2-23-1-1"},
+                             {"columnId": 302, "value": "Error 3"}]},
+        {"id": 34, "cells": [{"columnId": 301, "value": "2-24-1-1"}]}]
+    push_sheet = smartsheet.models.Sheet({"id": 3, "columns": push_columns,
+                                          "rows": push_rows})
+    push_col_map = {app_vars.uuid_col: 301, "Sync Status": 302}
+    plan_rows = [
+        {"id": 21, "cells": [{"columnId": 202, "value": "Pending..."}]},
+        {"id": 22, "cells": [{"columnId": 202, "value": "JAR-1"}]},
+        {"id": 23, "cells": [{"columnId": 202, "value": "Pending..."}]}]
+    plan_sheet = smartsheet.models.Sheet(
+        {"id": 2, "columns": [{"id": 202, "title": app_vars.jira_col}],
+         "rows": plan_rows})
+    result = smartsheet.models.Result()
+    result.message = "SUCCESS"
+
+    @patch("data_module.smartsheet_api.write_rows_to_sheet",
+           return_value=result)
+    @patch("data_module.smartsheet_api.get_sheet", return_value=plan_sheet)
+    @patch("data_module.create_jira_tickets.get_push_tickets_sheet",
+           return_value=[push_sheet, push_col_map])
+    def test_0(mock_0, mock_1, mock_2):
+        counts = jira.copy_errors_to_sheet()
+        return counts, mock_1, mock_2
+
+    counts, get_sheet, write_rows = test_0()
+    # Row 22 already has a ticket and row 34 has no sync status.
+    assert counts == (2, 0, 2)
+    assert get_sheet.call_count == 1
+    assert get_sheet.call_args[1]["row_ids"] == [21, 22, 23]
+    assert write_rows.call_count == 1
+    assert [row.id for row in write_rows.call_args[0][0]] == [21, 23]
+
+    # The second run only asks for the Jira column.
+    _, get_sheet, _ = test_0()
+    assert get_sheet.call_args[1]["column_ids"] == [202]
+
+
 def test_copy_uuid_to_index_sheet_0(index_sheet_fixture):
     index_sheet, index_col_map, _, _ = index_sheet_fixture
     with pytest.raises(TypeError):
@@ -570,6 +650,53 @@ def test_copy_uuid_to_index_sheet_3(index_sheet_fixture, cell_fixture):
     assert result_0 is False
 
 
+def test_build_ticket_uuids_0():
+    sub_index = {"2-22-3-202105120000000000": "JAR-1",
+                 "2-21-3-202105110000000000": "JAR-1",
+                 "not-a-uuid": "JAR-1",
+                 "2-23-3-202105110000000000": "JAR-2"}
+    result = jira.build_ticket_uuids(sub_index)
+    assert result == {"JAR-1": ["2-21-3-202105110000000000",
+                                "2-22-3-202105120000000000",
+                                "not-a-uuid"],
+                      "JAR-2": ["2-23-3-202105110000000000"]}
+
+
+def test_copy_uuid_to_index_sheet_4():
+    columns = [{"id": 101, "title": app_vars.uuid_col},
+               {"id": 102, "title": app_vars.jira_col}]
+    index_rows = [
+        {"id": 11, "cells": [{"columnId": 101, "value": "2-21-3-1"},
+                             {"columnId": 102, "value": "JAR-1"}]},
+        {"id": 12, "cells": [{"columnId": 101},
+                             {"columnId": 102, "value": "JAR-1"}]},
+        {"id": 13, "cells": [{"columnId": 101},
+                             {"columnId": 102, "value": "JAR-2"}]},
+        {"id": 14, "cells": [{"columnId": 101},
+                             {"columnId": 102, "value": "JAR-3"}]}]
+    index_sheet = smartsheet.models.Sheet({"id": 1, "columns": columns,
+                                           "rows": index_rows})
+    index_col_map = {app_vars.uuid_col: 101, app_vars.jira_col: 102}
+    sub_index = {"2-21-3-1": "JAR-1", "2-22-3-2": "JAR-1",
+                 "2-24-3-4": "JAR-2", "2-23-3-3": "JAR-2"}
+
+    @patch("data_module.smartsheet_api.write_rows_to_sheet")
+    @patch("data_module.create_jira_tickets.build_sub_indexes",
+           return_value=[sub_index, []])
+    @patch("data_module.create_jira_tickets.get_push_tickets_sheet",
+           return_value=[None, {}])
+    def test_0(mock_0, mock_1, mock_2):
+        jira.copy_uuid_to_index_sheet(index_sheet, index_col_map)
+        return mock_2
+
+    write_rows = test_0()
+    rows = write_rows.call_args[0][0]
+    # The UUID already on row 11 isn't reused, and the earliest UUID wins.
+    assert [row.id for row in rows] == [12, 13]
+    assert [row.cells[0].object_value.value for row in rows] == \
+        ["2-22-3-2", "2-23-3-3"]
+
+
 def test_link_jira_index_to_sheet_0(index_sheet_fixture, sheet_fixture):
 
     sheet, _, _, _, = sheet_fixture
@@ -835,101 +962,6 @@ def test_create_ticket_index_7(sheet_fixture, index_sheet_fixture,
     assert isinstance(ticket_index, dict)
 
 
-def test_modify_scheduler_0():
-    with pytest.raises(TypeError):
-        jira.modify_scheduler("1337")
-    with pytest.raises(ValueError):
-        jira.modify_scheduler(-1337)
-
-
-def test_modify_scheduler_1():
-    import app.config as config
-
-    def test_0():
-        config.scheduler.add_job(jira.create_tickets,
-                                 'interval',
-                                 args=[config.minutes],
-                                 minutes=2,
-                                 id="create_jira_interval")
-        result = jira.modify_scheduler(30.567)
-        config.scheduler.remove_all_jobs()
-        return result
-    result_0 = test_0()
-    assert isinstance(result_0, str)
-    assert "Job interval is 1 minute(s) longer than the job " in result_0
-    assert "runtime. Reduced interval to 1 minutes" in result_0
-
-
-def test_modify_scheduler_2():
-    import app.config as config
-
-    def test_0():
-        config.scheduler.add_job(jira.create_tickets,
-                                 'interval',
-                                 args=[config.minutes],
-                                 minutes=2,
-                                 id="create_jira_interval")
-        result = jira.modify_scheduler(120)
-        config.scheduler.remove_all_jobs()
-        return result
-    result_0 = test_0()
-    assert isinstance(result_0, str)
-    assert "Job interval and job runtime are within 1 minute of " in result_0
-    assert "each other. No changes to interval." in result_0
-
-
-def test_modify_scheduler_3():
-    import app.config as config
-
-    def test_0():
-        config.scheduler.add_job(jira.create_tickets,
-                                 'interval',
-                                 args=[config.minutes],
-                                 minutes=2,
-                                 id="create_jira_interval")
-        result = jira.modify_scheduler(179)
-        config.scheduler.remove_all_jobs()
-        return result
-    result_0 = test_0()
-    assert isinstance(result_0, str)
-    assert result_0 == "New job interval set to 3 minutes"
-
-
-def test_modify_scheduler_4():
-    import app.config as config
-
-    def test_0():
-        config.scheduler.add_job(jira.create_tickets,
-                                 'interval',
-                                 args=[config.minutes],
-                                 minutes=2,
-                                 id="create_jira_interval")
-        result = jira.modify_scheduler(1)
-        config.scheduler.remove_all_jobs()
-        return result
-    result_0 = test_0()
-    assert isinstance(result_0, str)
-    assert "Job interval is 1 minute(s) longer than the job " in result_0
-    assert "runtime. Reduced interval to 1 minutes" in result_0
-
-
-def test_modify_scheduler_5():
-    import app.config as config
-
-    def test_0():
-        config.scheduler.add_job(jira.create_tickets,
-                                 'interval',
-                                 args=[config.minutes],
-                                 minutes=2,
-                                 id="create_jira_interval")
-        result = jira.modify_scheduler(178.99999)
-        config.scheduler.remove_all_jobs()
-        return result
-    result_0 = test_0()
-    assert isinstance(result_0, str)
-    assert result_0 == "New job interval set to 3 minutes"
-
-
 def test_create_tickets_0():
 
     with pytest.raises(TypeError):
@@ -948,7 +980,7 @@ def test_create_tickets_1(workspace_fixture, sheet_fixture,
     result.message = "SUCCESS"
     result.result_code = 0
 
-    @patch("data_module.create_jira_tickets.modify_scheduler",
+    @patch("data_module.scheduler_controller.record_run",
            return_value="message")
     @patch("data_module.create_jira_tickets.create_ticket_index",
            return_value={"Row": "Data"})
@@ -979,7 +1011,7 @@ def test_create_tickets_2(workspace_fixture, sheet_fixture,
     result.message = "SUCCESS"
     result.result_code = 0
 
-    @patch("data_module.create_jira_tickets.modify_scheduler",
+    @patch("data_module.scheduler_controller.record_run",
            return_value="message")
     @patch("data_module.create_jira_tickets.create_ticket_index",
            return_value={})
@@ -1012,7 +1044,7 @@ def test_create_tickets_3(workspace_fixture, sheet_fixture,
 
     @patch("data_module.create_jira_tickets.copy_errors_to_sheet",
            return_value=[1, 1, 1])
-    @patch("data_module.create_jira_tickets.modify_scheduler",
+    @patch("data_module.scheduler_controller.record_run",
            return_value="message")
     @patch("data_module.create_jira_tickets.create_ticket_index",
            return_value={"Row": "Data"})
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import smartsheet
+import data_module.data_plane as data_plane
+import data_module.smartsheet_api as smartsheet_api
+
+
+def build_sheet(sheet_id):
+    return smartsheet.models.Sheet({"id": sheet_id, "name": str(sheet_id),
+                                    "rows": [{"id": sheet_id + 1}]})
+
+
+SHEETS = {sheet_id: build_sheet(sheet_id) for sheet_id in (10, 20)}
+SUCCESS = smartsheet.models.Result({"message": "SUCCESS", "resultCode": 0})
+
+
+def refresh(sheet_ids, minutes):
+    return [SHEETS[sheet_id] for sheet_id in sheet_ids]
+
+
+def test_get_source_sheets_0():
+    @patch("data_module.get_data.refresh_source_sheets", side_effect=refresh)
+    @patch("data_module.get_data.get_all_sheet_ids", return_value=[10, 20])
+    def test_0(mock_0, mock_1):
+        _, first = data_plane.get_source_sheets(5)
+        first[0].rows.append(smartsheet.models.Row({"id": 99}))
+        generation = data_plane.generation()
+        _, second = data_plane.get_source_sheets(5)
+        # A write drops the sheet, so the next job discovers the changed
+        # sheets again and only downloads the written one.
+        smartsheet_api.notify_write(20, [], "update", SUCCESS)
+        _, third = data_plane.get_source_sheets(5)
+        _, expired = data_plane.get_source_sheets(5, ttl=-1)
+        return first, second, third, expired, generation, mock_0, mock_1
+
+    with patch.multiple("app.config", create=True, workspace_id=[1],
+                        index_sheet=2):
+        first, second, third, expired, generation, sheet_ids, refreshed = \
+            test_0()
+    assert sorted(sheet.id for sheet in second) == [10, 20]
+    assert first[0] is not second[0]
+    # Each job gets its own list of rows.
+    assert [len(sheet.rows) for sheet in second] == [1, 1]
+    assert generation == 1
+    assert sheet_ids.call_count == 3
+    assert [call[0][0] for call in refreshed.call_args_list] == \
+        [[10, 20], [20], [10, 20]]
+    assert sorted(sheet.id for sheet in third) == [10, 20]
+    assert len(expired) == 2
+
+
+def test_get_sheet_0():
+    @patch("data_module.smartsheet_api.get_sheet",
+           side_effect=lambda sheet_id, minutes: SHEETS[sheet_id])
+    def test_0(mock_0):
+        sheets = [data_plane.get_sheet(10) for _ in range(3)]
+        data_plane.invalidate(10)
+        sheets.append(data_plane.get_sheet(10))
+        return sheets, mock_0
+
+    sheets, get_sheet = test_0()
+    assert get_sheet.call_count == 2
+    assert (data_plane.hits, data_plane.misses) == (2, 2)
+    assert all(sheet.id == 10 for sheet in sheets)
+    data_plane.clear()
+    assert data_plane.invalidate not in smartsheet_api._write_listeners
+
+
+def test_get_sheet_1():
+    @patch("data_module.smartsheet_api.get_sheet",
+           side_effect=lambda sheet_id, minutes: SHEETS[sheet_id])
+    def test_0(mock_0):
+        data_plane.get_sheet(10, 5)
+        # Sheets that aren't shared are always downloaded.
+        data_plane.get_sheet(10, 7, shared=False)
+        data_plane.get_sheet(10, 7, shared=False)
+        keys = sorted(data_plane._sheets)
+        # Expired copies are dropped when the next sheet is added.
+        with patch("app.variables.data_plane_ttl", -1):
+            data_plane.get_sheet(20)
+        return keys, sorted(data_plane._sheets), mock_0
+
+    keys, evicted, get_sheet = test_0()
+    assert get_sheet.call_count == 4
+    assert keys == [(10, 5)]
+    assert evicted == [(20, 0)]
+
+
+def test_oldest_read_0():
+    now = datetime.now(timezone.utc)
+    later = now + timedelta(minutes=1)
+
+    @patch("data_module.smartsheet_api.get_sheet",
+           side_effect=lambda sheet_id, minutes: SHEETS[sheet_id])
+    def test_0(mock_0):
+        data_plane.get_sheet(10)
+        data_plane.start_reads()
+        # A shared copy is as old as its download, not this read.
+        data_plane.get_sheet(10)
+        return data_plane.oldest_read(later)
+
+    oldest = test_0()
+    assert now - timedelta(seconds=5) < oldest < later
+    data_plane.start_reads()
+    assert data_plane.oldest_read(later) == later
+
+
+def test_fetch_sheets_0():
+    later = datetime.now(timezone.utc) + timedelta(minutes=1)
+
+    @patch("data_module.get_data.refresh_source_sheets", side_effect=refresh)
+    def test_0(mock_0):
+        data_plane.start_reads()
+        sheets = data_plane.fetch_sheets("test", [20, 10], 5)
+        return sheets, data_plane.oldest_read(later), mock_0
+
+    sheets, oldest, refreshed = test_0()
+    # The sheets come back in the order asked for, one download each.
+    assert [sheet.id for sheet in sheets] == [20, 10]
+    assert refreshed.call_count == 2
+    # The pipeline's downloads count as read by this thread.
+    assert oldest < later
+    assert data_plane.fetch_sheets("test", [], 5) == []
+
+
+def test_copy_row_0():
+    sheet = data_plane.snapshot(SHEETS[10])
+    row = smartsheet.models.Row({"id": 5, "version": 3, "cells": [
+        {"columnId": 7, "value": "Done",
+         "hyperlink": {"url": "https://jira"}}]})
+    row_copy = data_plane.copy_row(row)
+    row_copy.version = 4
+    row_copy.cells[0].value = "To Do"
+    row_copy.cells[0].hyperlink = smartsheet.models.ExplicitNull()
+    sheet.version = 9
+    assert row.version == 3
+    assert row.cells[0].value == "Done"
+    assert row.cells[0].hyperlink.url == "https://jira"
+    assert SHEETS[10].version is None
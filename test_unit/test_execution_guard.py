@@ -0,0 +1,85 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+import smartsheet
+
+import data_module.data_plane as data_plane
+import data_module.execution_guard as execution_guard
+import data_module.metrics as metrics
+
+
+def test_start_run_0():
+    with pytest.raises(TypeError):
+        execution_guard.start_run(1337)
+    # Without a guarded run, every key is claimed.
+    assert execution_guard.current_run() is None
+    assert execution_guard.claim([10, 20]) == [10, 20]
+    assert execution_guard.end_run() is None
+
+
+def test_claim_0():
+    # A run on another thread is still in flight.
+    first = execution_guard.start_run("sync")
+    execution_guard._local.run_id = None
+    assert execution_guard.claim([10, 20], first) == [10, 20]
+
+    second = execution_guard.start_run("sync")
+    other_job = execution_guard.start_run("uuids")
+    assert execution_guard.claim([20, 30], second) == [30]
+    assert execution_guard.holds(20, other_job) is True
+    assert execution_guard.holds("index_changes", second) is True
+    assert execution_guard.holds("index_changes", first) is False
+    started = datetime.now(timezone.utc) + timedelta(minutes=1)
+    assert execution_guard.safe_watermark(started, second) < started
+    assert execution_guard.safe_watermark(started, other_job) == started
+
+    assert execution_guard.end_run(second) == "shortened"
+    assert execution_guard.end_run(first) == "shortened"
+    assert execution_guard.end_run(other_job) == "complete"
+    # Once the older run ends, its work is free again.
+    third = execution_guard.start_run("sync")
+    assert execution_guard.claim([10, 20], third) == [10, 20]
+    assert execution_guard.end_run(third) == "complete"
+    assert execution_guard.stats["sync"]["runs"] == 3
+    assert execution_guard.stats["sync"]["shortened"] == 2
+
+
+def test_guarded_0():
+    sheets = {sheet_id: smartsheet.models.Sheet({"id": sheet_id})
+              for sheet_id in (10, 20)}
+    started = threading.Event()
+    release = threading.Event()
+
+    @execution_guard.guarded("job")
+    def job(wait):
+        _, source_sheets = data_plane.get_source_sheets(5)
+        if wait:
+            started.set()
+            release.wait(5)
+        return sorted(sheet.id for sheet in source_sheets)
+
+    @patch("data_module.get_data.refresh_source_sheets",
+           side_effect=lambda ids, minutes: [sheets[i] for i in ids])
+    @patch("data_module.get_data.get_all_sheet_ids", return_value=[10, 20])
+    def test_0(mock_0, mock_1):
+        results = {}
+        thread = threading.Thread(
+            target=lambda: results.setdefault("first", job(True)))
+        thread.start()
+        started.wait(5)
+        results["second"] = job(False)
+        release.set()
+        thread.join(5)
+        results["third"] = job(False)
+        return results
+
+    with patch.multiple("app.config", create=True, workspace_id=[1],
+                        index_sheet=2):
+        results = test_0()
+    assert results == {"first": [10, 20], "second": [], "third": [10, 20]}
+    assert execution_guard.stats["job"]["skipped"] == 1
+    metric = metrics.get("execution_guard.job.skipped")
+    assert metric["value"] == 1
+    assert metric["details"]["runs"] == 3
@@ -270,7 +270,7 @@ def test_load_jira_index_1(index_sheet_fixture):
     assert isinstance(col_map, dict)
     assert sheet.id == index_sheet.id
     assert sheet.name == index_sheet.name
-    assert sheet == index_sheet
+    assert sheet.to_dict() == index_sheet.to_dict()
     assert col_map == index_col_map
     for col in app_vars.sync_columns:
         assert col in col_map.keys()
@@ -4,11 +4,36 @@ import pytest
 import smartsheet
 import data_module.helper as helper
 import sync_module.intersheet_sync as sync
+import sync_module.link_graph as link_graph
 import app.variables as app_vars
 
 _, cwd = helper.get_local_paths()
 
 
+@pytest.fixture(autouse=True)
+def link_graph_fixture():
+    link_graph.reset_graph()
+    with patch("data_module.helper.load_state", return_value={}), \
+            patch("data_module.helper.save_state"):
+        yield
+    link_graph.reset_graph()
+
+
+def build_link_sheet(sheet_id, column_base, rows):
+    columns = [{"id": column_base + i, "title": col}
+               for i, col in enumerate(app_vars.sheet_columns)]
+    sheet_rows = []
+    for row_id, uuid, description in rows:
+        values = {app_vars.uuid_col: uuid,
+                  app_vars.description_col: description}
+        sheet_rows.append({
+            "id": row_id, "modifiedAt": "2022-05-08T19:00:00Z",
+            "cells": [{"columnId": column_base + i, "value": values.get(col)}
+                      for i, col in enumerate(app_vars.sheet_columns)]})
+    return smartsheet.models.Sheet({"id": sheet_id, "name": str(sheet_id),
+                                    "columns": columns, "rows": sheet_rows})
+
+
 @pytest.fixture
 def env_dict():
     value = {}
@@ -112,6 +137,47 @@ def test_full_smartsheet_sync_3(env_dict, sheet_fixture, workspace_fixture):
     #                        "longer than the interval.")
 
 
+def test_full_smartsheet_sync_4():
+    dest_sheet = build_link_sheet(10, 1000, [
+        (100, "10-100-1-1", "20-200-3-4"),
+        (101, "10-101-1-2", "20-201-3-5"),
+        (102, "10-102-1-3", "10-102-1-3")])
+    src_sheet = build_link_sheet(20, 2000, [
+        (200, "20-200-3-4", None),
+        (201, "20-201-3-5", None)])
+
+    result = smartsheet.models.Result()
+    result.message = "SUCCESS"
+    result.result_code = 0
+
+    @patch("data_module.scheduler_controller.record_run")
+    @patch("data_module.smartsheet_api.get_sheet", return_value=src_sheet)
+    @patch("data_module.smartsheet_api.write_rows_to_sheet",
+           return_value=result)
+    @patch("data_module.get_data.refresh_source_sheets",
+           return_value=[dest_sheet])
+    @patch("data_module.get_data.get_all_sheet_ids", return_value=[10])
+    def test_0(mock_0, mock_1, mock_2, mock_3, mock_4):
+        first = sync.full_smartsheet_sync(60)
+        watermark = link_graph.get_watermark()
+        second = sync.full_smartsheet_sync(60)
+        return first, second, watermark, mock_2, mock_3
+
+    with patch.multiple("app.config", create=True, workspace_id=[1],
+                        index_sheet=2):
+        first, second, watermark, write_rows, get_sheet = test_0()
+    assert first is True and second is True
+    assert watermark is not None
+    # Both links go to one destination sheet, so they are written once.
+    # The second run has no rows modified since the watermark.
+    assert write_rows.call_count == 1
+    rows, sheet = write_rows.call_args[0]
+    assert sheet.id == dest_sheet.id
+    assert [row.id for row in rows] == [100, 101]
+    assert get_sheet.call_args[1]["row_ids"] == [200, 201]
+    assert link_graph.load_graph()["invalid"] == {"10-102-1-3": "self"}
+
+
 # def test_full_smartsheet_sync_3(env_dict, sheet_fixture):
 #     sheet, _, _, _ = sheet_fixture
 #     minutes = env_dict['minutes']
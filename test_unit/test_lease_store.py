@@ -0,0 +1,63 @@
+import pytest
+
+
+def test_acquire_0(lease_store_fixture):
+    lease_store = lease_store_fixture
+    with pytest.raises(TypeError):
+        lease_store.acquire(1337, "a", 30)
+    with pytest.raises(TypeError):
+        lease_store.acquire("lease", 1337, 30)
+    with pytest.raises(ValueError):
+        lease_store.acquire("lease", "a", 0)
+
+
+def test_acquire_1(lease_store_fixture):
+    lease_store = lease_store_fixture
+    assert lease_store.acquire("lease", "a", 30, now=100) is True
+    # Another replica can't take a live lease, but the owner can renew it.
+    assert lease_store.acquire("lease", "b", 30, now=110) is False
+    assert lease_store.acquire("lease", "a", 30, now=120) is True
+    assert lease_store.holders("lease", now=140) == {"lease": "a"}
+    # Once it expires, the lease is free.
+    assert lease_store.holders("lease", now=151) == {}
+    assert lease_store.acquire("lease", "b", 30, now=151) is True
+    assert lease_store.release("lease", "a") is False
+    assert lease_store.release("lease", "b") is True
+    assert lease_store.acquire("lease", "a", 30, now=152) is True
+
+
+def test_outbox_0(lease_store_fixture):
+    lease_store = lease_store_fixture
+    first = lease_store.enqueue(1, [{"id": 10}], created=100)
+    second = lease_store.enqueue(1, [{"id": 11}, {"id": 12}], created=200)
+    lease_store.enqueue(2, [{"id": 20}])
+    assert lease_store.pending(1) == [(first, [{"id": 10}], 100),
+                                      (second, [{"id": 11}, {"id": 12}], 200)]
+    assert lease_store.pending(1, limit=1) == [(first, [{"id": 10}], 100)]
+    assert lease_store.ack([first]) == 1
+    assert lease_store.ack([]) == 0
+    assert [write_id for write_id, _, _ in lease_store.pending(1)] == [second]
+
+
+def test_outbox_1(lease_store_fixture):
+    lease_store = lease_store_fixture
+
+    def cells(*pairs):
+        return [{"columnId": column_id, "value": value}
+                for column_id, value in pairs]
+
+    first = lease_store.enqueue(1, [
+        {"id": 10, "cells": cells((1, "a"), (2, "b"))},
+        {"id": 11, "cells": cells((1, "e"))}])
+    # Queueing a cell again replaces the queued one.
+    second = lease_store.enqueue(1, [{"id": 10, "cells": cells((1, "c"))}])
+    assert [(write_id, rows) for write_id, rows, _
+            in lease_store.pending(1)] == [
+        (first, [{"id": 10, "cells": cells((2, "b"))},
+                 {"id": 11, "cells": cells((1, "e"))}]),
+        (second, [{"id": 10, "cells": cells((1, "c"))}])]
+    # A write left without cells is removed.
+    third = lease_store.enqueue(1, [{"id": 10, "cells": cells((2, "d"))},
+                                    {"id": 11, "cells": cells((1, "f"))}])
+    assert [write_id for write_id, _, _ in lease_store.pending(1)] == \
+        [second, third]
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import smartsheet
+import sync_module.link_graph as link_graph
+import app.variables as app_vars
+
+UUID_COL = 1
+DESC_COL = 2
+
+
+def build_sheet(sheet_id, rows):
+    columns = [{"id": UUID_COL, "title": app_vars.uuid_col},
+               {"id": DESC_COL, "title": app_vars.description_col}]
+    sheet_rows = [{"id": row_id, "modifiedAt": modified, "cells": [
+        {"columnId": UUID_COL, "value": uuid},
+        {"columnId": DESC_COL, "value": description}]}
+        for row_id, uuid, description, modified in rows]
+    return smartsheet.models.Sheet({"id": sheet_id, "columns": columns,
+                                    "rows": sheet_rows})
+
+
+def test_find_invalid_0():
+    edges = {"a": "a", "b": "c", "c": "b", "d": "b", "e": "f"}
+    assert link_graph.find_invalid(edges) == {"a": "self", "b": "cycle",
+                                              "c": "cycle"}
+    assert link_graph.find_invalid({}) == {}
+
+
+def test_update_edges_0():
+    link_graph.reset_graph()
+    old = "2022-05-08T19:00:00Z"
+    new = "2022-05-08T21:00:00Z"
+    watermark = datetime(2022, 5, 8, 20, 0, 0, tzinfo=timezone.utc)
+    sheet = build_sheet(1, [
+        (11, "1-11-1-1", "1-12-1-2", new),
+        (12, "1-12-1-2", None, old),
+        (13, "1-13-1-3", "1-13-1-3", new),
+        (14, "1-14-1-4", "1-15-1-5", old),
+        (15, "1-15-1-5", "Not a UUID", new),
+        (16, None, "1-11-1-1", new)])
+
+    @patch("data_module.helper.save_state")
+    @patch("data_module.helper.load_state",
+           return_value={"edges": {"1-14-1-4": "1-15-1-5",
+                                   "1-15-1-5": "1-16-1-6"}})
+    def test_0(mock_0, mock_1):
+        changed = link_graph.update_edges([sheet], watermark)
+        edges = link_graph.dirty_edges(changed)
+        state = dict(link_graph.load_graph())
+        link_graph.remove_edge("1-13-1-3")
+        return changed, edges, state, dict(link_graph.load_graph())
+
+    changed, edges, state, removed = test_0()
+    link_graph.reset_graph()
+    assert changed == {"1-11-1-1", "1-13-1-3", "1-15-1-5"}
+    # The old row's link is still checked because its source changed, but
+    # the self link is never checked.
+    assert edges == {"1-11-1-1": "1-12-1-2", "1-14-1-4": "1-15-1-5"}
+    assert state["invalid"] == {"1-13-1-3": "self"}
+    assert removed["edges"] == {"1-11-1-1": "1-12-1-2",
+                                "1-14-1-4": "1-15-1-5"}
+    assert removed["invalid"] == {}
@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+import smartsheet
+import data_module.link_status as link_status
+
+
+def build_row(modified, link_status_value=None):
+    cell = {"columnId": 3, "value": "Done"}
+    if link_status_value:
+        cell["linkInFromCell"] = {"sheetId": 7, "rowId": 8, "columnId": 9,
+                                  "status": link_status_value}
+    return smartsheet.models.Row({"id": 2, "modifiedAt": modified,
+                                  "cells": [cell]})
+
+
+def test_cell_status_0():
+    row = build_row("2022-05-08T19:00:22Z", "OK")
+    broken_row = build_row("2022-05-09T19:00:22Z", "BROKEN")
+
+    @patch("data_module.helper.has_cell_link",
+           wraps=link_status.helper.has_cell_link)
+    @patch("data_module.helper.load_state", return_value={})
+    def test_0(mock_0, mock_1):
+        first = link_status.cell_status(1, row, row.cells[0])
+        cached = link_status.cell_status(1, row, row.cells[0])
+        # The row changed after the status was recorded, so it is checked
+        # again.
+        changed = link_status.cell_status(1, broken_row,
+                                          broken_row.cells[0])
+        return first, cached, changed, mock_1.call_count
+
+    first, cached, changed, checks = test_0()
+    assert (first, cached, changed) == ("OK", "OK", "BROKEN")
+    assert checks == 2
+    assert (link_status.hits, link_status.misses) == (1, 2)
+    assert link_status.broken_links() == [(1, 2, 3, [7, 8, 9])]
+    assert link_status.broken_links(4) == []
+
+
+def test_save_index_0():
+    row = build_row("2022-05-08T19:00:22Z")
+
+    @patch("data_module.helper.save_state")
+    @patch("data_module.helper.load_state", return_value={})
+    def test_0(mock_0, mock_1):
+        status = link_status.cell_status(1, row, row.cells[0])
+        return status, link_status.save_index(), mock_1
+
+    status, count, save_state = test_0()
+    assert status == "Unlinked"
+    assert count == 1
+    cells = save_state.call_args[0][1]["cells"]
+    assert cells["1:2:3"] == {"status": "Unlinked", "source": None,
+                              "modified": "2022-05-08T19:00:22+00:00"}
@@ -0,0 +1,114 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+import smartsheet
+from apscheduler.schedulers.background import BackgroundScheduler
+import app.planner as planner
+import data_module.scheduler_controller as scheduler_controller
+import data_module.sheet_scheduler as sheet_scheduler
+import data_module.smartsheet_api as smartsheet_api
+import data_module.work_queue as work_queue
+import sync_module.sync_snapshot as sync_snapshot
+
+
+def test_estimate_seconds_0():
+    calls = {"read": 20, "history": 5, "write": 5}
+    assert planner.estimate_seconds(calls, rate_limit=300) == 6.0
+
+
+def test_plan_0():
+    with pytest.raises(TypeError):
+        planner.plan("bidirectional_sync")
+    with pytest.raises(ValueError):
+        planner.plan(["write_uuids"])
+    with pytest.raises(TypeError):
+        planner.plan(["bidirectional_sync"], "minutes")
+
+
+def test_plan_1():
+    rows = [smartsheet.models.Row({"id": row_id,
+                                   "cells": [{"columnId": 1}]})
+            for row_id in range(130)]
+
+    def job(minutes):
+        smartsheet_api.throttle("read", rate_limit=60000)
+        smartsheet_api.throttle("history", rate_limit=60000)
+        return smartsheet_api.write_rows_to_sheet(rows, 1337, "update")
+
+    @patch("app.config.smartsheet_client", create=True)
+    @patch.dict("app.planner.plan_jobs", {"bidirectional_sync": job})
+    def test_0(mock_0):
+        return planner.plan(["bidirectional_sync"], 65), mock_0
+
+    report, client = test_0()
+    # Nothing was sent to Smartsheet.
+    assert client.Sheets.update_rows.call_count == 0
+    assert not smartsheet_api.dry_run_active()
+    job_report = report["jobs"]["bidirectional_sync"]
+    assert job_report["calls"] == {"read": 1, "history": 1, "write": 2}
+    assert job_report["sheets"]["1337"]["rows_updated"] == 130
+    assert job_report["cells"] == 130
+    assert report["calls"]["write"] == 2
+
+
+def test_plan_2():
+    now = datetime.now(timezone.utc)
+    sheet_scheduler.observe({20: now - timedelta(days=7)})
+    sheet_scheduler.observe({20: now - timedelta(minutes=30)})
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(print, "interval", minutes=2, id="planned_interval")
+
+    def job(minutes):
+        due = sheet_scheduler.due_sheets("planned_interval", [20], minutes)
+        scheduler_controller.record_run("planned_interval", 600)
+        return due
+
+    @patch.dict("app.planner.plan_jobs", {"bidirectional_sync": job})
+    def test_0():
+        planner.plan(["bidirectional_sync"], 65)
+
+    with patch.multiple("app.config", create=True, scheduler=scheduler):
+        test_0()
+    # Planning leaves the live jobs and the sheet polls alone.
+    trigger = scheduler.get_job("planned_interval").trigger
+    assert trigger.interval.total_seconds() == 120
+    assert scheduler_controller.get_runtime("planned_interval") is None
+    assert sheet_scheduler.due_sheets("planned_interval", [20], 65) == [20]
+    assert sheet_scheduler.safe_watermark("planned_interval", now) == now
+
+
+def test_plan_3():
+    rows = [smartsheet.models.Row({"id": 1, "cells": [{"columnId": 1}]})]
+
+    def write(sheet_id):
+        return smartsheet_api.write_rows_to_sheet(rows, sheet_id, "update")
+
+    def job(minutes):
+        # A job on another thread keeps writing while the plan runs.
+        thread = threading.Thread(target=write, args=(1337,))
+        thread.start()
+        thread.join(5)
+        # Workers started by the planned job are part of the dry run.
+        work_queue.run_pipeline("plan", [1338], [
+            {"name": "write", "function": write, "workers": 2}])
+        sync_snapshot.set_value("JAR-1", "Jira Ticket", ["Done", None])
+        return sync_snapshot.get_value("JAR-1", "Jira Ticket")
+
+    @patch("data_module.helper.save_state")
+    @patch("data_module.helper.load_state", return_value={})
+    @patch("app.config.smartsheet_client", create=True)
+    @patch.dict("app.planner.plan_jobs", {"bidirectional_sync": job})
+    def test_0(mock_0, mock_1, mock_2):
+        report = planner.plan(["bidirectional_sync"], 65)
+        return report, sync_snapshot.get_value("JAR-1", "Jira Ticket"), \
+            mock_0, mock_2
+
+    report, snapshot_value, client, save_state = test_0()
+    assert [call[0][0] for call in client.Sheets.update_rows.call_args_list] \
+        == [1337]
+    assert list(report["jobs"]["bidirectional_sync"]["sheets"]) == ["1338"]
+    # The snapshot value the plan staged stays in the plan.
+    assert snapshot_value is None
+    assert save_state.call_count == 0
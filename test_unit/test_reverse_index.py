@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import smartsheet
+import sync_module.reverse_index as reverse_index
+
+
+def test_locations_0():
+    reverse_index.reset_index()
+    plan_sheet = smartsheet.models.Sheet({"id": 2})
+    plan_row = smartsheet.models.Row({"id": 21})
+
+    @patch("data_module.helper.save_state")
+    @patch("data_module.helper.load_state", return_value={})
+    def test_0(mock_0, mock_1):
+        reverse_index.add_locations(
+            {"JAR-1": [(plan_sheet, {}, plan_row)]})
+        reverse_index.add_locations(
+            {"JAR-1": [(plan_sheet, {}, plan_row)]})
+        found = reverse_index.get_locations("JAR-1")
+        reverse_index.remove_location("JAR-1", 2, 21)
+        removed = reverse_index.get_locations("JAR-1")
+        count = reverse_index.save_index()
+        return found, removed, count
+    found, removed, count = test_0()
+    reverse_index.reset_index()
+    assert found == [(2, 21)]
+    assert removed == []
+    assert count == 0
+
+
+def test_watermark_0():
+    reverse_index.reset_index()
+    watermark = datetime(2022, 5, 8, 19, 0, 22, tzinfo=timezone.utc)
+
+    @patch("data_module.helper.load_state", return_value={})
+    def test_0(mock_0):
+        empty = reverse_index.get_watermark()
+        reverse_index.set_watermark(watermark)
+        return empty, reverse_index.get_watermark()
+    empty, loaded = test_0()
+    reverse_index.reset_index()
+    assert empty is None
+    assert loaded == watermark
+
+
+def test_minutes_since_0():
+    watermark = datetime(2022, 5, 8, 19, 0, 0, tzinfo=timezone.utc)
+    now = datetime(2022, 5, 8, 19, 2, 30, tzinfo=timezone.utc)
+    assert reverse_index.minutes_since(watermark, now) == 4
+    assert reverse_index.minutes_since(watermark, watermark) == 1
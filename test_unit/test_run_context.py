@@ -0,0 +1,188 @@
+import threading
+from unittest.mock import patch
+
+import smartsheet
+import data_module.create_jira_tickets as jira
+import data_module.run_context as run_context
+import data_module.smartsheet_api as smartsheet_api
+
+
+SUCCESS = smartsheet.models.Result({"message": "SUCCESS", "resultCode": 0})
+
+
+def build_sheet():
+    return smartsheet.models.Sheet(
+        {"id": 1, "columns": [{"id": 101, "title": "UUID"},
+                              {"id": 102, "title": "Jira Ticket"}],
+         "rows": [{"id": 11, "cells": [
+             {"columnId": 101},
+             {"columnId": 102, "value": "Pending...",
+              "hyperlink": {"url": "https://jira"}}]}]})
+
+
+def test_add_sheet_0():
+    sheet = build_sheet()
+    run_context.add_sheet(sheet, "index")
+    assert run_context.get_sheet("index") is None
+    run_context.start_run()
+    try:
+        run_context.add_sheet(sheet, "index")
+        assert run_context.run_active()
+        assert run_context.get_sheet("index") is sheet
+        assert run_context.get_sheet(1) is sheet
+        assert run_context.get_sheet(2) is None
+    finally:
+        assert run_context.end_run() == 1
+    assert not run_context.run_active()
+
+
+def test_start_run_0():
+    first = build_sheet()
+    second = build_sheet()
+    started = threading.Event()
+    ended = threading.Event()
+    seen = {}
+
+    def other_run():
+        context = run_context.start_run()
+        run_context.add_sheet(second, "index")
+        started.set()
+        ended.wait(5)
+        seen["other"] = run_context.get_sheet("index")
+        seen["count"] = run_context.end_run()
+        seen["context"] = context
+
+    context = run_context.start_run()
+    run_context.add_sheet(first, "index")
+    thread = threading.Thread(target=other_run)
+    thread.start()
+    started.wait(5)
+    # An overlapping run keeps its own sheets, and ending this run leaves
+    # the other one listening for its writes.
+    assert run_context.get_sheet("index") is first
+    assert run_context.end_run() == 1
+    assert run_context.apply_result in smartsheet_api._write_listeners
+    ended.set()
+    thread.join(5)
+    assert seen["other"] is second
+    assert seen["count"] == 1
+    assert seen["context"] is not context
+    assert run_context.apply_result not in smartsheet_api._write_listeners
+
+
+def test_apply_rows_0():
+    sheet = build_sheet()
+    row = smartsheet.models.Row()
+    row.id = 11
+    row.cells.append({"column_id": 101, "object_value": "1-11-101-1"})
+    error_cell = smartsheet.models.Cell({"columnId": 102,
+                                         "value": "reasonPhrase"})
+    error_cell.hyperlink = smartsheet.models.ExplicitNull()
+    row.cells.append(error_cell)
+    missing = smartsheet.models.Row()
+    missing.id = 12
+    missing.cells.append({"column_id": 101, "value": "Ignored"})
+
+    assert run_context.apply_rows(1, [row]) == 0
+    shared_row = sheet.rows[0]
+    run_context.start_run()
+    try:
+        run_context.add_sheet(sheet)
+        assert run_context.apply_rows(1, [row, missing]) == 2
+    finally:
+        run_context.end_run()
+    cells = sheet.rows[0].cells
+    assert cells[0].value == "1-11-101-1"
+    assert cells[1].value == "reasonPhrase"
+    assert not cells[1].hyperlink
+    # The row may be shared with other jobs, so it was replaced, not
+    # changed.
+    assert sheet.rows[0] is not shared_row
+    assert shared_row.cells[1].value == "Pending..."
+    assert shared_row.cells[1].hyperlink.url == "https://jira"
+
+
+def test_get_push_tickets_sheet_0():
+    sheet = build_sheet()
+
+    @patch("data_module.smartsheet_api.get_sheet", return_value=sheet)
+    def test_0(mock_0):
+        run_context.start_run()
+        try:
+            jira.get_push_tickets_sheet()
+            push_sheet, col_map = jira.get_push_tickets_sheet()
+        finally:
+            run_context.end_run()
+        return push_sheet, col_map, mock_0
+
+    with patch.multiple("app.config", create=True, push_tickets_sheet=1,
+                        minutes=0):
+        push_sheet, col_map, get_sheet = test_0()
+    assert push_sheet is sheet
+    assert col_map == {"UUID": 101, "Jira Ticket": 102}
+    assert get_sheet.call_count == 1
+
+
+def test_apply_result_0():
+    sheet = build_sheet()
+    sheet.version = 3
+    result = smartsheet.models.Result(
+        {"message": "SUCCESS", "resultCode": 0, "version": 5, "result": [
+            {"id": 11, "modifiedAt": "2026-01-01T00:00:00Z", "version": 5,
+             "cells": [{"columnId": 102, "value": "JAR-1"}]},
+            {"id": 12, "cells": [{"columnId": 102, "value": "JAR-2"}]}]},
+        "Row")
+    run_context.start_run()
+    try:
+        run_context.add_sheet(sheet)
+        update = run_context.apply_result(1, [], "update", result)
+        add = run_context.apply_result(1, [], "add", result)
+    finally:
+        run_context.end_run()
+    assert update == 1
+    assert add == 2
+    assert sheet.version == 5
+    assert sheet.rows[0].cells[1].value == "JAR-1"
+    assert sheet.rows[0].modified_at.year == 2026
+    assert [row.id for row in sheet.rows] == [11, 12]
+
+
+def test_write_through_0():
+    sheet = build_sheet()
+    row = smartsheet.models.Row()
+    row.id = 11
+    row.cells.append({"column_id": 102, "value": "JAR-1"})
+    run_context.start_run()
+    try:
+        run_context.add_sheet(sheet)
+        smartsheet_api.notify_write(1, [row], "update", SUCCESS)
+        # Writes made by another job's thread belong to that job.
+        other = smartsheet.models.Row()
+        other.id = 11
+        other.cells.append({"column_id": 102, "value": "JAR-9"})
+        thread = threading.Thread(target=smartsheet_api.notify_write,
+                                  args=(1, [other], "update", SUCCESS))
+        thread.start()
+        thread.join(5)
+        assert sheet.rows[0].cells[1].value == "JAR-1"
+
+        # Writes recorded by a dry run are applied, so later stages of the
+        # plan see them. Recorded adds have no Row ID but are still seen.
+        row.cells[0].value = "JAR-2"
+        added = smartsheet.models.Row()
+        added.cells.append({"column_id": 102, "value": "JAR-3"})
+        smartsheet_api.start_dry_run()
+        try:
+            smartsheet_api.write_rows_to_sheet([row], sheet, "update")
+            smartsheet_api.write_rows_to_sheet([added], sheet, "add")
+        finally:
+            smartsheet_api.stop_dry_run()
+        assert sheet.rows[0].cells[1].value == "JAR-2"
+        assert [row.id for row in sheet.rows] == [11, None]
+    finally:
+        run_context.end_run()
+
+    # Writes after the run ends no longer touch the sheet.
+    row.cells[0].value = "JAR-4"
+    smartsheet_api.notify_write(1, [row], "update", SUCCESS)
+    assert sheet.rows[0].cells[1].value == "JAR-2"
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
+
+import data_module.metrics as metrics
+import data_module.scheduler_controller as controller
+
+
+@pytest.fixture
+def scheduler_fixture():
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(print, 'interval', minutes=2,
+                      id="create_jira_interval")
+    scheduler.add_job(print, 'cron', day='*/1', hour='1',
+                      id="create_jira_cron")
+    with patch.multiple("app.config", create=True, scheduler=scheduler):
+        yield scheduler
+
+
+def interval(scheduler, job_name):
+    return scheduler.get_job(job_name).trigger.interval.total_seconds()
+
+
+def test_record_run_0():
+    with pytest.raises(TypeError):
+        controller.record_run(1337, 10)
+    with pytest.raises(TypeError):
+        controller.record_run("create_jira_interval", "10")
+    with pytest.raises(ValueError):
+        controller.record_run("create_jira_interval", -1337)
+
+
+def test_record_run_1(scheduler_fixture):
+    # A 60 second runtime at 50% utilization fits the 2 minute interval.
+    result = controller.record_run("create_jira_interval", 60)
+    assert "No changes to interval" in result
+    assert interval(scheduler_fixture, "create_jira_interval") == 120
+    metric = metrics.get("scheduler.create_jira_interval.interval")
+    assert metric["value"] == 120
+    assert metric["details"]["action"] == "kept"
+
+
+def test_record_run_2(scheduler_fixture):
+    # A slow run raises the interval, including past a whole minute.
+    result = controller.record_run("create_jira_interval", 95.5)
+    assert "increased interval from 120 to 191 seconds" in result
+    assert interval(scheduler_fixture, "create_jira_interval") == 191
+    # The average moves toward a fast run instead of jumping to it.
+    controller.record_run("create_jira_interval", 5)
+    assert controller.get_runtime("create_jira_interval") == \
+        pytest.approx(0.3 * 5 + 0.7 * 95.5)
+    assert interval(scheduler_fixture, "create_jira_interval") == 137
+
+
+def test_record_run_3(scheduler_fixture):
+    # Fast runs are clamped to the job's minimum interval.
+    result = controller.record_run("create_jira_interval", 1)
+    assert "reduced interval from 120 to 60 seconds (minimum)" in result
+    assert interval(scheduler_fixture, "create_jira_interval") == 60
+    metric = metrics.get("scheduler.create_jira_interval.interval")
+    assert metric["details"]["reason"] == "minimum"
+    assert metric["details"]["previous"] == 120
+
+
+def test_record_run_4(scheduler_fixture):
+    result = controller.record_run("create_jira_cron", 600)
+    assert "is not an interval job" in result
+    result = controller.record_run("missing_job", 600)
+    assert result == str("Job missing_job not found in the job store. "
+                         "No changes made.")
+
+
+def test_target_interval_0():
+    assert controller.target_interval(10, (15, 300), 0.5) == \
+        (20, "utilization")
+    assert controller.target_interval(1000, (15, 300), 0.5) == \
+        (300, "maximum")
+    assert controller.get_bounds("unknown_job") == (15, 900)
@@ -0,0 +1,197 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import smartsheet
+
+import data_module.sharding as sharding
+
+SUCCESS = smartsheet.models.Result({"message": "SUCCESS", "resultCode": 0})
+
+
+def build_live_sheet(modified):
+    return smartsheet.models.Sheet({"id": 2, "rows": [
+        {"id": row_id, "modifiedAt": modified_at}
+        for row_id, modified_at in modified.items()]})
+
+
+def test_ring_owner_0():
+    assert sharding.ring_owner([], 10) is None
+    ring = sharding.build_ring(["a", "b", "c"])
+    sheet_ids = list(range(1, 3001))
+    owners = {sheet_id: sharding.ring_owner(ring, sheet_id)
+              for sheet_id in sheet_ids}
+    counts = {replica: list(owners.values()).count(replica)
+              for replica in "abc"}
+    assert all(count > 600 for count in counts.values())
+    # Dropping a replica only moves the sheets it owned.
+    smaller = sharding.build_ring(["a", "c"])
+    moved = [sheet_id for sheet_id in sheet_ids
+             if sharding.ring_owner(smaller, sheet_id) != owners[sheet_id]]
+    assert all(owners[sheet_id] == "b" for sheet_id in moved)
+    assert len(moved) == counts["b"]
+
+
+def test_owned_sheets_0():
+    # Without a replica ID, the replica owns every sheet and writes the
+    # Index Sheet.
+    assert sharding.heartbeat() == \
+        "Sharding is off. This replica owns every sheet."
+    assert sharding.owned_sheets([10, 20]) == [10, 20]
+    assert sharding.is_leader() is True
+
+
+def test_owned_sheets_1(lease_store_fixture, monkeypatch):
+    lease_store = lease_store_fixture
+    monkeypatch.setenv("SHARD_REPLICA_ID", "a")
+    # Until the heartbeat job builds the ring, no sheets are processed and
+    # reading doesn't take a lease.
+    with patch("data_module.sharding.flush_outbox") as flush:
+        assert sharding.owned_sheets([10, 20]) == []
+    assert flush.call_count == 0
+    assert lease_store.holders(sharding.replica_prefix) == {}
+
+
+def test_heartbeat_0(lease_store_fixture, monkeypatch):
+    lease_store = lease_store_fixture
+    lease_store.acquire("replica:b", "b", 30, now=100)
+    lease_store.acquire(sharding.index_lease, "b", 30, now=100)
+    monkeypatch.setenv("SHARD_REPLICA_ID", "a")
+    sharding.heartbeat(now=110)
+    assert sharding.is_leader() is False
+    # The first ring of a process keeps the watermarks.
+    earlier = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert sharding.check_watermark(earlier) == earlier
+    ring = sharding.build_ring(["a", "b"])
+    sheet_ids = list(range(1, 101))
+    owned = sharding.owned_sheets(sheet_ids)
+    assert owned == [sheet_id for sheet_id in sheet_ids
+                     if sharding.ring_owner(ring, sheet_id) == "a"]
+    assert 0 < len(owned) < 100
+
+    # Replica b stops renewing its leases. Replica a takes its sheets and
+    # the Index Sheet.
+    watermark = datetime.now(timezone.utc) - timedelta(minutes=1)
+    with patch("data_module.sharding.flush_outbox") as flush:
+        sharding.heartbeat(now=131)
+    assert sharding.owned_sheets(sheet_ids) == sheet_ids
+    assert sharding.is_leader() is True
+    assert flush.call_count == 1
+    # Watermarks from before the rebalance can't be trusted.
+    assert sharding.check_watermark(watermark) is None
+    later = datetime.now(timezone.utc) + timedelta(minutes=1)
+    assert sharding.check_watermark(later) == later
+
+
+def test_write_index_rows_0(lease_store_fixture, monkeypatch):
+    lease_store = lease_store_fixture
+    index_sheet = smartsheet.models.Sheet({"id": 2})
+    row = smartsheet.models.Row({"id": 5, "cells": [
+        {"columnId": 7, "value": "Done"}]})
+    cleared = smartsheet.models.Cell({"columnId": 8})
+    cleared.value = smartsheet.models.ExplicitNull()
+    row.cells.append(cleared)
+    live_sheet = build_live_sheet({5: "2020-01-01T00:00:00Z"})
+    monkeypatch.setenv("SHARD_REPLICA_ID", "a")
+    lease_store.acquire(sharding.index_lease, "b", 30)
+
+    @patch("data_module.smartsheet_api.get_sheet", return_value=live_sheet)
+    @patch("data_module.smartsheet_api.write_rows_to_sheet",
+           return_value=SUCCESS)
+    def test_0(mock_0, mock_1):
+        sharding.heartbeat()
+        queued = sharding.write_index_rows([row], index_sheet)
+        writes_while_queued = mock_0.call_count
+        # Once the Index Sheet lease is free, this replica writes the rows
+        # the other replicas queued.
+        lease_store.release(sharding.index_lease, "b")
+        sharding.heartbeat()
+        return queued, writes_while_queued, mock_0
+
+    with patch.multiple("app.config", create=True, index_sheet=2):
+        queued, writes_while_queued, write_rows = test_0()
+    assert queued == "queued"
+    assert writes_while_queued == 0
+    assert write_rows.call_count == 1
+    rows, sheet, method = write_rows.call_args[0]
+    assert (rows[0].id, sheet, method) == (5, 2, "update")
+    assert rows[0].cells[0].value == "Done"
+    # The cleared cell is still cleared when the owner writes it.
+    assert isinstance(rows[0].cells[1].value, smartsheet.models.ExplicitNull)
+    assert rows[0].to_dict() == row.to_dict()
+    assert lease_store.pending(2) == []
+
+
+def test_write_index_rows_1(lease_store_fixture, monkeypatch):
+    import data_module.smartsheet_api as smartsheet_api
+    lease_store = lease_store_fixture
+    index_sheet = smartsheet.models.Sheet({"id": 2, "name": "Index"})
+    row = smartsheet.models.Row({"id": 5, "cells": [
+        {"columnId": 7, "value": "Done"}]})
+    monkeypatch.setenv("SHARD_REPLICA_ID", "a")
+    lease_store.acquire(sharding.index_lease, "b", 30)
+    sharding.heartbeat()
+    # A dry run records the write instead of queueing it.
+    smartsheet_api.start_dry_run()
+    try:
+        written = sharding.write_index_rows([row], index_sheet)
+    finally:
+        recorded = smartsheet_api.stop_dry_run()
+    assert written == "written"
+    assert recorded["sheets"]["2"]["rows_updated"] == 1
+    assert lease_store.pending(2) == []
+
+
+def test_flush_outbox_0(lease_store_fixture):
+    lease_store = lease_store_fixture
+    failed = smartsheet.models.Result({"message": "ERROR", "resultCode": 1})
+    # Row 5 was edited after its cell was queued. Row 6 wasn't.
+    live_sheet = build_live_sheet({5: "2024-01-01T00:00:00Z",
+                                   6: "2020-01-01T00:00:00Z"})
+    lease_store.enqueue(2, [{"id": 5, "cells": [
+        {"columnId": 7, "value": "Stale"}]}], created=1000)
+    lease_store.enqueue(2, [{"id": 6, "cells": [
+        {"columnId": 7, "value": "Done"}]}])
+    lease_store.enqueue(2, [{"id": 6, "cells": [
+        {"columnId": 8, "value": "JAR-6"}]}])
+
+    @patch("data_module.smartsheet_api.get_sheet", return_value=live_sheet)
+    @patch("data_module.smartsheet_api.write_rows_to_sheet",
+           side_effect=[failed, SUCCESS])
+    def test_0(mock_0, mock_1):
+        counts = [sharding.flush_outbox() for _ in range(2)]
+        return counts, mock_0
+
+    with patch.multiple("app.config", create=True, index_sheet=2):
+        counts, write_rows = test_0()
+    # The failed write is retried on the next flush.
+    assert counts == [0, 3]
+    assert write_rows.call_count == 2
+    # The queued writes go out as one row per Index row, without the cell
+    # whose row changed since.
+    rows = write_rows.call_args[0][0]
+    assert [(row.id, [cell.value for cell in row.cells]) for row in rows] \
+        == [(6, ["Done", "JAR-6"])]
+    assert lease_store.pending(2) == []
+
+
+def test_flush_outbox_1(lease_store_fixture):
+    lease_store = lease_store_fixture
+    failed = smartsheet.models.Result({"message": "ERROR", "resultCode": 1})
+    live_sheet = build_live_sheet({5: "2020-01-01T00:00:00Z"})
+    first = lease_store.enqueue(2, [{"id": 5, "cells": [
+        {"columnId": 7, "value": "Done"}]}])
+
+    @patch("data_module.smartsheet_api.get_sheet", return_value=live_sheet)
+    @patch("data_module.smartsheet_api.write_rows_to_sheet",
+           return_value=failed)
+    def test_0(mock_0, mock_1):
+        return [sharding.flush_outbox() for _ in range(3)]
+
+    with patch.multiple("app.config", create=True, index_sheet=2), \
+            patch("app.variables.outbox_max_attempts", 2):
+        counts = test_0()
+    # The write is given up on once it has failed too often.
+    assert counts == [0, 0, 0]
+    assert lease_store.pending(2) == []
+    assert [(write_id, attempts) for write_id, _, attempts
+            in lease_store.dead_letters(2)] == [(first, 2)]
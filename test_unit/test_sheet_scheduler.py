@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+import data_module.data_plane as data_plane
+import data_module.sheet_scheduler as sheet_scheduler
+
+NOW = datetime(2021, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def minutes_ago(minutes):
+    return NOW - timedelta(minutes=minutes)
+
+
+def test_due_sheets_0():
+    with pytest.raises(TypeError):
+        sheet_scheduler.due_sheets(1337, [10], 65)
+    with pytest.raises(TypeError):
+        sheet_scheduler.due_sheets("job", 10, 65)
+    with pytest.raises(TypeError):
+        sheet_scheduler.due_sheets("job", [10], "65")
+    with pytest.raises(TypeError):
+        sheet_scheduler.observe([10])
+
+
+def test_due_sheets_1():
+    # Sheet 10 is edited every few minutes, sheet 20 once a week.
+    sheet_scheduler.observe({10: minutes_ago(20), 20: minutes_ago(10080)})
+    sheet_scheduler.observe({10: minutes_ago(15), 20: minutes_ago(30)})
+    sheet_scheduler.observe({10: minutes_ago(10)})
+    assert sheet_scheduler.get_tier(10, NOW) == "hot"
+    assert sheet_scheduler.get_tier(20, NOW) == "cold"
+
+    first = sheet_scheduler.due_sheets("job", [10, 20], 65, NOW)
+    second = sheet_scheduler.due_sheets("job", [10, 20], 65,
+                                        NOW + timedelta(minutes=1))
+    other_job = sheet_scheduler.due_sheets("other", [10, 20], 65,
+                                           NOW + timedelta(minutes=1))
+    later = sheet_scheduler.due_sheets("job", [10, 20], 65,
+                                       NOW + timedelta(minutes=10))
+    assert first == [10, 20]
+    # The cold sheet waits for its tier, and each job keeps its own polls.
+    assert second == [10]
+    assert other_job == [10, 20]
+    assert later == [10, 20]
+
+
+def test_due_sheets_2():
+    sheet_scheduler.observe({10: minutes_ago(30)})
+    sheet_scheduler.observe({10: minutes_ago(25)})
+    assert sheet_scheduler.get_tier(10, NOW) == "hot"
+    # A sheet that stops being edited is demoted, then promoted again once
+    # it is edited.
+    idle = NOW + timedelta(hours=2)
+    assert sheet_scheduler.get_tier(10, idle) == "cold"
+    sheet_scheduler.observe({10: idle - timedelta(minutes=1)})
+    assert sheet_scheduler.get_tier(10, idle) == "hot"
+    # A sheet edited days apart stays cold right after an edit.
+    sheet_scheduler.observe({20: minutes_ago(10080)})
+    sheet_scheduler.observe({20: minutes_ago(1)})
+    assert sheet_scheduler.get_tier(20, NOW) == "cold"
+
+
+def test_due_sheets_3():
+    sheet_scheduler.observe({20: minutes_ago(10080)})
+    sheet_scheduler.observe({20: minutes_ago(30)})
+    sheet_scheduler.due_sheets("job", [20], 65, NOW)
+    later = NOW + timedelta(minutes=1)
+    assert sheet_scheduler.due_sheets("job", [20], 65, later) == []
+    # A put off sheet holds the watermark back to its last poll.
+    assert sheet_scheduler.safe_watermark("job", later) == NOW
+    assert sheet_scheduler.safe_watermark("other", later) == later
+    # The daily sweep polls every sheet, cold or not.
+    assert sheet_scheduler.due_sheets("job", [20], 10080, later) == [20]
+    assert sheet_scheduler.safe_watermark("job", later) == later
+
+
+def test_get_source_sheets_1():
+    def sheet_ids(minutes, workspace_id, index_sheet, modified=None):
+        modified.update({10: minutes_ago(10080)})
+        return [10]
+
+    @patch("data_module.get_data.refresh_source_sheets", return_value=[])
+    @patch("data_module.get_data.get_all_sheet_ids", side_effect=sheet_ids)
+    def test_0(mock_0, mock_1):
+        data_plane.get_source_sheets(65, job_name="job")
+        data_plane.clear()
+        data_plane.get_source_sheets(65, job_name="job")
+        return mock_1
+
+    with patch.multiple("app.config", create=True, workspace_id=[1],
+                        index_sheet=2):
+        refreshed = test_0()
+    # The cold sheet is only downloaded the first time.
+    assert [call[0][0] for call in refreshed.call_args_list] == [[10]]
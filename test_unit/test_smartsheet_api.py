@@ -222,6 +222,10 @@ def test_get_sheet_0(sheet_fixture):
         smartsheet_api.get_sheet(sheet.id, "app_vars.dev_minutes")
     with pytest.raises(ValueError):
         smartsheet_api.get_sheet(sheet.id, -1337)
+    with pytest.raises(TypeError):
+        smartsheet_api.get_sheet(sheet.id, 0, row_ids="row_ids")
+    with pytest.raises(TypeError):
+        smartsheet_api.get_sheet(sheet.id, 0, column_ids=["column_id"])
 
 
 def test_get_sheet_1(sheet_fixture):
@@ -282,3 +286,56 @@ def test_get_row_1(sheet_fixture, row_fixture):
         return response
     response = test_0()
     assert response == row
+
+
+def test_throttle_0():
+    smartsheet_api._rate_tokens = 2.0
+
+    @patch("time.sleep")
+    def test_0(mock_0):
+        waited = smartsheet_api.throttle(rate_limit=2)
+        return waited, mock_0
+    waited, sleep = test_0()
+    assert waited == 0
+    assert sleep.call_count == 0
+
+
+def test_throttle_1():
+    smartsheet_api._rate_tokens = 0.0
+
+    def refill(seconds):
+        smartsheet_api._rate_tokens = 1.0
+
+    @patch("time.sleep", side_effect=refill)
+    def test_0(mock_0):
+        waited = smartsheet_api.throttle(rate_limit=60)
+        return waited, mock_0
+    waited, sleep = test_0()
+    smartsheet_api._rate_tokens = float(app_vars.api_rate_limit)
+    assert sleep.call_count == 1
+    assert 0 < waited <= 1
+
+
+def test_notify_write_0():
+    calls = []
+
+    def listener(sheet_id, rows, write_method, result):
+        calls.append((sheet_id, write_method))
+
+    def broken(sheet_id, rows, write_method, result):
+        raise KeyError("broken")
+
+    success = smartsheet.models.Result({"message": "SUCCESS",
+                                        "resultCode": 0})
+    failure = smartsheet.models.Result({"message": "ERROR",
+                                        "resultCode": 1})
+    smartsheet_api.add_write_listener(broken)
+    smartsheet_api.add_write_listener(listener)
+    try:
+        assert smartsheet_api.notify_write(1, [], "update", success) == 2
+        assert smartsheet_api.notify_write(1, [], "update", failure) == 0
+    finally:
+        smartsheet_api.remove_write_listener(broken)
+        smartsheet_api.remove_write_listener(listener)
+    assert smartsheet_api.notify_write(1, [], "add", success) == 0
+    assert calls == [(1, "update")]
@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+import smartsheet
+import sync_module.sync_snapshot as sync_snapshot
+
+
+def test_cell_key_0():
+    cell = smartsheet.models.Cell({"columnId": 1, "value": "Task",
+                                   "hyperlink": {"url": "https://jira"}})
+    assert sync_snapshot.cell_key(cell) == ("Task",
+                                            ("https://jira", None, None,
+                                             None))
+    assert sync_snapshot.cell_key(None) == (None, None)
+
+
+def test_changed_keys_0():
+    old = ("Old", None)
+    new = ("New", None)
+    other = ("Other", None)
+    assert sync_snapshot.changed_keys([old, old, old], old) == []
+    assert sync_snapshot.changed_keys([old, new], old) == [new]
+    assert sync_snapshot.changed_keys([new, old, new], old) == [new]
+    assert sync_snapshot.changed_keys([new, other, old], old) == [new, other]
+    assert sync_snapshot.changed_keys([new, other], None) == [new, other]
+
+
+def test_save_snapshot_0():
+    sync_snapshot.reset_snapshot()
+
+    @patch("data_module.helper.save_state")
+    @patch("data_module.helper.load_state", return_value={})
+    def test_0(mock_0, mock_1):
+        sync_snapshot.set_value("JAR-1", "Tasks", ("Task", None))
+        sync_snapshot.set_value(None, "Tasks", ("Ignored", None))
+        count = sync_snapshot.save_snapshot()
+        return count, mock_1
+
+    count, save_state = test_0()
+    sync_snapshot.reset_snapshot()
+    assert count == 1
+    assert save_state.call_args[0][1] == {"JAR-1": {"Tasks": ("Task", None)}}
+
+
+def test_get_value_0():
+    # Keys loaded from disk are lists and must compare equal to cell keys.
+    sync_snapshot._snapshot = {
+        "JAR-1": {"Tasks": ["Task", ["https://jira", None, None, None]]}}
+    try:
+        assert sync_snapshot.get_value("JAR-1", "Tasks") == \
+            ("Task", ("https://jira", None, None, None))
+        assert sync_snapshot.get_value("JAR-1", "Status") is None
+    finally:
+        sync_snapshot.reset_snapshot()
@@ -0,0 +1,161 @@
+from unittest.mock import MagicMock, patch
+
+import smartsheet
+import app.variables as app_vars
+import data_module.create_jira_tickets as jira
+import data_module.smartsheet_api as smartsheet_api
+import data_module.ticket_dag as ticket_dag
+
+COLUMNS = [app_vars.jira_col, "Team", app_vars.uuid_col, "Issue Type",
+           "Parent Issue Type", "Parent Ticket", "ParentUUID"]
+COL_MAP = {col: i + 1 for i, col in enumerate(COLUMNS)}
+
+
+def build_plan(rows):
+    sheet_rows = []
+    for row_id, jira_value, parent_ticket, uuid, parent_uuid in rows:
+        values = {app_vars.jira_col: jira_value, "Team": "Team",
+                  app_vars.uuid_col: uuid, "Issue Type": "Task",
+                  "Parent Issue Type": "Task",
+                  "Parent Ticket": parent_ticket, "ParentUUID": parent_uuid}
+        sheet_rows.append({"id": row_id, "rowNumber": row_id, "cells": [
+            {"columnId": COL_MAP[col], "value": values[col]}
+            for col in COLUMNS]})
+    columns = [{"id": COL_MAP[col], "title": col} for col in COLUMNS]
+    return smartsheet.models.Sheet({"id": 2, "name": "Plan",
+                                    "columns": columns, "rows": sheet_rows})
+
+
+def build_hierarchy():
+    # Epic -> Story -> Task -> Sub Task, where the Epic was pushed already.
+    return build_plan([
+        (1, "Pending...", None, "2-1-3-1", None),
+        (2, "Create", "Pending...", "2-2-3-2", "2-1-3-1"),
+        (3, "Create", "Create", "2-3-3-3", "2-2-3-2"),
+        (4, "Create", "Create", "2-4-3-4", "2-3-3-3"),
+        (5, "Create", "Create", "2-5-3-5", None),
+        (6, "JAR-6", "JAR-1", "2-6-3-6", "2-1-3-1")])
+
+
+def test_waiting_rows_0():
+    nodes = ticket_dag.waiting_rows([build_hierarchy()],
+                                    jira.project_columns)
+    assert sorted(nodes) == ["2-2-3-2", "2-3-3-3", "2-4-3-4"]
+    assert nodes["2-2-3-2"]["parent_uuid"] == "2-1-3-1"
+    assert nodes["2-2-3-2"]["jira_column_id"] == COL_MAP[app_vars.jira_col]
+
+
+def test_topological_levels_0():
+    nodes = ticket_dag.waiting_rows([build_hierarchy()],
+                                    jira.project_columns)
+    assert ticket_dag.topological_levels(nodes) == [
+        ["2-2-3-2"], ["2-3-3-3"], ["2-4-3-4"]]
+
+    cycle = {"a": {"parent_uuid": "b"}, "b": {"parent_uuid": "a"},
+             "c": {"parent_uuid": "c"}, "d": {"parent_uuid": "x"}}
+    assert ticket_dag.topological_levels(cycle) == [["d"]]
+
+
+def test_push_ticket_levels_0():
+    sheet = build_hierarchy()
+    # The connector creates each level's tickets while the watcher waits.
+    resolved = [{}, {"2-1-3-1": "JAR-1"},
+                {"2-1-3-1": "JAR-1", "2-2-3-2": "JAR-2"},
+                {"2-3-3-3": "JAR-3"}]
+    push_col_map = {app_vars.uuid_col: 11, app_vars.jira_col: 12,
+                    "Parent Ticket": 13, "Issue Links": 14, "Epic Link": 15}
+
+    @patch("time.sleep")
+    @patch("data_module.smartsheet_api.write_rows_to_sheet")
+    @patch("data_module.create_jira_tickets.resolve_push_tickets",
+           side_effect=resolved)
+    @patch("data_module.create_jira_tickets.get_push_tickets_sheet",
+           return_value=[None, push_col_map])
+    def test_0(mock_0, mock_1, mock_2, mock_3):
+        pushed = jira.push_ticket_levels([sheet], watch_seconds=60,
+                                         poll_seconds=1)
+        return pushed, mock_2, mock_3
+
+    with patch.multiple("app.config", create=True, push_tickets_sheet=3):
+        pushed, write_rows, sleep = test_0()
+    # All three levels are pushed in one run.
+    assert pushed == 3
+    assert sleep.call_count == 1
+    # Each level is one push and one Pending update, in order.
+    pushes = [call[0][0] for call in write_rows.call_args_list
+              if call[0][1] == 3]
+    assert len(pushes) == 3
+    links = [cell.object_value.value for rows in pushes
+             for row in rows for cell in row.cells if cell.column_id == 14]
+    assert links == ["implements JAR-1", "implements JAR-2",
+                     "implements JAR-3"]
+
+
+def test_push_ticket_levels_1():
+    sheet = build_hierarchy()
+
+    @patch("time.sleep")
+    @patch("data_module.smartsheet_api.write_rows_to_sheet")
+    @patch("data_module.create_jira_tickets.resolve_push_tickets",
+           return_value={})
+    @patch("data_module.create_jira_tickets.get_push_tickets_sheet",
+           return_value=[None, {}])
+    def test_0(mock_0, mock_1, mock_2, mock_3):
+        return jira.push_ticket_levels([sheet], watch_seconds=0), mock_2
+
+    pushed, write_rows = test_0()
+    # Nothing resolved in time, so the rest is left for the next run.
+    assert pushed == 0
+    assert write_rows.call_count == 0
+
+
+def test_push_ticket_levels_2():
+    sheet = build_hierarchy()
+    push_col_map = {app_vars.uuid_col: 11, app_vars.jira_col: 12,
+                    "Parent Ticket": 13, "Issue Links": 14, "Epic Link": 15}
+
+    @patch("time.sleep")
+    @patch("data_module.create_jira_tickets.resolve_push_tickets",
+           return_value={"2-1-3-1": "JAR-1"})
+    @patch("data_module.create_jira_tickets.get_push_tickets_sheet",
+           return_value=[None, push_col_map])
+    def test_0(mock_0, mock_1, mock_2):
+        smartsheet_api.start_dry_run()
+        try:
+            pushed = jira.push_ticket_levels([sheet])
+        finally:
+            recorded = smartsheet_api.stop_dry_run()
+        return pushed, recorded, mock_2
+
+    with patch.multiple("app.config", create=True, push_tickets_sheet=3):
+        pushed, recorded, sleep = test_0()
+    # A plan records every level as if the parent tickets were created,
+    # without waiting for them.
+    assert pushed == 3
+    assert sleep.call_count == 0
+    assert recorded["sheets"]["3"]["rows_added"] == 3
+    assert recorded["sheets"]["2"]["rows_updated"] == 3
+
+
+def test_watch_ticket_levels_0():
+    sheet = build_hierarchy()
+    scheduler = MagicMock(running=True)
+
+    @patch("data_module.create_jira_tickets.push_ticket_levels")
+    def test_0(mock_0):
+        with patch.multiple("app.config", create=True, scheduler=scheduler):
+            watched = jira.watch_ticket_levels([sheet])
+        with patch.multiple("app.config", create=True, scheduler=None):
+            in_place = jira.watch_ticket_levels([sheet])
+        return watched, in_place, mock_0
+
+    watched, in_place, push_levels = test_0()
+    # The wait runs as its own job, outside the create_tickets run.
+    assert watched is True
+    args, kwargs = scheduler.add_job.call_args
+    assert args == (push_levels, 'date')
+    assert kwargs["args"] == [[sheet]]
+    assert kwargs["id"] == "push_ticket_levels"
+    # Without a running scheduler, the levels are pushed in place.
+    assert in_place is False
+    assert push_levels.call_count == 1
@@ -0,0 +1,60 @@
+import smartsheet
+import app.variables as app_vars
+import data_module.create_jira_tickets as jira
+import data_module.ticket_rules as ticket_rules
+
+COLUMNS = [app_vars.jira_col, app_vars.summary_col, "Team",
+           app_vars.uuid_col, "Issue Type", "Parent Issue Type",
+           "Parent Ticket", app_vars.task_col]
+COL_MAP = {col: i + 1 for i, col in enumerate(COLUMNS)}
+
+
+def build_row(row_id, **values):
+    defaults = {app_vars.jira_col: "Create", app_vars.summary_col: "False",
+                "Team": "Team", app_vars.uuid_col: "2-1-3-4",
+                "Issue Type": "Task", "Parent Issue Type": "Story",
+                "Parent Ticket": None, app_vars.task_col: "Task"}
+    defaults.update({key.replace("_", " "): value
+                     for key, value in values.items()})
+    cells = [{"columnId": COL_MAP[col], "value": defaults[col]}
+             for col in COLUMNS]
+    return smartsheet.models.Row({"id": row_id, "rowNumber": row_id,
+                                  "cells": cells})
+
+
+def test_classify_row_0():
+    compiled = ticket_rules.compile_sheet(COL_MAP, jira.project_columns)
+    cases = [
+        (build_row(1), "create_top_level"),
+        (build_row(2, Parent_Ticket="JAR-1"), "create_child"),
+        (build_row(3, Parent_Ticket="Notes"), "parent_invalid"),
+        (build_row(4, Parent_Ticket="Pending..."), "parent_pending"),
+        (build_row(5, Parent_Ticket="Create"), "unmatched"),
+        (build_row(6, Team=None), "team_empty"),
+        (build_row(7, Issue_Type="Sub-Task"), "sub_task"),
+        (build_row(8, Jira_Ticket="JAR-2"), "jira_ticket"),
+        (build_row(9, Jira_Ticket="Pending..."), "pending"),
+    ]
+    for row, expected in cases:
+        rule, _, _ = ticket_rules.classify_row(row, compiled)
+        assert rule == expected
+
+
+def test_compile_sheet_0():
+    col_map = {app_vars.jira_col: 1, app_vars.uuid_col: 4}
+    compiled = ticket_rules.compile_sheet(col_map, jira.project_columns)
+    assert compiled["jira_column_id"] == 1
+    assert compiled["data_columns"] == [(app_vars.jira_col, 1),
+                                        (app_vars.uuid_col, 4)]
+    # Columns missing from the sheet read as empty.
+    row = smartsheet.models.Row({"id": 1, "cells": [
+        {"columnId": 1, "value": "Create"}, {"columnId": 4, "value": "x"}]})
+    rule, outcome, _ = ticket_rules.classify_row(row, compiled)
+    assert (rule, outcome) == ("team_empty", ticket_rules.SKIP)
+
+
+def test_row_data_0():
+    compiled = ticket_rules.compile_sheet(COL_MAP, jira.project_columns)
+    row = build_row(1)
+    assert ticket_rules.row_data(row, compiled) == \
+        jira.build_row_data(row, COL_MAP)
@@ -0,0 +1,79 @@
+import concurrent.futures
+import threading
+
+import pytest
+
+import data_module.metrics as metrics
+import data_module.work_queue as work_queue
+
+
+def test_run_pipeline_0():
+    with pytest.raises(TypeError):
+        work_queue.run_pipeline("test", [1], [])
+    with pytest.raises(ValueError):
+        work_queue.run_pipeline("test", [1], [{"name": "stage"}])
+    with pytest.raises(ValueError):
+        work_queue.run_pipeline("test", [1], [
+            {"name": "stage", "function": str, "workers": 0}])
+
+
+def test_run_pipeline_1():
+    in_flight = []
+    lock = threading.Lock()
+
+    def discover():
+        for item in range(50):
+            with lock:
+                in_flight.append(item)
+            yield item
+
+    def fetch(item):
+        return item * 2
+
+    def write(batch):
+        with lock:
+            for _ in batch:
+                in_flight.pop()
+        return sorted(batch)
+
+    stages = [
+        {"name": "fetch", "function": fetch, "workers": 4},
+        {"name": "compare", "function": lambda item: item if item % 4 == 0
+         else None, "workers": 2},
+        {"name": "write", "function": write, "batch": 10}
+    ]
+    results, stats = work_queue.run_pipeline("test", discover(), stages,
+                                             queue_size=3)
+    written = sorted(item for batch in results for item in batch)
+    assert written == list(range(0, 100, 4))
+    assert all(len(batch) <= 10 for batch in results)
+    # Items dropped by the compare stage never reach the write stage.
+    assert stats["fetch"]["items"] == 50
+    assert stats["compare"]["items"] == 50
+    assert stats["write"]["items"] == 25
+    # The bounded queues never hold more than their size.
+    assert all(stage["max_depth"] <= 3 for stage in stats.values())
+    metric = metrics.get("pipeline.test.fetch.throughput")
+    assert metric["details"]["items"] == 50
+    assert metric["details"]["workers"] == 4
+
+
+def test_run_pipeline_2():
+    def fail(item):
+        if item == 3:
+            raise ValueError("bad item")
+        return item
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        results, _ = work_queue.run_pipeline("test", range(5), [
+            {"name": "compare", "function": abs, "executor": executor}])
+        assert sorted(results) == [0, 1, 2, 3, 4]
+    with pytest.raises(ValueError):
+        work_queue.run_pipeline("test", range(100), [
+            {"name": "fetch", "function": fail, "workers": 2},
+            {"name": "write", "function": abs}], queue_size=2)
+
+
+def test_get_process_pool_0():
+    # Stages run on threads unless the process pool is turned on.
+    assert work_queue.get_process_pool() is None
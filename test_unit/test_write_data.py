@@ -247,6 +247,58 @@ def test_write_jira_index_cell_links_2(project_indexes, index_sheet_fixture,
     assert result_1 is True
 
 
+def build_dest_sheet(sheet_id, columns, tickets):
+    rows = [{"id": sheet_id + i, "modifiedAt": "2022-05-08T19:00:22Z",
+             "cells": [{"columnId": sheet_id + j,
+                        "value": ticket if col == app_vars.jira_col else None}
+                       for j, col in enumerate(columns)]}
+            for i, ticket in enumerate(tickets)]
+    return smartsheet.models.Sheet({
+        "id": sheet_id, "name": str(sheet_id), "rows": rows,
+        "columns": [{"id": sheet_id + j, "title": col}
+                    for j, col in enumerate(columns)]})
+
+
+def test_write_jira_index_cell_links_3():
+    columns = [app_vars.jira_col, app_vars.status_col, app_vars.task_col,
+               app_vars.assignee_col]
+    index_sheet = build_dest_sheet(1000, columns, ["JAR-1", "JAR-2"])
+    index_col_map = helper.get_column_map(index_sheet)
+    index_rows = {"JAR-1": 1000, "JAR-2": 1001}
+    sheets = {sheet_id: build_dest_sheet(sheet_id, columns,
+                                         ["JAR-1", "JAR-2", "JAR-3"])
+              for sheet_id in (100, 200, 300)}
+    get_data.cache_column_map(200, helper.get_column_map(sheets[200]))
+    project_sub_index = {"100-100-1-1": "JAR-1", "200-200-1-1": "JAR-1",
+                         "300-301-1-1": "JAR-2"}
+
+    result = smartsheet.models.Result()
+    result.message = "SUCCESS"
+    result.result_code = 0
+
+    @patch("data_module.helper.save_state")
+    @patch("data_module.helper.load_state", return_value={})
+    @patch("data_module.smartsheet_api.write_rows_to_sheet",
+           return_value=result)
+    @patch("data_module.get_data.load_jira_index",
+           return_value=(index_sheet, index_col_map, index_rows))
+    @patch("data_module.smartsheet_api.get_sheet",
+           side_effect=lambda sheet_id, **kwargs: sheets[sheet_id])
+    def test_0(mock_0, mock_1, mock_2, mock_3, mock_4):
+        msg = write_data.write_jira_index_cell_links(project_sub_index,
+                                                     workers=3)
+        return msg, mock_0, mock_2
+
+    msg, get_sheet, write_rows = test_0()
+    # Every sheet is written in the same call, not just the first one.
+    assert msg.count("Writing 2 cell link rows") == 3
+    assert sorted(call[0][1].id for call in write_rows.call_args_list) == \
+        [100, 200, 300]
+    projected = {call[0][0]: call[1].get("column_ids")
+                 for call in get_sheet.call_args_list}
+    assert projected == {100: None, 200: [200, 201, 202, 203], 300: None}
+
+
 # TODO: Build a version of the sheet we can use to link and get a successful
 # msg back.
 # def test_write_jira_index_cell_links_3(project_indexes, index_fixture,
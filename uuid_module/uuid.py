@@ -2,15 +2,52 @@ import logging
 import time
 import gc
 
-import app.config as config
+import app.variables as app_vars
+import data_module.data_plane as data_plane
+import data_module.execution_guard as execution_guard
 import data_module.get_data as get_data
 import data_module.helper as helper
-import data_module.jobs as jobs
+import data_module.scheduler_controller as scheduler_controller
+import data_module.work_queue as work_queue
 import data_module.write_data as write_data
 
 logger = logging.getLogger(__name__)
 
 
+def find_blank_uuids(sheet):
+    """Finds the rows in a sheet that need a UUID. Runs in the pipeline's
+       compare stage, so it must stay a module level function that a
+       process pool can call.
+
+    Args:
+        sheet (smartsheet.models.Sheet): The sheet to check
+
+    Returns:
+        dict: The sheet to update, in the format of get_blank_uuids, or None
+              if every row has its UUID
+    """
+    return get_data.get_blank_uuids([sheet])
+
+
+def write_uuid_batch(batch):
+    """Writes the UUIDs for a batch of sheets.
+
+    Args:
+        batch (list): The dicts returned by find_blank_uuids
+
+    Returns:
+        int: The number of sheets that were updated
+    """
+    sheets_to_update = {}
+    for sheet_to_update in batch:
+        sheets_to_update.update(sheet_to_update)
+    msg = str("There are {} project sheets to be updated "
+              "with UUIDs").format(len(sheets_to_update))
+    logging.info(msg)
+    return write_data.write_uuids(sheets_to_update)
+
+
+@execution_guard.guarded("write_uuids")
 def write_uuids_to_sheets(minutes):
     """Writes UUIDs to each blank cell in the UUID column across every sheet
         in the workspace, excluding the Index Sheet.
@@ -37,15 +74,12 @@ def write_uuids_to_sheets(minutes):
                                        time.localtime(start)))
     logging.debug(msg)
 
-    sheet_ids = get_data.get_all_sheet_ids(
-        minutes, config.workspace_id, config.index_sheet)
-    sheet_ids = list(set(sheet_ids))
-
     # Calculate a number minutes ago to get only the rows that were modified
-    # since the last run.
-    source_sheets = get_data.refresh_source_sheets(sheet_ids, minutes)
+    # since the last run. The sheets are shared with the other jobs, and
+    # cold sheets are only polled every few runs.
+    sheet_ids = data_plane.discover(minutes, job_name='write_uuids_interval')
 
-    if not source_sheets:
+    if not sheet_ids:
         end = time.time()
         elapsed = end - start
         elapsed = helper.truncate(elapsed, 3)
@@ -54,24 +88,30 @@ def write_uuids_to_sheets(minutes):
         logging.info(msg)
         return msg
 
-    blank_uuid_index = get_data.get_blank_uuids(source_sheets)
-    if blank_uuid_index:
-        msg = str("There are {} project sheets to be updated "
-                  "with UUIDs").format(len(blank_uuid_index))
+    # Download, compare and write the sheets as a pipeline, so a sheet is
+    # written while the next ones are still downloading.
+    stages = [
+        data_plane.fetch_stage(minutes),
+        {"name": "compare", "function": find_blank_uuids,
+         "workers": app_vars.pipeline_diff_workers,
+         "executor": work_queue.get_process_pool()},
+        {"name": "write", "function": write_uuid_batch,
+         "batch": app_vars.pipeline_write_batch}
+    ]
+    results, _ = work_queue.run_pipeline("write_uuids", sheet_ids, stages)
+    sheets_updated = sum(results)
+    if sheets_updated:
+        msg = str("{} project sheet(s) updated with UUIDs"
+                  "").format(sheets_updated)
         logging.info(msg)
-        sheets_updated = write_data.write_uuids(blank_uuid_index)
-        if sheets_updated:
-            msg = str("{} project sheet(s) updated with UUIDs"
-                      "").format(sheets_updated)
-            logging.info(msg)
 
     end = time.time()
     elapsed = end - start
     elapsed = helper.truncate(elapsed, 3)
     msg = str("[JOB][WRITE UUIDS] took {} seconds.").format(elapsed)
     logging.info(msg)
-    interval_msg = jobs.modify_scheduler(
-        elapsed, 'write_uuids_interval', 'seconds', 1)
+    interval_msg = scheduler_controller.record_run(
+        'write_uuids_interval', elapsed)
     logging.info(interval_msg)
     gc.collect()
     return True